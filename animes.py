@@ -1,207 +1,302 @@
 from typing import Optional, Callable
 import threading
+from collections import deque
 import time
-from datetime import datetime
+import os
+import re
 import sys
 
+if os.name == "nt":
+    import msvcrt
+else:
+    import select
+    import termios
+    import tty
 
-class SyncLoadingAnimation:
+
+# 状态行动画的帧函数：frame(帧序号, 已等待秒数, message, **参数) -> (状态行文本, 到下一帧的延迟)
+
+
+def spinner_frame(frame_idx: int,
+                  elapsed: float,
+                  message: str = "等待世界回应",
+                  delay: float = 0.1,
+                  spinner_chars: str = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏",
+                  color: str = "\033[94m",  # 蓝色
+                  reset_color: str = "\033[0m"):
     """
-    同步加载动画类，用于在AI生成或加载时显示等待动画
-    完全兼容现有的同步代码环境
+    旋转动画效果
+
+    Args:
+        message: 显示的消息
+        delay: 动画帧之间的延迟（秒）
+        spinner_chars: 旋转字符序列
+        color: 颜色代码
+        reset_color: 颜色重置代码
     """
+    spinner = spinner_chars[frame_idx % len(spinner_chars)]
+    return f"{color}{spinner}{reset_color} {message} ({elapsed:.1f}s)", delay
 
-    def __init__(self):
-        self.is_running = False
-        self.animation_thread = None
-        self.stop_event = threading.Event()
-
-    def spinner_animation(self,
-                          message: str = "等待世界回应",
-                          delay: float = 0.1,
-                          spinner_chars: str = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏",
-                          color: str = "\033[94m",  # 蓝色
-                          reset_color: str = "\033[0m") -> None:
-        """
-        旋转动画效果
 
-        Args:
-            message: 显示的消息
-            delay: 动画帧之间的延迟（秒）
-            spinner_chars: 旋转字符序列
-            color: 颜色代码
-            reset_color: 颜色重置代码
-        """
-        spinner_idx = 0
-        start_time = datetime.now()
-
-        while not self.stop_event.is_set():
-            # 计算已等待时间
-            elapsed = (datetime.now() - start_time).total_seconds()
-            time_str = f" ({elapsed:.1f}s)"
-
-            # 显示当前帧
-            spinner = spinner_chars[spinner_idx % len(spinner_chars)]
-            sys.stdout.write(
-                f"\r{color}{spinner}{reset_color} {message}{time_str}")
-            sys.stdout.flush()
-
-            # 更新索引
-            spinner_idx += 1
-            time.sleep(delay)
-
-    def dot_animation(self,
-                      message: str = "等待世界回应",
-                      delay: float = 0.3,
-                      max_dots: int = 3,
-                      color: str = "\033[92m",  # 绿色
-                      reset_color: str = "\033[0m") -> None:
+def dot_frame(frame_idx: int,
+              elapsed: float,
+              message: str = "等待世界回应",
+              delay: float = 0.3,
+              max_dots: int = 3,
+              color: str = "\033[92m",  # 绿色
+              reset_color: str = "\033[0m"):
+    """
+    点状动画效果
+
+    Args:
+        message: 显示的消息
+        delay: 点之间的延迟（秒）
+        max_dots: 最大点数
+        color: 颜色代码
+        reset_color: 颜色重置代码
+    """
+    dots = "." * (frame_idx % (max_dots + 1))
+    return f"{color}Wait{reset_color} {message}{dots} ({elapsed:.1f}s)", delay
+
+
+def progress_bar_frame(frame_idx: int,
+                       elapsed: float,
+                       message: str = "等待世界回应",
+                       delay: float = 0.2,
+                       bar_length: int = 20,
+                       color: str = "\033[93m",  # 黄色
+                       reset_color: str = "\033[0m"):
+    """
+    进度条动画效果(循环显示)
+
+    Args:
+        message: 显示的消息
+        delay: 动画帧之间的延迟（秒）
+        bar_length: 进度条长度
+        color: 颜色代码
+        reset_color: 颜色重置代码
+    """
+    progress = (frame_idx + 1) % (bar_length + 1)
+    bar = "█" * progress + "░" * (bar_length - progress)
+    percentage = int((progress / bar_length) * 100)
+    return f"{color}Wait{reset_color} {message} [{bar}] {percentage}% ({elapsed:.1f}s)", delay
+
+
+def typewriter_loading_frame(frame_idx: int,
+                             elapsed: float,
+                             message: str = "等待世界回应",
+                             base_text: str = "请稍候",
+                             delay: float = 0.1,
+                             color: str = "\033[95m",  # 紫色
+                             reset_color: str = "\033[0m"):
+    """
+    打字机风格的加载动画
+
+    Args:
+        message: 主要消息
+        base_text: 基础文本
+        delay: 字符之间的延迟（秒）
+        color: 颜色代码
+        reset_color: 颜色重置代码
+    """
+    suffix = ("", ".", "..", "...")[frame_idx % 4]
+    return f"{color}Wait{reset_color} {message}: {base_text}{suffix} ({elapsed:.1f}s)", delay
+
+
+# 动画类型 -> 帧函数(未知类型使用旋转动画)
+ANIMATION_FRAMES = {
+    "spinner": spinner_frame,
+    "dots": dot_frame,
+    "progress": progress_bar_frame,
+    "typewriter": typewriter_loading_frame,
+}
+# 清除状态行
+STATUS_CLEAR = "\r" + " " * 100 + "\r"
+
+
+class StatusRenderer:
+    """
+    全局唯一的状态行渲染器：一个常驻的后台线程负责绘制与擦除状态行(加载动画与掷骰动画)
+    set_status/clear只在锁内修改状态并唤醒渲染线程，可在任意线程中廉价调用
+    掷骰动画(CheckPlayback)排队播放，播放期间优先于加载动画显示
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream  # None表示当前的sys.stdout
+        self._cond = threading.Condition()
+        self._status = None  # (帧函数, message, 参数, 开始时间)
+        self._shown = False  # 状态行是否显示在屏幕上
+        self._generation = 0  # 每次set_status/clear加一，用于clear等待擦除完成
+        self._drawn_generation = 0
+        self._playbacks = deque()  # 等待播放的掷骰动画(CheckPlayback)
+        self._thread = None
+
+    def set_status(self, message: str, animation_type: str = "spinner", **kwargs) -> int:
         """
-        点状动画效果
+        显示(或替换)状态行动画，立即返回
 
-        Args:
-            message: 显示的消息
-            delay: 点之间的延迟（秒）
-            max_dots: 最大点数
-            color: 颜色代码
-            reset_color: 颜色重置代码
+        Returns:
+            int: 本次状态的编号，可传给clear只清除自己设置的状态
         """
-        dot_count = 0
-        start_time = datetime.now()
-
-        while not self.stop_event.is_set():
-            # 计算已等待时间
-            elapsed = (datetime.now() - start_time).total_seconds()
-            time_str = f" ({elapsed:.1f}s)"
-
-            # 显示当前点状态
-            dots = "." * (dot_count % (max_dots + 1))
-            sys.stdout.write(
-                f"\r{color}Wait{reset_color} {message}{dots}{time_str}")
-            sys.stdout.flush()
-
-            # 更新点数
-            dot_count += 1
-            time.sleep(delay)
-
-    def progress_bar_animation(self,
-                               message: str = "等待世界回应",
-                               delay: float = 0.2,
-                               bar_length: int = 20,
-                               color: str = "\033[93m",  # 黄色
-                               reset_color: str = "\033[0m") -> None:
+        frame = ANIMATION_FRAMES.get(animation_type, spinner_frame)
+        with self._cond:
+            self._generation += 1
+            self._status = (frame, message, kwargs, time.monotonic())
+            self._start()
+            self._cond.notify_all()
+            return self._generation
+
+    def play(self, playback) -> None:
+        """排队播放一段掷骰动画(CheckPlayback)，立即返回"""
+        with self._cond:
+            self._playbacks.append(playback)
+            self._start()
+            self._cond.notify_all()
+
+    def end_playback(self, playback, cut: bool = True, timeout: Optional[float] = None) -> None:
         """
-        进度条动画效果
-
-        Args:
-            message: 显示的消息
-            delay: 动画帧之间的延迟（秒）
-            bar_length: 进度条长度
-            color: 颜色代码
-            reset_color: 颜色重置代码
+        调用方不再等待：之后不调用playback的then；cut为True时剩余动画直接显示结果
+        等待播放完后返回
         """
-        progress = 0
-        start_time = datetime.now()
-
-        while not self.stop_event.is_set():
-            # 计算已等待时间
-            elapsed = (datetime.now() - start_time).total_seconds()
-            time_str = f" ({elapsed:.1f}s)"
-
-            # 计算进度（循环显示）
-            progress = (progress + 1) % (bar_length + 1)
-            bar = "█" * progress + "░" * (bar_length - progress)
-            percentage = int((progress / bar_length) * 100)
-
-            # 显示进度条
-            sys.stdout.write(
-                f"\r{color}Wait{reset_color} {message} [{bar}] {percentage}%{time_str}")
-            sys.stdout.flush()
-
-            time.sleep(delay)
-
-    def typewriter_loading(self,
-                           message: str = "等待世界回应",
-                           base_text: str = "请稍候",
-                           delay: float = 0.1,
-                           color: str = "\033[95m",  # 紫色
-                           reset_color: str = "\033[0m") -> None:
+        with self._cond:
+            playback.ready = True
+            playback.cut = playback.cut or cut
+            self._cond.notify_all()
+            if threading.current_thread() is self._thread:
+                return
+            self._cond.wait_for(lambda: playback.done, timeout)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="status-renderer", daemon=True)
+            self._thread.start()
+
+    def clear(self, token: Optional[int] = None, timeout: float = 1.0) -> None:
         """
-        打字机风格的加载动画
-
-        Args:
-            message: 主要消息
-            base_text: 基础文本
-            delay: 字符之间的延迟（秒）
-            color: 颜色代码
-            reset_color: 颜色重置代码
+        清除状态行，等待渲染线程把它从屏幕上擦除后返回(之后可以安全地输出)
+        token不为None时只在当前状态仍是该次set_status设置的状态时清除
         """
-        suffixes = ["", ".", "..", "..."]
-        suffix_idx = 0
-        start_time = datetime.now()
+        with self._cond:
+            if token is not None and token != self._generation:
+                return
+            if self._status is None and not self._shown:
+                return
+            self._generation += 1
+            self._status = None
+            self._cond.notify_all()
+            if threading.current_thread() is self._thread:
+                return
+            self._cond.wait_for(
+                lambda: self._drawn_generation >= self._generation, timeout)
+
+    def print(self, *args, **kwargs) -> None:
+        """输出一行文本：先擦除状态行，输出后状态行立即在下一行重绘"""
+        with self._cond:
+            if self._shown:
+                self._write(STATUS_CLEAR)
+                self._shown = False
+            print(*args, file=self.stream or sys.stdout, **kwargs)
+            self._cond.notify_all()
+
+    @property
+    def active(self) -> bool:
+        return self._status is not None
+
+    def _run(self):
+        frame_idx = 0
+        generation = None
+        with self._cond:
+            while True:
+                if self._playbacks:
+                    self._step_playback(self._playbacks[0])
+                    continue
+                if self._status is None:
+                    if self._shown:
+                        self._write(STATUS_CLEAR)
+                        self._shown = False
+                    self._drawn_generation = self._generation
+                    self._cond.notify_all()
+                    self._cond.wait()
+                    continue
+                if generation != self._generation:
+                    generation = self._generation
+                    frame_idx = 0
+                frame, message, kwargs, started_at = self._status
+                text, delay = frame(frame_idx, time.monotonic() - started_at,
+                                    message, **kwargs)
+                self._write("\r" + text)
+                self._shown = True
+                self._drawn_generation = self._generation
+                frame_idx += 1
+                self._cond.wait(delay)
+
+    def _step_playback(self, playback):
+        """绘制掷骰动画的一帧(在锁内由渲染线程调用)"""
+        lines, text, delay = playback.step(time.monotonic())
+        for line in lines:
+            if self._shown:
+                self._write(STATUS_CLEAR)
+                self._shown = False
+            self._write(line + "\n")
+        self._drawn_generation = self._generation
+        if text is None:
+            self._playbacks.popleft()
+            if self._shown:
+                self._write(STATUS_CLEAR)
+                self._shown = False
+            playback.done = True
+            self._cond.notify_all()
+            if playback.then and not playback.ready:
+                playback.then()
+            return
+        self._write("\r" + text)
+        self._shown = True
+        self._cond.wait(delay)
+
+    def _write(self, text: str):
+        stream = self.stream or sys.stdout
+        stream.write(text)
+        stream.flush()
+
+
+# 全局状态行渲染器
+STATUS = StatusRenderer()
 
-        while not self.stop_event.is_set():
-            # 计算已等待时间
-            elapsed = (datetime.now() - start_time).total_seconds()
-            time_str = f" ({elapsed:.1f}s)"
 
-            # 显示当前状态
-            current_suffix = suffixes[suffix_idx % len(suffixes)]
-            sys.stdout.write(
-                f"\r{color}Wait{reset_color} {message}: {base_text}{current_suffix}{time_str}")
-            sys.stdout.flush()
+class SyncLoadingAnimation:
+    """
+    同步加载动画类，用于在AI生成或加载时显示等待动画
+    只是全局状态行渲染器STATUS的外观：开始/停止动画不会创建线程
+    """
 
-            # 更新后缀
-            suffix_idx += 1
-            time.sleep(delay)
+    def __init__(self, renderer: Optional[StatusRenderer] = None):
+        self.renderer = renderer or STATUS
+        self.is_running = False
+        self._token = None
 
     def start_animation(self,
                         animation_type: str = "spinner",
                         **kwargs) -> None:
         """
-        开始动画
+        开始动画(替换当前的状态行)
 
         Args:
             animation_type: 动画类型 (spinner, dots, progress, typewriter)
             **kwargs: 动画参数
         """
-        if self.is_running:
-            self.stop_animation()
-
+        message = kwargs.pop("message", "等待世界回应")
+        self._token = self.renderer.set_status(
+            message, animation_type, **kwargs)
         self.is_running = True
-        self.stop_event.clear()
-
-        # 选择动画类型
-        animation_func = {
-            "spinner": self.spinner_animation,
-            "dots": self.dot_animation,
-            "progress": self.progress_bar_animation,
-            "typewriter": self.typewriter_loading
-        }.get(animation_type, self.spinner_animation)
-
-        # 在新线程中运行动画
-        self.animation_thread = threading.Thread(
-            target=animation_func,
-            kwargs=kwargs,
-            daemon=True
-        )
-        self.animation_thread.start()
 
     def stop_animation(self) -> None:
         """
-        停止动画并清理屏幕
+        停止动画并清理屏幕(只清除本对象开始的动画)
         """
         if self.is_running:
-            self.stop_event.set()
             self.is_running = False
-
-            # 等待动画线程结束
-            if self.animation_thread and self.animation_thread.is_alive():
-                self.animation_thread.join(timeout=1.0)
-
-            # 清理屏幕
-            sys.stdout.write("\r" + " " * 100 + "\r")
-            sys.stdout.flush()
+            self.renderer.clear(self._token)
 
 
 # 便捷函数
@@ -233,64 +328,167 @@ def show_loading_animation(animation_type: str = "spinner",
         raise e
 
 
+# 打字机效果每帧的时长(秒)：每帧把这段时间内应显示的字符一次性写出
+TYPEWRITER_FRAME = 1 / 60
+# 默认打字速度(字符/秒)；0表示不使用打字机效果，直接输出全文(用于无界面运行)
+TYPEWRITER_SPEED = 50
+# ANSI转义序列整体作为一个输出单位，不计入打字速度
+_UNIT_PATTERN = re.compile(r"\033\[[0-9;]*[A-Za-z]|.", re.S)
+
+
+class KeyPoller:
+    """
+    非阻塞地检测按键，用于跳过打字机效果
+    使用期间终端处于cbreak模式(按键无需回车、不回显)，检测到的按键会被读走，不会留给之后的input()
+    标准输入不是终端时不检测按键
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin
+        self.enabled = False
+        self._saved_attrs = None
+
+    def __enter__(self):
+        try:
+            self.enabled = self.stream.isatty()
+        except (AttributeError, ValueError):
+            self.enabled = False
+        if self.enabled and os.name != "nt":
+            fd = self.stream.fileno()
+            try:
+                self._saved_attrs = termios.tcgetattr(fd)
+                tty.setcbreak(fd)
+            except termios.error:
+                self.enabled = False
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._saved_attrs is not None:
+            termios.tcsetattr(self.stream.fileno(),
+                              termios.TCSADRAIN, self._saved_attrs)
+            self._saved_attrs = None
+        self.enabled = False
+
+    def pressed(self) -> bool:
+        """自上次检测以来是否有按键(读走全部已输入的按键)"""
+        if not self.enabled:
+            return False
+        if os.name == "nt":
+            if not msvcrt.kbhit():
+                return False
+            while msvcrt.kbhit():
+                msvcrt.getwch()
+            return True
+        fd = self.stream.fileno()
+        if not select.select([fd], [], [], 0)[0]:
+            return False
+        while select.select([fd], [], [], 0)[0]:
+            if not os.read(fd, 1024):
+                break
+        return True
+
+
+def _wait_frames(seconds: float, poller: KeyPoller) -> bool:
+    """按帧等待一段时间，期间有按键时立即返回True"""
+    end_time = time.perf_counter() + seconds
+    while time.perf_counter() < end_time:
+        if poller.pressed():
+            return True
+        time.sleep(min(TYPEWRITER_FRAME, max(end_time - time.perf_counter(), 0)))
+    return False
+
+
+def _type_line(line: str,
+               line_idx: int,
+               chars_per_second: float,
+               poller: KeyPoller,
+               on_char_typed: Optional[Callable]) -> bool:
+    """
+    按帧输出一行文本：每帧写出并刷新一次截至当前时刻应显示的全部字符
+
+    Returns:
+        bool: 是否被按键跳过(跳过时该行剩余部分已全部输出)
+    """
+    units = _UNIT_PATTERN.findall(line) if "\033" in line else line
+    written = 0
+    skipped = False
+    start_time = time.perf_counter()
+    while written < len(units):
+        if poller.pressed():
+            skipped = True
+            target = len(units)
+        else:
+            elapsed = time.perf_counter() - start_time
+            target = min(int(elapsed * chars_per_second) + 1, len(units))
+        sys.stdout.write("".join(units[written:target]))
+        sys.stdout.flush()
+        if on_char_typed:
+            for char_idx in range(written, target):
+                on_char_typed(units[char_idx], char_idx, line_idx)
+        written = target
+        if skipped:
+            break
+        if written < len(units):
+            time.sleep(TYPEWRITER_FRAME)
+    return skipped
+
+
 def typewriter_effect(text: str,
-                      delay: float = 0.03,
+                      chars_per_second: float = TYPEWRITER_SPEED,
                       newline_delay: float = 0.1,
                       on_char_typed: Optional[Callable] = None,
-                      on_complete: Optional[Callable] = None) -> bool:
+                      on_complete: Optional[Callable] = None,
+                      poller: Optional[KeyPoller] = None) -> bool:
     """
-    打字机效果输出文本
+    打字机效果输出文本，按帧(约16ms)批量写出字符；任意按键立即输出剩余全部文本
 
     Args:
         text: 要输出的文本
-        delay: 每个字符之间的延迟（秒）
+        chars_per_second: 每秒输出的字符数，0表示直接输出全文
         newline_delay: 换行后的额外延迟（秒）
         on_char_typed: 每输入一个字符时的回调函数
         on_complete: 完成时的回调函数
+        poller: 按键检测器，None时在本次输出期间单独创建
 
     Returns:
-        bool: 是否被用户中断
+        bool: 是否被用户按键跳过(跳过时全文已输出)
     """
-    skip_event = threading.Event()
-    interrupted = False
+    if poller is None:
+        with KeyPoller() as own_poller:
+            return typewriter_effect(text, chars_per_second, newline_delay,
+                                     on_char_typed, on_complete, own_poller)
+    instant = chars_per_second <= 0
+    skipped = False
 
     try:
         lines = text.split('\n')
         for line_idx, line in enumerate(lines):
-            if skip_event.is_set():
-                interrupted = True
-                break
-
-            # 输出当前行的所有字符
-            for char_idx, char in enumerate(line):
-                if skip_event.is_set():
-                    interrupted = True
-                    break
-
-                sys.stdout.write(char)
-                sys.stdout.flush()
-
-                # 调用字符输入回调
+            if instant or skipped:
+                sys.stdout.write(line)
                 if on_char_typed:
-                    on_char_typed(char, char_idx, line_idx)
-
-                time.sleep(delay)
+                    for char_idx, char in enumerate(line):
+                        on_char_typed(char, char_idx, line_idx)
+            else:
+                skipped = _type_line(line, line_idx, chars_per_second,
+                                     poller, on_char_typed)
 
             # 如果不是最后一行，添加换行和延迟
             if line_idx < len(lines) - 1:
-                print()  # 换行
-                if not skip_event.is_set():
-                    time.sleep(newline_delay)
+                sys.stdout.write("\n")
+                if not (instant or skipped):
+                    sys.stdout.flush()
+                    skipped = _wait_frames(newline_delay, poller)
+        sys.stdout.flush()
 
         # 调用完成回调
-        if on_complete and not interrupted:
+        if on_complete:
             on_complete()
 
     except KeyboardInterrupt:
-        interrupted = True
+        skipped = True
         print("\n输出被中断")
 
-    return interrupted
+    return skipped
 
 
 def typewriter_narrative(text: str,
@@ -298,7 +496,8 @@ def typewriter_narrative(text: str,
                          suffix: str = "",
                          color: str = "",
                          reset_color: str = "\033[0m",
-                         delay: float = 0.02) -> bool:
+                         chars_per_second: float = TYPEWRITER_SPEED,
+                         poller: Optional[KeyPoller] = None) -> bool:
     """
     专门用于游戏叙述的打字机效果
 
@@ -308,9 +507,11 @@ def typewriter_narrative(text: str,
         suffix: 后缀
         color: 颜色代码
         reset_color: 颜色重置代码
+        chars_per_second: 每秒输出的字符数，0表示直接输出全文
+        poller: 按键检测器
 
     Returns:
-        bool: 是否被用户中断
+        bool: 是否被用户按键跳过
     """
     if prefix:
         print(prefix)
@@ -319,16 +520,17 @@ def typewriter_narrative(text: str,
     colored_text = f"{color}{text}{reset_color}" if color else text
 
     # 使用打字机效果
-    interrupted = typewriter_effect(
+    skipped = typewriter_effect(
         colored_text,
-        delay=delay,  # 稍快的速度
+        chars_per_second=chars_per_second,
         newline_delay=0.1,
+        poller=poller,
     )
 
-    if suffix and not interrupted:
+    if suffix:
         print(suffix)
 
-    return interrupted
+    return skipped
 
 
 def number_growth_animation(target_value: float,
@@ -428,3 +630,135 @@ def probability_check_animation(success_prob: float,
         f"\r{result_color}🎯 检定{result_text}: {success_prob:.2f}/{target_prob:.2f}{reset_color}")
     sys.stdout.flush()
     print()  # 换行
+
+
+# 检定的显示方式：full逐次播放完整动画，compressed所有掷骰共用一段短动画，instant直接显示结果
+CHECK_PRESENTATIONS = ("full", "compressed", "instant")
+# 压缩动画的时长(秒)
+COMPRESSED_CHECK_DURATION = 0.8
+# 检定动画的帧间隔(秒)
+CHECK_FRAME_DELAY = 0.06
+
+
+def check_result_text(roll,
+                      color_success: str = "\033[92m",  # 绿色
+                      color_fail: str = "\033[91m",     # 红色
+                      reset_color: str = "\033[0m") -> str:
+    """一次掷骰(records.CheckRoll)的结果文本"""
+    result_color = color_success if roll.success else color_fail
+    result_text = "成功" if roll.success else "失败"
+    return f"{result_color}🎯 检定{result_text}: {roll.value:.2f}/{roll.target:.2f}{reset_color}"
+
+
+def check_frame(roll, progress: float) -> str:
+    """一次掷骰的动画帧：数值非线性增长到结果值"""
+    current = roll.value * (progress / 0.9) ** 0.5 if progress < 0.9 else roll.value
+    return f"🎯 检定中: {current:.2f}/{roll.target:.2f}"
+
+
+def compressed_check_frame(rolls: list, progress: float) -> str:
+    """所有掷骰在同一行中同时增长到结果值"""
+    values = " | ".join(
+        f"{roll.value * progress ** 0.5:.2f}/{roll.target:.2f}" for roll in rolls)
+    return f"🎯 检定中: {values}"
+
+
+def check_result_line(roll) -> str:
+    """不播放动画时一次掷骰的显示行(带说明与备注)"""
+    line = check_result_text(roll)
+    if roll.label:
+        line = f"{roll.label} {line}"
+    if roll.note:
+        line = f"{line} {roll.note}"
+    return line
+
+
+def show_check_results(rolls: list) -> None:
+    """不播放动画，直接逐行显示掷骰结果"""
+    for roll in rolls:
+        print(check_result_line(roll))
+
+
+def check_steps(rolls: list, presentation: str = "full") -> list:
+    """
+    把一组掷骰按显示方式排成播放步骤
+    ("line", 文本)为输出的一行；("frame", 帧函数(进度)->状态行文本, 时长)为一段状态行动画
+    """
+    if presentation == "instant":
+        return [("line", check_result_line(roll)) for roll in rolls]
+    if presentation == "compressed":
+        steps = [("frame", lambda progress: compressed_check_frame(rolls, progress),
+                  COMPRESSED_CHECK_DURATION)]
+        return steps + [("line", check_result_line(roll)) for roll in rolls]
+    steps = []
+    for roll in rolls:
+        if roll.label:
+            steps.append(("line", roll.label))
+        steps.append(("frame", lambda progress, roll=roll: check_frame(roll, progress),
+                      roll.duration))
+        steps.append(("line", check_result_text(roll)))
+        if roll.note:
+            steps.append(("line", roll.note))
+    return steps
+
+
+class CheckPlayback:
+    """
+    掷骰动画：作为全局状态行渲染器的一种状态，由渲染线程逐帧绘制(不单独创建线程)
+    动画播放完时若调用方还未finish/join(AI仍未响应)，在渲染线程中调用then(如开始等待动画)
+    """
+
+    def __init__(self, rolls: list, presentation: str = "full",
+                 then: Optional[Callable] = None,
+                 renderer: Optional["StatusRenderer"] = None):
+        self.renderer = renderer or STATUS
+        self.then = then
+        self.ready = False  # 调用方已不再等待(不调用then)
+        self.cut = False  # 剩余动画直接显示结果
+        self.done = False
+        self._steps = deque(check_steps(rolls, presentation))
+        self._step_started = None
+        self.renderer.play(self)
+
+    def step(self, now: float):
+        """
+        由渲染线程调用：返回(要输出的行, 状态行文本, 到下一帧的延迟)
+        状态行文本为None时播放结束
+        """
+        lines = []
+        while self._steps:
+            kind, *args = self._steps[0]
+            if kind == "line":
+                lines.append(args[0])
+                self._steps.popleft()
+                continue
+            frame, duration = args
+            if self._step_started is None:
+                self._step_started = now
+            elapsed = now - self._step_started
+            if self.cut or elapsed >= duration:
+                self._steps.popleft()
+                self._step_started = None
+                continue
+            return lines, frame(elapsed / duration), CHECK_FRAME_DELAY
+        return lines, None, 0
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """等待动画完整播放完(之后不再调用then)"""
+        self.renderer.end_playback(self, cut=False, timeout=timeout)
+
+    def finish(self) -> None:
+        """结果已就绪：剩余的动画直接显示结果，不再调用then，等待显示完"""
+        self.renderer.end_playback(self, cut=True)
+
+
+def play_checks_in_background(rolls: list,
+                              presentation: str = "full",
+                              then: Optional[Callable] = None) -> CheckPlayback:
+    """
+    由全局状态行渲染器播放掷骰动画(与之后的AI请求同时进行)
+
+    Returns:
+        CheckPlayback: 调用方在AI响应后finish(或join等待完整播放)
+    """
+    return CheckPlayback(rolls, presentation, then)
@@ -0,0 +1,166 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# AI调用的录制与重放：录制时把每次调用(调用类型、提示词、参数、回复、用量、耗时)和玩家的操作追加到录制文件(JSONL)，
+# 重放时按规范化提示词的哈希返回录制的回复，不访问网络；可用于离线回归测试与整个回合流程的基准测试
+import re
+import json
+import time
+import hashlib
+from collections import defaultdict, deque
+from dataclasses import asdict
+from records import LLMReply, TokenUsage
+
+CASSETTE_FORMAT = 1
+
+# 调用类型
+CALL_STORY = "story"              # 开局/后续剧情
+CALL_ACTION_MODE = "action_mode"  # 自定义行动的类型修饰
+CALL_THINK = "think"              # 思考
+CALL_USE_ITEM = "use_item"        # 物品使用是否合理
+CALL_SUMMARY = "summary"          # 总结摘要
+
+# 玩家操作(重放时按顺序驱动引擎)
+ACTION_STATE = "state"            # save(游戏中途开始录制时的存档数据，含完整历史)
+ACTION_START = "start"            # story
+ACTION_GO = "go"                  # option, custom, concluding
+ACTION_THINK = "think"            # text
+ACTION_USE_ITEM = "use_item"      # item, move, target
+ACTION_EVENT = "event"            # kind, data(玩家直接修改状态的事件)
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class CassetteMiss(LookupError):
+    """重放时找不到匹配的录制回复"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：合并连续空白(提示词模板的缩进、换行变化不影响匹配)"""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """
+    录制文件，每行一个JSON对象：首行为文件头，之后为"call"(AI调用)或"action"(玩家操作)
+    重放时同一(调用类型, 提示词哈希)的录制按顺序依次使用；
+    tolerant为True时，哈希不匹配的调用退而使用同类型中下一条未使用的录制(提示词有细微变化时仍可重放)
+    """
+
+    def __init__(self, path: str, mode: str = MODE_REPLAY, tolerant: bool = False,
+                 replay_latency: bool = False):
+        if mode not in (MODE_RECORD, MODE_REPLAY):
+            raise ValueError(f"未知的录制模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.tolerant = tolerant
+        self.replay_latency = replay_latency  # 重放时按录制的耗时等待
+        self.calls = []
+        self.actions = []
+        self.hits = 0
+        self.tolerant_hits = 0
+        self.misses = 0
+        self._file = None
+        self._by_key = defaultdict(deque)
+        self._by_type = defaultdict(deque)
+        self._used = set()
+        if mode == MODE_RECORD:
+            self._file = open(path, "w", encoding="utf-8")
+            self._write({"type": "header", "format": CASSETTE_FORMAT,
+                         "created": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        else:
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry["type"] == "call":
+                    index = len(self.calls)
+                    self.calls.append(entry)
+                    self._by_key[(entry["call_type"], entry["prompt_hash"])].append(index)
+                    self._by_type[entry["call_type"]].append(index)
+                elif entry["type"] == "action":
+                    self.actions.append(entry)
+
+    # 录制
+
+    def record_call(self, call_type: str, prompt: str, params: dict, reply: LLMReply, latency: float):
+        if self.mode != MODE_RECORD:
+            return
+        self._write({
+            "type": "call",
+            "seq": len(self.calls),
+            "call_type": call_type,
+            "prompt_hash": prompt_hash(prompt),
+            "prompt": prompt,
+            "params": {k: v for k, v in params.items() if k != "messages"},
+            "content": reply.content,
+            "reasoning_content": reply.reasoning_content,
+            "usage": asdict(reply.usage) if reply.usage is not None else None,
+            "latency": round(latency, 4),
+        })
+        self.calls.append(None)  # 只计数，录制时不在内存中保留
+
+    def record_action(self, action: str, **data):
+        if self.mode != MODE_RECORD:
+            return
+        entry = {"type": "action", "action": action, "call_seq": len(self.calls)}
+        entry.update(data)
+        self._write(entry)
+        self.actions.append(entry)
+
+    # 重放
+
+    def _take(self, queue: deque):
+        """取出队列中第一条未使用的录制"""
+        while queue:
+            index = queue.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return self.calls[index]
+        return None
+
+    def replay_call(self, call_type: str, prompt: str) -> LLMReply:
+        """返回匹配的录制回复，找不到时抛出CassetteMiss"""
+        key_hash = prompt_hash(prompt)
+        entry = self._take(self._by_key[(call_type, key_hash)])
+        if entry is not None:
+            self.hits += 1
+        elif self.tolerant:
+            entry = self._take(self._by_type[call_type])
+            if entry is not None:
+                self.tolerant_hits += 1
+        if entry is None:
+            self.misses += 1
+            raise CassetteMiss(f"录制中没有匹配的{call_type}调用(提示词哈希{key_hash})")
+        if self.replay_latency:
+            time.sleep(entry.get("latency", 0))
+        usage = entry.get("usage")
+        return LLMReply(entry.get("content") or "", entry.get("reasoning_content") or "",
+                        TokenUsage(**usage) if usage is not None else None)
+
+    def stats(self) -> dict:
+        return {"calls": len(self.calls), "actions": len(self.actions), "hits": self.hits,
+                "tolerant_hits": self.tolerant_hits, "misses": self.misses}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,191 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# AI指令处理：按指令名分派到注册的处理函数，整批校验后一次性应用
+from config import COLOR_GREEN, COLOR_RED, COLOR_RESET
+from events import (ITEM_ADD, ITEM_REMOVE, ITEM_FIX_NAMES, ATTR_CHANGE, SITUATION_CHANGE, VAR_SET, VAR_DEL,
+                    GAMEOVER, SOURCE_LLM, SOURCE_SYSTEM, EventState, capture_event_base, make_event,
+                    apply_event, fix_item_names)
+from engine_io import EVENT_WARNING
+
+
+class CommandError(ValueError):
+    """指令格式错误(整批指令都不会被应用)"""
+
+
+class CommandSkipped(Exception):
+    """指令格式正确但不产生效果(如移除不存在的道具)，只跳过该条指令"""
+
+
+# 指令名 -> (处理函数, value允许的类型; None表示不需要value)
+COMMAND_HANDLERS = {}
+
+
+def command_handler(name: str, value_types=None):
+    """注册指令处理函数：handler(state, command, value) -> [(事件类型, 事件数据), ...]"""
+    def decorator(func):
+        COMMAND_HANDLERS[name] = (func, value_types)
+        return func
+    return decorator
+
+
+def validate_command(command):
+    """校验指令的基本格式，返回(处理函数, value)"""
+    if not isinstance(command, dict):
+        raise CommandError(f"指令不是对象: {command}")
+    name = command.get("command")
+    if name not in COMMAND_HANDLERS:
+        raise CommandSkipped(f"未知指令【{name}】")
+    handler, value_types = COMMAND_HANDLERS[name]
+    value = command.get("value")
+    if value_types is not None:
+        if value is None or value == "" or value == {}:
+            raise CommandError(f"指令{name}未提供value: {command}")
+        if not isinstance(value, value_types):
+            raise CommandError(f"指令{name}的value类型错误: {command}")
+    return handler, value
+
+
+@command_handler("add_item", (dict, str))
+def _add_item(state, command, value):
+    if isinstance(value, dict):
+        item_name, item_desc = next(iter(value.items()))
+    else:
+        item_name, item_desc = value, '无描述'
+        # 对错误地将字典转换为字符串而作为物品名的物品进行修复
+        if item_name.startswith('{') and item_name.endswith('}'):
+            parts = item_name[1:-1].split(':')
+            if len(parts) != 2:
+                raise CommandError(f"无法解析道具信息: {command}")
+            # 去除首尾可能的引号
+            item_name = parts[0].strip('"').strip("'")
+            item_desc = parts[1].strip('"').strip("'")
+    # 如果已经有这个道具就不添加
+    if item_name in state.inventory:
+        return []
+    return [(ITEM_ADD, {"name": item_name, "desc": item_desc, "location": "inventory"})]
+
+
+@command_handler("remove_item", (str,))
+def _remove_item(state, command, value):
+    if value not in state.inventory:
+        raise CommandSkipped(f"移除时玩家没有道具【{value}】{command}")
+    return [(ITEM_REMOVE, {"name": value, "location": "inventory"})]
+
+
+@command_handler("change_attr", (dict,))
+def _change_attr(state, command, value):
+    # value: 对象{"属性名": "属性值"}，属性名为力量 STR 敏捷 DEX 智力 INT 感知 WIS 魅力 CHA中的一个，属性值可以是负数。
+    if len(value) != 1:
+        raise CommandError(f"改变属性时提供的信息格式错误{command}")
+    attribute_name, attribute_value = next(iter(value.items()))
+    try:
+        attribute_value = float(attribute_value)
+    except (ValueError, TypeError) as e:
+        raise CommandError(f"属性变化值不是数字{command}") from e
+    if attribute_name not in state.character_attributes:
+        raise CommandSkipped(f"改变属性时玩家没有属性【{attribute_name}】{command}")
+    return [(ATTR_CHANGE, {"attr": attribute_name, "delta": attribute_value, "desc": command.get("desc", "")})]
+
+
+@command_handler("change_situation", (int, str))
+def _change_situation(state, command, value):
+    if isinstance(value, str):
+        if not ((value.startswith(("+", "-")) and value[1:].isdigit()) or value.isdigit()):
+            raise CommandError(f"改变形势值时提供的信息格式错误{command}")
+        value = int(value)
+    if isinstance(value, bool):
+        raise CommandError(f"改变形势值时提供的信息格式错误{command}")
+    return [(SITUATION_CHANGE, {"delta": value})]
+
+
+@command_handler("gameover")
+def _gameover(state, command, value):
+    return [(GAMEOVER, {})]
+
+
+@command_handler("set_var", (dict,))
+def _set_var(state, command, value):
+    # 支持一次设置多个变量
+    return [(VAR_SET, {"vars": dict(value)})]
+
+
+@command_handler("del_var", (str, int, float))
+def _del_var(state, command, value):
+    var_name = str(value)
+    if var_name not in state.variables:
+        raise CommandSkipped(f"删除变量时玩家没有变量【{var_name}】{command}")
+    return [(VAR_DEL, {"name": var_name})]
+
+
+def plan_commands(engine, commands: list):
+    """
+    在状态副本上依次校验并试应用一批指令，返回[(事件类型, 来源, 事件数据)]与警告列表
+    任一指令格式错误时抛出CommandError
+    """
+    if not isinstance(commands, list):
+        raise CommandError(f"指令列表格式错误: {commands}")
+    state = EventState(capture_event_base(engine))
+    planned, warnings = [], []
+
+    def stage(kind, source, data):
+        apply_event(state, make_event(0, kind, source, **data))
+        planned.append((kind, source, data))
+
+    # 物品名修复整批只做一次
+    if any(isinstance(c, dict) and c.get("command") == "add_item" for c in commands):
+        if list(fix_item_names(state.inventory).items()) != list(state.inventory.items()):
+            stage(ITEM_FIX_NAMES, SOURCE_SYSTEM, {})
+    for command in commands:
+        try:
+            handler, value = validate_command(command)
+            events = handler(state, command, value)
+        except CommandSkipped as e:
+            warnings.append(str(e))
+            continue
+        for kind, data in events:
+            stage(kind, SOURCE_LLM, data)
+        # 游戏结束后的指令不再处理
+        if any(kind == GAMEOVER for kind, _ in events):
+            break
+    return planned, warnings
+
+
+def coalesce_messages(engine, planned: list) -> list:
+    """将一批事件合并为少量提示消息(同类变化只显示一条)"""
+    gained, lost, attrs = [], [], {}
+    for kind, _, data in planned:
+        if kind == ITEM_ADD:
+            gained.append(data["name"])
+        elif kind == ITEM_REMOVE:
+            lost.append(data["name"])
+        elif kind == ATTR_CHANGE:
+            delta, descs = attrs.get(data["attr"], (0.0, []))
+            if data["desc"]:
+                descs.append(data["desc"])
+            attrs[data["attr"]] = (delta + data["delta"], descs)
+    messages = []
+    if gained:
+        messages.append(f"{COLOR_GREEN}你获得了道具{'、'.join(gained)}{COLOR_RESET}")
+    if lost:
+        messages.append(f"{COLOR_RED}你失去了道具{'、'.join(lost)}{COLOR_RESET}")
+    for attr, (delta, descs) in attrs.items():
+        reason = "因为" + "、".join(descs) + "而" if descs else ""
+        color = COLOR_GREEN if delta > 0 else COLOR_RED
+        messages.append(
+            f"{color}{engine.custom_config.player_name}的属性{attr}{reason}变动{delta:+}(总{engine.character_attributes[attr]}){COLOR_RESET}")
+    return messages
+
+
+def apply_commands(engine, commands: list, plan=None) -> list:
+    """
+    整批应用指令：全部校验通过后才记录事件并修改状态，返回应用的事件
+    任一指令格式错误时整批放弃并抛出CommandError
+    plan为之前对同一状态调用plan_commands的结果时直接应用，不再重复校验
+    """
+    planned, warnings = plan if plan is not None else plan_commands(engine, commands)
+    for warning in warnings:
+        engine.io.emit(EVENT_WARNING, f"[警告]:{warning}")
+    applied = [engine.record_event(kind, source, **data)
+               for kind, source, data in planned]
+    engine.message_queue.extend(coalesce_messages(engine, planned))
+    return applied
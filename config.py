@@ -4,6 +4,8 @@
 import os
 import json
 from datetime import datetime
+from render_cache import RenderCache
+from animes import TYPEWRITER_SPEED, CHECK_PRESENTATIONS
 
 LOG_DIR = "logs"
 CURRENT_TIME = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -48,6 +50,8 @@ class CustomConfig:
     def __init__(self):
         # 从JSON文件加载配置
         self.config_data = self._load_config()
+        # 自定义提示词的渲染缓存
+        self.render_cache = RenderCache()
 
         # AI调用相关
         self.max_tokens = self.config_data.get(
@@ -78,6 +82,18 @@ class CustomConfig:
         self.player_story = self.config_data.get(
             "player_settings", {}).get("player_story", "")
 
+        # 存档相关(json: 每局一个目录的JSON文件; sqlite: 单个SQLite数据库)
+        self.save_backend = self.config_data.get(
+            "save_settings", {}).get("backend", "json")
+
+        # 显示相关(打字机速度: 字/秒，0为直接输出全文；检定显示方式: full/compressed/instant)
+        self.typewriter_speed = self.config_data.get(
+            "display_settings", {}).get("typewriter_speed", TYPEWRITER_SPEED)
+        self.check_presentation = self.config_data.get(
+            "display_settings", {}).get("check_presentation", CHECK_PRESENTATIONS[0])
+        if self.check_presentation not in CHECK_PRESENTATIONS:
+            self.check_presentation = CHECK_PRESENTATIONS[0]
+
         # LLM API 配置：参考config目录下面的配置即可
         self.llm_api_config = self._load_llm_api_config()
         self.api_providers = self._convert_api_providers_to_dict()
@@ -118,6 +134,10 @@ class CustomConfig:
                     "api_key": provider_info.get("api_key", ""),
                     "model": provider_info.get("model", "")
                 }
+                # 可选：同时发往该提供商的请求数上限
+                if "max_concurrency" in provider_info:
+                    providers_dict[int(key)]["max_concurrency"] = int(
+                        provider_info["max_concurrency"])
         except (json.JSONDecodeError, ValueError, TypeError) as e:
             print(f"转换API提供商配置时出错: {e}")
             input("按任意键继续...")
@@ -157,7 +177,14 @@ class CustomConfig:
                         "player_name": "玩家",
                         "player_story": ""
                     },
-                    "custom_prompts": ""
+                    "custom_prompts": "",
+                    "save_settings": {
+                        "backend": "json"
+                    },
+                    "display_settings": {
+                        "typewriter_speed": TYPEWRITER_SPEED,
+                        "check_presentation": CHECK_PRESENTATIONS[0]
+                    }
                 }
                 self._save_json_file(CONFIG_FILE, default_config)
                 return default_config
@@ -192,7 +219,14 @@ class CustomConfig:
                 "player_name": self.player_name,
                 "player_story": self.player_story
             },
-            "custom_prompts": self.custom_prompts
+            "custom_prompts": self.custom_prompts,
+            "save_settings": {
+                "backend": self.save_backend
+            },
+            "display_settings": {
+                "typewriter_speed": self.typewriter_speed,
+                "check_presentation": self.check_presentation
+            }
         }
         self._save_json_file(CONFIG_FILE, config_data)
 
@@ -225,5 +259,7 @@ class CustomConfig:
         return preference_prompt
 
     def get_custom_prompt(self):
-        """获取自定义提示词"""
-        return "下面是用户的自定义提示词,你应该严格遵守:\n"+self.custom_prompts+self.get_preference_prompt()
+        """获取自定义提示词(自定义提示词与偏好不变时直接复用)"""
+        key = (self.custom_prompts, self.porn_value, self.violence_value,
+               self.blood_value, self.horror_value)
+        return self.render_cache.get("custom_prompt", key, lambda: "下面是用户的自定义提示词,你应该严格遵守:\n"+self.custom_prompts+self.get_preference_prompt())
@@ -0,0 +1,181 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 状态容器：带版本号的字典与按编号访问的背包/仓库
+import bisect
+import itertools
+
+_versions = itertools.count(1)
+
+
+def next_version() -> int:
+    """分配一个新的全局版本号"""
+    return next(_versions)
+
+
+class TrackedDict(dict):
+    """
+    每次修改都会更新版本号的字典(仍是dict，可直接JSON序列化)
+    用于判断状态自上一快照以来是否变化
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = next(_versions)
+
+    def _touch(self):
+        self.version = next(_versions)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._touch()
+
+    def __ior__(self, other):
+        super().__ior__(other)
+        self._touch()
+        return self
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._touch()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._touch()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._touch()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._touch()
+        return super().setdefault(key, default)
+
+
+class Inventory(TrackedDict):
+    """
+    背包/仓库：按获得顺序保存的 {物品名: 描述}，存档格式与普通字典相同
+    额外维护按获得序号排序的物品名列表，按编号取物品为O(1)；
+    增删物品时用二分查找定位序号，原地插入/移除对应的物品名，不会整体重建
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._next_seq = 0
+        self._order = {}  # 物品名 -> 获得序号
+        self._seqs = []  # 有序的获得序号
+        self._keys = []  # 与_seqs一一对应的物品名
+        for key in self:
+            self._track(key)
+
+    def _track(self, key):
+        """记录新获得的物品(序号递增，插入位置即为末尾)"""
+        seq = self._next_seq
+        self._next_seq += 1
+        self._order[key] = seq
+        pos = bisect.bisect_right(self._seqs, seq)
+        self._seqs.insert(pos, seq)
+        self._keys.insert(pos, key)
+
+    def _untrack(self, key):
+        """移除物品：按获得序号二分定位其在列表中的位置"""
+        seq = self._order.pop(key)
+        pos = bisect.bisect_left(self._seqs, seq)
+        del self._seqs[pos]
+        del self._keys[pos]
+
+    def _track_added(self, old_len: int):
+        """批量更新后记录新增的物品(dict新增的键总在末尾)"""
+        added = list(itertools.islice(reversed(self), len(self) - old_len))
+        for key in reversed(added):
+            self._track(key)
+
+    def __setitem__(self, key, value):
+        is_new = key not in self
+        super().__setitem__(key, value)
+        if is_new:
+            self._track(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._untrack(key)
+
+    def __ior__(self, other):
+        old_len = len(self)
+        super().__ior__(other)
+        self._track_added(old_len)
+        return self
+
+    def pop(self, key, *args):
+        had_key = key in self
+        value = super().pop(key, *args)
+        if had_key:
+            self._untrack(key)
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._untrack(item[0])
+        return item
+
+    def clear(self):
+        super().clear()
+        self._order.clear()
+        self._seqs.clear()
+        self._keys.clear()
+
+    def update(self, *args, **kwargs):
+        old_len = len(self)
+        super().update(*args, **kwargs)
+        self._track_added(old_len)
+
+    def setdefault(self, key, default=None):
+        is_new = key not in self
+        value = super().setdefault(key, default)
+        if is_new:
+            self._track(key)
+        return value
+
+    def key_at(self, index: int) -> str:
+        """第index个(从0开始，可为负数)物品的名称"""
+        return self._keys[index]
+
+    def keys_range(self, start=None, stop=None) -> list:
+        """按获得顺序切片的物品名列表"""
+        return self._keys[start:stop]
+
+    def items_range(self, start=None, stop=None) -> list:
+        """按获得顺序切片的(物品名, 描述)列表"""
+        return [(name, self[name]) for name in self._keys[start:stop]]
+
+    def resolve(self, token: str):
+        """将玩家输入的编号(从1开始)或物品名解析为物品名，不存在时返回None"""
+        token = str(token)
+        if token.isdigit() and 1 <= int(token) <= len(self):
+            return self._keys[int(token) - 1]
+        return token if token in self else None
+
+    def resolve_many(self, tokens) -> list:
+        """
+        批量解析编号/物品名，返回[(输入, 物品名或None)]
+        全部按解析前的编号计算，不受之后移动/删除物品的影响
+        """
+        return [(token, self.resolve(token)) for token in tokens]
+
+    def move_items(self, names, target: dict):
+        """将names中的物品按顺序移动到target末尾"""
+        for name in names:
+            target[name] = super().pop(name)
+            self._untrack(name)
+        if names:
+            self._touch()
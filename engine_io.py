@@ -0,0 +1,182 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 引擎的输入输出接口：引擎不直接调用print()/input()，而是向注入的EngineIO发送事件、请求决定
+# TerminalIO为终端下的默认实现(与原先的行为一致)，HeadlessIO用于无界面运行(自动做默认选择并记录事件)
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from animes import SyncLoadingAnimation, STATUS, play_checks_in_background, show_check_results
+
+# 事件类型
+EVENT_INFO = "info"                # 一般提示
+EVENT_WARNING = "warning"          # 警告(如跳过的指令、解析失败)
+EVENT_ERROR = "error"              # 错误(如AI调用失败)
+EVENT_MESSAGE = "message"          # 游戏消息队列中的消息(获得道具、属性变化等)
+EVENT_TOKEN_USAGE = "token_usage"  # 一次AI调用的Token用量(usage)
+EVENT_CHECK = "check"              # 检定掷骰(rolls)
+EVENT_GAMEOVER = "gameover"        # 游戏结束
+EVENT_PAUSE = "pause"              # 需要玩家确认才继续(HeadlessIO记录)
+EVENT_RETRY = "retry"              # 失败后询问是否重试(HeadlessIO记录，retry为是否重试)
+
+# 无界面运行时每处失败最多重试的次数
+HEADLESS_MAX_RETRIES = 3
+# 无界面运行时保留的事件数
+HEADLESS_EVENT_LIMIT = 10000
+
+
+class RetryExhausted(RuntimeError):
+    """放弃重试(无界面运行时重试次数用尽)"""
+
+
+class _Done:
+    """已经完成的掷骰显示(与animes.CheckPlayback一样可以join/finish)"""
+
+    def join(self, timeout=None):
+        return None
+
+    def finish(self):
+        return None
+
+
+class EngineIO(ABC):
+    """
+    引擎的输入输出接口
+    emit为事件出口；pause/retry为需要玩家决定时的回调(子类必须实现)；start_status/stop_status控制等待动画
+    """
+
+    @abstractmethod
+    def emit(self, kind: str, text: str = "", **data) -> None:
+        """输出一个事件(text为终端下显示的文本，data为结构化数据)"""
+
+    @abstractmethod
+    def pause(self, message: str) -> None:
+        """需要玩家确认后才继续(原"按任意键继续")"""
+
+    @abstractmethod
+    def retry(self, message: str, attempt: int = 1) -> bool:
+        """第attempt次失败后是否重试；返回False时引擎抛出RetryExhausted"""
+
+    def start_status(self, message: str, animation_type: str = "spinner") -> None:
+        """显示(替换)等待状态"""
+
+    def stop_status(self) -> None:
+        """清除等待状态"""
+
+    def play_checks(self, rolls: list, presentation: str, then_status=None):
+        """
+        显示已算出结果的掷骰，可与之后的AI请求同时进行
+        then_status为(message, animation_type)时，显示完后若仍在等待AI响应则开始该等待状态
+        返回的对象：AI响应后调用finish(剩余动画直接显示结果)，不与AI请求并行时调用join等待完整显示
+        """
+        self.emit(EVENT_CHECK, rolls=list(rolls))
+        if then_status:
+            self.start_status(*then_status)
+        return _Done()
+
+
+class _TerminalChecks:
+    """TerminalIO中播放的掷骰：结束后输出播放期间暂存的文本"""
+
+    def __init__(self, io: "TerminalIO"):
+        self.io = io
+
+    def join(self, timeout=None):
+        self.io.end_checks(cut=False, timeout=timeout)
+
+    def finish(self):
+        self.io.end_checks(cut=True)
+
+
+class TerminalIO(EngineIO):
+    """
+    终端下的默认实现：打印事件，用input()等待玩家，用状态行显示等待动画
+    掷骰动画播放期间的文本(Token统计、警告等)暂存到动画结束后输出；需要玩家输入时先结束动画
+    """
+
+    def __init__(self):
+        self.loader = SyncLoadingAnimation()
+        self._checks = None  # 正在播放的掷骰(animes.CheckPlayback)
+        self._held = []  # 掷骰播放期间暂存的文本
+
+    def emit(self, kind: str, text: str = "", **data) -> None:
+        if kind == EVENT_GAMEOVER:
+            self.end_checks()
+            self.loader.start_animation("dot", message=text)
+            time.sleep(4)
+            self.loader.stop_animation()
+        elif kind == EVENT_CHECK:
+            show_check_results(data["rolls"])
+        elif text:
+            if self._checks is not None:
+                self._held.append(text)
+            else:
+                STATUS.print(text)
+
+    def pause(self, message: str) -> None:
+        self.end_checks()
+        self.loader.stop_animation()
+        input(message)
+
+    def retry(self, message: str, attempt: int = 1) -> bool:
+        self.end_checks()
+        self.loader.stop_animation()
+        input(message)
+        return True
+
+    def start_status(self, message: str, animation_type: str = "spinner") -> None:
+        self.loader.start_animation(animation_type, message=message)
+
+    def stop_status(self) -> None:
+        self.loader.stop_animation()
+
+    def play_checks(self, rolls: list, presentation: str, then_status=None):
+        self.end_checks()
+        then = (lambda: self.start_status(*then_status)) if then_status else None
+        self._checks = play_checks_in_background(rolls, presentation, then=then)
+        return _TerminalChecks(self)
+
+    def end_checks(self, cut: bool = True, timeout=None) -> None:
+        """结束正在播放的掷骰(cut为False时等待完整播放)，之后输出暂存的文本"""
+        checks, self._checks = self._checks, None
+        if checks is not None:
+            if cut:
+                checks.finish()
+            else:
+                checks.join(timeout)
+        held, self._held = self._held, []
+        for text in held:
+            STATUS.print(text)
+
+
+class HeadlessIO(EngineIO):
+    """
+    无界面实现：不输出也不等待，事件记录在events中
+    需要确认时直接继续；失败时最多重试max_retries次，之后放弃
+    """
+
+    def __init__(self, max_retries: int = HEADLESS_MAX_RETRIES,
+                 event_limit: int = HEADLESS_EVENT_LIMIT):
+        self.max_retries = max_retries
+        self.events = deque(maxlen=event_limit)
+
+    def emit(self, kind: str, text: str = "", **data) -> None:
+        event = {"kind": kind, "text": text}
+        event.update(data)
+        self.events.append(event)
+
+    def pause(self, message: str) -> None:
+        self.emit(EVENT_PAUSE, message)
+
+    def retry(self, message: str, attempt: int = 1) -> bool:
+        ok = attempt <= self.max_retries
+        self.emit(EVENT_RETRY, message, attempt=attempt, retry=ok)
+        return ok
+
+    def drain(self) -> list:
+        """取出并清空已记录的事件(逐个取出，可与其他线程的emit同时进行而不丢失事件)"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.popleft())
+            except IndexError:
+                return events
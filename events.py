@@ -0,0 +1,144 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 状态事件：AI指令与玩家操作对背包、仓库、变量、属性、形势的每次修改都记录为带回合号的事件，
+# 从初始状态依次应用全部事件即可重建当前状态
+from collections import Counter
+from containers import Inventory
+
+# 事件类型及其数据字段
+ITEM_ADD = "item_add"                  # name, desc, location(inventory/repository)
+ITEM_REMOVE = "item_remove"            # name, location
+ITEM_MOVE = "item_move"                # names, to(inventory/repository)
+ITEM_RENAME = "item_rename"            # name, new_name
+ITEM_REDESC = "item_redesc"            # name, desc
+ITEM_FIX_NAMES = "item_fix_names"      # 修复背包中格式错误的物品名
+ATTR_CHANGE = "attr_change"            # attr, delta
+ATTR_SET = "attr_set"                  # attrs
+SITUATION_CHANGE = "situation_change"  # delta
+VAR_SET = "var_set"                    # vars
+VAR_DEL = "var_del"                    # name
+GAMEOVER = "gameover"
+
+# 事件来源
+SOURCE_LLM = "llm"
+SOURCE_PLAYER = "player"
+SOURCE_SYSTEM = "system"
+
+# 由事件维护的状态字段
+EVENT_STATE_FIELDS = ("inventory", "item_repository", "variables",
+                      "character_attributes", "situation", "current_game_status")
+# 物品位置对应的状态字段
+ITEM_LOCATIONS = {"inventory": "inventory", "repository": "item_repository"}
+
+
+def make_event(turn: int, kind: str, source: str = SOURCE_LLM, **data) -> dict:
+    """构造事件(以字典保存，可直接写入存档)"""
+    event = {"turn": turn, "type": kind, "source": source}
+    event.update(data)
+    return event
+
+
+def fix_item_names(inventory: dict) -> dict:
+    """修复物品名中的错误(如整个字典被转换成字符串作为物品名)，返回修复后的新字典"""
+    fixed_dict = {}
+    for item in inventory.keys():
+        if inventory[item] != "无描述":
+            fixed_dict[item] = inventory[item]
+            continue
+        cur_texts = []
+        name = ""
+        for i in item:
+            if i == ':':
+                name = "".join(cur_texts)
+                cur_texts = []
+                continue
+            if i not in ['"', "'", '{', '}']:
+                cur_texts.append(i)
+        # 如果无道具名但有描述，则描述去除逗号、句号作为道具名
+        if name == "" and not cur_texts:
+            name = "".join(cur_texts).replace(',', '').replace(
+                '.', '').replace('，', '').replace('。', '')
+            cur_texts = ["无描述"]
+        fixed_dict[name] = "".join(cur_texts)
+    return fixed_dict
+
+
+def apply_event(state, event: dict):
+    """
+    将事件应用到state(GameEngine或EventState，具有EVENT_STATE_FIELDS中的属性)
+    事件在记录前已校验过，这里不再检查合法性
+    """
+    kind = event["type"]
+    if kind == ITEM_ADD:
+        getattr(state, ITEM_LOCATIONS[event["location"]])[
+            event["name"]] = event["desc"]
+    elif kind == ITEM_REMOVE:
+        del getattr(state, ITEM_LOCATIONS[event["location"]])[event["name"]]
+    elif kind == ITEM_MOVE:
+        if event["to"] == "repository":
+            source, target = state.inventory, state.item_repository
+        else:
+            source, target = state.item_repository, state.inventory
+        source.move_items(event["names"], target)
+    elif kind == ITEM_RENAME:
+        state.inventory[event["new_name"]] = state.inventory.pop(event["name"])
+    elif kind == ITEM_REDESC:
+        state.inventory[event["name"]] = event["desc"]
+    elif kind == ITEM_FIX_NAMES:
+        state.inventory = Inventory(fix_item_names(state.inventory))
+    elif kind == ATTR_CHANGE:
+        state.character_attributes[event["attr"]] += event["delta"]
+    elif kind == ATTR_SET:
+        state.character_attributes.update(event["attrs"])
+    elif kind == SITUATION_CHANGE:
+        state.situation = max(0, min(state.situation + event["delta"], 10))
+    elif kind == VAR_SET:
+        state.variables.update(event["vars"])
+    elif kind == VAR_DEL:
+        del state.variables[event["name"]]
+    elif kind == GAMEOVER:
+        state.current_game_status = "failure"
+    else:
+        raise ValueError(f"未知的事件类型: {kind}")
+
+
+class EventState:
+    """由事件重建出的状态"""
+
+    def __init__(self, base: dict):
+        self.inventory = Inventory(base["inventory"])
+        self.item_repository = Inventory(base["item_repository"])
+        self.variables = dict(base["variables"])
+        self.character_attributes = dict(base["character_attributes"])
+        self.situation = base["situation"]
+        self.current_game_status = base["current_game_status"]
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in EVENT_STATE_FIELDS}
+
+
+def capture_event_base(state) -> dict:
+    """记录state当前的状态，作为之后事件的起点"""
+    base = {field: getattr(state, field) for field in EVENT_STATE_FIELDS}
+    for field in ("inventory", "item_repository", "variables", "character_attributes"):
+        base[field] = dict(base[field])
+    return base
+
+
+def fold_events(base: dict, events) -> EventState:
+    """从起点状态依次应用事件，得到重建的状态"""
+    state = EventState(base)
+    for event in events:
+        apply_event(state, event)
+    return state
+
+
+def diff_state(state, rebuilt: EventState) -> list:
+    """比较当前状态与事件重建的状态，返回不一致的字段"""
+    return [field for field in EVENT_STATE_FIELDS
+            if getattr(state, field) != getattr(rebuilt, field)]
+
+
+def summarize_events(events) -> Counter:
+    """按(来源, 类型)统计事件数"""
+    return Counter((event["source"], event["type"]) for event in events)
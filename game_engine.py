@@ -1,6 +1,7 @@
 # Copyright (c) 2025 [687jsassd]
 # MIT License
 # 游戏引擎
+import os
 import json
 import time
 import random
@@ -11,7 +12,21 @@ import openai
 from json_repair import repair_json
 from config import CustomConfig, COLOR_CYAN, COLOR_RESET, COLOR_RED, COLOR_GREEN, COLOR_YELLOW, COLOR_BLUE, COLOR_MAGENTA
 from prompt_manager import PromptManager
-from animes import SyncLoadingAnimation, probability_check_animation
+from rewind import RewindRing
+from containers import TrackedDict, Inventory
+from render_cache import RenderCache, state_version
+from render import strip_ansi
+from save_format import MAIN_BRANCH
+from events import (ITEM_FIX_NAMES, GAMEOVER, SOURCE_LLM, SOURCE_SYSTEM, SOURCE_PLAYER, make_event, apply_event,
+                    capture_event_base, fold_events, fix_item_names)
+from commands import CommandError, apply_commands, plan_commands
+from response_parser import extract_json_span, parse_json_response
+from records import Option, TurnRecord, TokenUsage, CheckRoll, LLMReply
+from cassette import (CALL_STORY, CALL_ACTION_MODE, CALL_THINK, CALL_USE_ITEM, CALL_SUMMARY,
+                      ACTION_START, ACTION_GO, ACTION_THINK, ACTION_USE_ITEM, ACTION_EVENT)
+from llm_pool import PROVIDER_POOL
+from engine_io import (EngineIO, TerminalIO, RetryExhausted, EVENT_INFO, EVENT_WARNING, EVENT_ERROR, EVENT_MESSAGE,
+                       EVENT_TOKEN_USAGE, EVENT_GAMEOVER)
 
 
 class GameEngine:
@@ -19,9 +34,11 @@ class GameEngine:
     游戏引擎
     """
 
-    def __init__(self, custom_config: Optional[CustomConfig] = None):
+    def __init__(self, custom_config: Optional[CustomConfig] = None, io: Optional[EngineIO] = None):
         # 基础部分
         self.game_id = ''
+        self.branch_id = MAIN_BRANCH  # 分支名
+        self.branch_from = None  # 分出本分支的位置 {"branch": 原分支, "turn": 回合数}
         self.prompt_manager = PromptManager()
         self.current_response = ""
         # self.conversation_history = [] #因大小过大，暂时弃用
@@ -47,20 +64,20 @@ class GameEngine:
         self.player_name = self.custom_config.player_name
         self.prompt_manager.prompts_sections["user_story"] = self.custom_config.player_story
 
-        # 动画
-        self.anime_loader = SyncLoadingAnimation()
+        # 输入输出(事件输出、等待动画与需要玩家决定时的回调)
+        self.io = io or TerminalIO()
 
         # 拓展-背包与道具(道具格式:{道具名:道具描述})
-        self.inventory = {}
+        self.inventory = Inventory()
         # 拓展-玩家属性
-        self.character_attributes = {
+        self.character_attributes = TrackedDict({
             "STR": 10.0,
             "DEX": 10.0,
             "INT": 10.0,
             "WIS": 10.0,
             "CHA": 10.0,
             "LUK": 10.0,
-        }
+        })
         # 拓展-形势(-10 到 10)
         self.situation = 0
         self.situation_text = {
@@ -85,20 +102,44 @@ class GameEngine:
         self.conclude_summary_cooldown = 10
 
         # 拓展-物品仓库(用于存储物品,不参与剧情)
-        self.item_repository = {}
+        self.item_repository = Inventory()
 
         # 拓展-是否无选项模式
         self.prompt_manager.is_no_options = False
 
         # 拓展-变量表
-        self.variables = {
-        }
+        self.variables = TrackedDict()
+
+        # 拓展-状态事件记录：events_base为起点状态，依次应用events即可重建当前状态
+        self.events = []
+        self.events_base = capture_event_base(self)
+
+        # 拓展-剧情日志已写入的回合数(高水位)；历史被改写后标记为过期，下次写日志时整体重建
+        self.narrative_log_file = ""
+        self.narrative_log_mark = 0
+        self.narrative_log_stale = False
+
+        # 拓展-最近若干回合的状态快照(用于undo/rewind)
+        self.rewind_ring = RewindRing()
+
+        # 拓展-道具/属性/变量/形势文本的渲染缓存(按状态版本失效)
+        self.render_cache = RenderCache()
+
+        # 拓展-AI调用的录制/重放(cassette.Cassette)，为None时直接调用API
+        self.cassette = None
+
+        # 拓展-检定用的随机数：种子随存档保存，每回合由种子与回合数派生新的生成器，
+        # 读档、回退或重放到同一回合时掷骰结果相同
+        self.rng_seed = random.SystemRandom().randrange(2**63)
+        self._rng = None
+        self._rng_turn = None
 
     # 调用AI模型
 
-    def call_ai(self, prompt: str):
+    def call_ai(self, prompt: str, call_type: str = CALL_STORY):
         """
         调用AI模型
+        call_type为调用类型(cassette中的CALL_*)，用于录制/重放
         """
 
         max_tokens = self.custom_config.max_tokens
@@ -107,16 +148,9 @@ class GameEngine:
         presence_penalty = self.custom_config.presence_penalty
 
         provider = self.custom_config.get_current_provider()
-        model_name = provider["model"]
-        api_key = provider["api_key"]
-        base_url = provider["base_url"]
+        model_name = provider.get("model", "")
 
         try:
-            client = openai.OpenAI(
-                api_key=api_key,
-                base_url=base_url,
-            )
-
             # 构建请求参数字典
             params = {
                 "model": model_name,
@@ -134,26 +168,35 @@ class GameEngine:
                 del params["presence_penalty"]
                 params["extra_body"] = {}
 
-            # 调用API
-            response = client.chat.completions.create(**params)
+            if self.cassette is not None and self.cassette.replaying:
+                reply = self.cassette.replay_call(call_type, prompt)
+            else:
+                # 同一提供商共享客户端(复用连接)，并发请求数受限
+                client = PROVIDER_POOL.client(provider)
+                start = time.perf_counter()
+                with PROVIDER_POOL.slot(provider):
+                    response = client.chat.completions.create(**params)
+                reply = LLMReply.from_api(response)
+                if self.cassette is not None:
+                    self.cassette.record_call(
+                        call_type, prompt, params, reply, time.perf_counter() - start)
 
             # 记录token使用情况
-            if hasattr(response, 'usage'):
-                self.total_prompt_tokens += response.usage.prompt_tokens
-                self.l_p_token = response.usage.prompt_tokens
-                self.total_completion_tokens += response.usage.completion_tokens
-                self.l_c_token = response.usage.completion_tokens
-                self.total_tokens += response.usage.total_tokens
-                print(
-                    f"Token消耗 - 提示: {response.usage.prompt_tokens}, 完成: {response.usage.completion_tokens}, 总计: {response.usage.total_tokens}")
-
-            self.current_response = response.choices[0].message.content
+            if reply.usage is not None:
+                usage = reply.usage
+                self.add_token_usage(usage)
+                self.io.emit(
+                    EVENT_TOKEN_USAGE,
+                    f"Token消耗 - 提示: {usage.prompt_tokens}, 完成: {usage.completion_tokens}, 总计: {usage.total_tokens}",
+                    usage=usage, call_type=call_type)
+
+            self.current_response = reply.content
             if self.current_response:
                 # 有响应内容时直接返回
                 return self.current_response
             else:
                 # 此时，可能和reason部分整合到了一起，进行分离
-                self.current_response = response.choices[0].message.reasoning_content
+                self.current_response = reply.reasoning_content
                 if not self.current_response:
                     raise ValueError("AI模型返回空响应")
                 start_idx = self.current_response.find('{')
@@ -163,14 +206,14 @@ class GameEngine:
                     self.current_response = self.current_response[start_idx:end_idx+1]
                     return self.current_response
         except (openai.OpenAIError, ValueError) as e:
-            print(f"调用AI模型时出错: {e}")
-            input("按任意键继续")
-            self.anime_loader.stop_animation()
+            self.io.stop_status()
+            self.io.emit(EVENT_ERROR, f"调用AI模型时出错: {e}")
+            self.io.pause("按任意键继续")
             return None
         except TimeoutError:
-            print("调用AI模型超时(100s)")
-            input("按任意键继续")
-            self.anime_loader.stop_animation()
+            self.io.stop_status()
+            self.io.emit(EVENT_ERROR, "调用AI模型超时(100s)")
+            self.io.pause("按任意键继续")
             return None
 
     # 解析AI响应
@@ -180,47 +223,38 @@ class GameEngine:
         解析AI响应
         """
         json_content = "未解析"
-        # 把中文的引号和冒号、逗号替换为英文
-        response = response.replace("“", '"').replace(
-            "”", '"').replace("：", ":").replace('，', ',')
         try:
-            start_idx = response.find('{')
-            end_idx = response.rfind('}')
-            if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                # 提取完整的JSON部分
-                json_content = response[start_idx:end_idx+1]
-            else:
-                # 如果找不到完整的花括号对，使用原始响应
-                json_content = response
-
-            json_response = json.loads(repair_json(json_content))
+            json_content = extract_json_span(response)
+            # 先严格解析，失败后才规范中文标点、调用json_repair修复
+            json_response, _ = parse_json_response(response)
             while not isinstance(json_response, dict):
-                input(f"未能解析JSON响应??\n {json_response}")
-                if isinstance(json_response, list):
-                    input("列表类型？尝试第一个元素")
+                self.io.pause(f"未能解析JSON响应??\n {json_response}")
+                if isinstance(json_response, list) and json_response:
+                    self.io.pause("列表类型？尝试第一个元素")
                     json_response = json_response[0]
                 elif isinstance(json_response, str):
-                    input("字符串类型？尝试解析为JSON")
+                    self.io.pause("字符串类型？尝试解析为JSON")
                     json_response = json.loads(json_response)
                 else:
-                    input("按任意键重试")
+                    self.io.pause("按任意键重试")
                     return None
+            # 整个响应校验通过后才应用指令与修改状态(解析失败重试时不会重复应用上一次响应的指令)
+            commands = json_response.get("commands")
+            plan = None
             try:
-                # 检查是否有指令(commands),有则执行
-                if json_response.get("commands"):
-                    commands = json_response.get(
-                        "commands", [])
-                    self.handle_command(commands)
+                # 检查是否有指令(commands),有则先在状态副本上试应用
+                if commands:
+                    plan = plan_commands(self, commands)
             except (ValueError, TypeError) as e:
-                print(f"解析指令时出错: {e}")
-                input("已跳过指令处理,按任意键继续解析")
+                self.io.emit(EVENT_WARNING, f"解析指令时出错: {e}")
+                self.io.pause("已跳过指令处理,按任意键继续解析")
 
-            self.current_options = json_response.get("options", [])
-            if not self.current_options and not self.prompt_manager.is_no_options:
-                input(f"未能解析选项?? 按键重试 {json_response}")
+            raw_options = json_response.get("options", [])
+            if not raw_options and not self.prompt_manager.is_no_options:
+                self.io.pause(f"未能解析选项?? 按键重试 {json_response}")
                 return None
             elif self.prompt_manager.is_no_options:
-                self.current_options = [{
+                raw_options = [{
                     "id": 0,
                     "text": "为跳过无选项模式，请使用custom自由输入行动以经过本轮",
                     "type": "must",
@@ -229,182 +263,48 @@ class GameEngine:
                     "base_probability": 0.0,
                     "next_preview": "",
                 }]
-            self.current_description = json_response.get("description", "")
-            if not self.current_description.strip():
-                input(f"未能解析描述?? 按键重试 {json_response}")
+            description = json_response.get("description", "")
+            if not isinstance(description, str) or not description.strip():
+                self.io.pause(f"未能解析描述?? 按键重试 {json_response}")
                 return None
-            if self.current_description:
-                self.history_simple_summaries.append(
-                    json_response.get("summary", ""))
-            # 解析选项({'id': 1, 'text': '选项1', 'type': 'check','main_factor':'STR','base_probability': 0.5,'next_preview': '下一个预览'})
-            tmp = []
-            for option in self.current_options:
+            # 解析选项：校验与规范化只在这里做一次
+            options = []
+            for option in raw_options:
                 try:
-                    tmp.append({
-                        "id": int(option.get("id", 0)),
-                        "text": option.get("text", ""),
-                        "type": option.get("type", "normal"),
-                        "main_factor": option.get("main_factor", ""),
-                        "difficulty": int(option.get("difficulty", 0)),
-                        # 基础概率作为初始概率
-                        "base_probability": option.get("base_probability", 0.0),
-                        "probability": option.get("base_probability", 0.0),
-                        "next_preview": option.get("next_preview", ""),
-                    })
+                    options.append(Option.parse(option))
                 except (ValueError, TypeError) as e:
-                    print(f"解析某选项时出错: {e},选项: {option}")
-                    input("已跳过该选项,按任意键继续解析")
-
-            self.current_options = tmp
-            # 规范化选项，去除不是check但有probability的选项的probability条目
-            for option in self.current_options:
-                if option["type"] != "check":
-                    del option["probability"]
-                if option.get("probability") and option["probability"] in [0, 0.0, "0", "0.0", "", " "]:
-                    del option["probability"]
-                if option.get("probability"):
-                    option["probability"] = float(option["probability"])
-                if option["type"] == "must":
-                    if not option.get("difficulty"):
-                        option["difficulty"] = 0
-                    if not option.get("main_factor"):
-                        option["main_factor"] = "LUK"
-
-            # 美化描述
-            self.current_description = self.colorize(
-                self.current_description)
-            for option in self.current_options:
-                if option["next_preview"]:
-                    option["next_preview"] = self.colorize(
-                        option["next_preview"])
-                # 对选项文本也美化
-                option["text"] = self.colorize(option["text"])
+                    self.io.emit(EVENT_WARNING, f"解析某选项时出错: {e},选项: {option}")
+                    self.io.pause("已跳过该选项,按任意键继续解析")
+
+            if plan is not None:
+                self.handle_command(commands, plan)
+            self.current_description = description
+            self.history_simple_summaries.append(
+                json_response.get("summary", ""))
+            self.current_options = options
 
             return json_response
         except (ValueError, json.JSONDecodeError) as e:
-            print(f"解析AI响应时出错: {e}")
-            print("响应内容:")
-            print(response)
-            print("解析内容:")
-            print(json_content)
-            input("按任意键继续")
+            self.io.emit(EVENT_ERROR, f"解析AI响应时出错: {e}\n响应内容:\n{response}\n解析内容:\n{json_content}",
+                         response=response)
+            self.io.pause("按任意键继续")
             return None
 
     # 指令处理
-    def handle_command(self, commands: list):
+    def handle_command(self, commands: list, plan=None):
         """
-        处理指令
+        处理指令：整批校验后一次性应用，任一指令格式错误时整批不执行(抛出CommandError)
+        plan为已对当前状态做过的plan_commands结果时直接应用
         """
-        for command in commands:
-            if not isinstance(command, dict):
-                input(f'注意：指令{command}出错！\n\n{commands}')
-                continue
-            command_type = command.get("command")
-            value = command.get("value")
-            if command_type == "add_item":
-                if value:
-                    item_info = value  # 是字典
-                    if isinstance(item_info, dict):
-                        item_name, item_desc = list(item_info.keys())[
-                            0], list(item_info.values())[0]
-                    else:
-                        item_name, item_desc = item_info, '无描述'
-                        # 对错误地将字典转换为字符串而作为物品名的物品进行修复
-                        if item_name.startswith('{') and item_name.endswith('}'):
-                            item_name = item_name[1:-1]
-                            # 以:进行分割，获取道具名和道具描述
-                            item_name, item_desc = item_name.split(':')
-                            # 去除首尾可能的引号
-                            item_name = item_name.strip('"').strip("'")
-                            item_desc = item_desc.strip('"').strip("'")
-                    # 调用修复函数，继续深层修复
-                    self.fix_item_name_error()
-                    # 如果已经有这个道具就不添加
-                    if item_name in self.inventory:
-                        return
-                    self.inventory[item_name] = item_desc
-                    # self.history_simple_summaries.append(
-                    #    f"{self.custom_config.player_name}获得了道具{item_name}")
-                    self.message_queue.append(
-                        f"{COLOR_GREEN}你获得了道具{item_name}{COLOR_RESET}")
-                else:
-                    print(f"[警告]:添加道具时未提供道具信息或者信息格式不正确{command}")
-            elif command_type == "remove_item":
-                if value:
-                    if value in self.inventory:
-                        del self.inventory[value]
-                        # self.history_simple_summaries.append(
-                        #    f"{self.custom_config.player_name}失去了道具{value}")
-                        self.message_queue.append(
-                            f"{COLOR_RED}你失去了道具{value}{COLOR_RESET}")
-                    else:
-                        print(f"[警告]:移除时玩家没有道具【{value}】{command}")
-                else:
-                    print(f"[警告]:移除道具时未提供道具信息{command}")
-            elif command_type == "change_attr":
-                # value: 对象{"属性名": "属性值"}，属性名为力量 STR 敏捷 DEX 智力 INT 感知 WIS 魅力 CHA中的一个，属性值可以是负数。
-                if value:
-                    if not isinstance(value, dict) or len(value) != 1:
-                        print("[警告]:改变属性时提供的信息格式错误")
-                        continue
-                    # 解析属性名和属性值
-                    attribute_name, attribute_value = list(value.keys())[
-                        0], float(list(value.values())[0])
-                    desc = command.get("desc", "")
-                    if attribute_name in self.character_attributes:
-                        self.character_attributes[attribute_name] += attribute_value
-                        # self.history_simple_summaries.append(
-                        #    f"{self.custom_config.player_name}的{attribute_name}属性{"因为"+desc+"而" if desc else ""}改变了{attribute_value}")
-                        change_message = f"{self.custom_config.player_name}的属性{attribute_name}{"因为"+desc+"而" if desc else ""}变动{attribute_value:+}(总{self.character_attributes[attribute_name]})"
-                        change_message = COLOR_GREEN + \
-                            f"{change_message}"+COLOR_RESET if attribute_value > 0 else COLOR_RED + \
-                            f"{change_message}"+COLOR_RESET
-                        self.message_queue.append(
-                            change_message)
-                    else:
-                        print(f"[警告]:改变属性时玩家没有属性【{value}】{command}")
-                else:
-                    print(f"[警告]:改变属性时未提供属性信息{command}")
-            elif command_type == "change_situation":
-                if value:
-                    if isinstance(value, str) and ((value.startswith(("+", "-")) and value[1:].isdigit()) or value.isdigit()):
-                        value = int(value)
-                    if not isinstance(value, int):
-                        print(f"[警告]:改变形势值时提供的信息格式错误{command}")
-                        continue
-                    self.situation += value
-                    self.situation = max(0, min(self.situation, 10))
-                else:
-                    print(f"[警告]:改变形势值时未提供形势值信息{command}")
-            elif command_type == "gameover":
-                self.current_game_status = "failure"
-                self.anime_loader.stop_animation()
-                self.anime_loader.start_animation(
-                    "dot", message=COLOR_RED+"游戏结束"+COLOR_RESET)
-                time.sleep(4)
-                self.anime_loader.stop_animation()
-                break
-            elif command_type == "set_var":
-                if value:
-                    print(f"[调试]:设置变量时提供的信息{value}")
-                    if not isinstance(value, dict):
-                        input(f"[警告]:设置变量时提供的信息格式错误{command}")
-                        continue
-                    # 解析变量名和变量值(为多变量设置提供支持)
-                    for var_name, var_value in value.items():
-                        self.variables[var_name] = var_value
-                else:
-                    input(f"[警告]:设置变量时未提供变量信息{command}")
-            elif command_type == "del_var":
-                if value:
-                    # 解析变量名
-                    var_name = str(value)
-                    if var_name in self.variables:
-                        del self.variables[var_name]
-                    else:
-                        print(f"[警告]:删除变量时玩家没有变量【{var_name}】{command}")
-                else:
-                    print(f"[警告]:删除变量时未提供变量信息{command}")
+        applied = apply_commands(self, commands, plan)
+        if any(event["type"] == GAMEOVER for event in applied):
+            self.io.emit(EVENT_GAMEOVER, COLOR_RED+"游戏结束"+COLOR_RESET)
+        return applied
+
+    def _retry(self, message: str, attempt: int):
+        """第attempt次失败后询问是否重试，放弃时抛出RetryExhausted"""
+        if not self.io.retry(message, attempt):
+            raise RetryExhausted(message)
 
     # 开始游戏
 
@@ -412,6 +312,8 @@ class GameEngine:
         """
         开始游戏（第一轮）
         """
+        if self.cassette is not None:
+            self.cassette.record_action(ACTION_START, story=st_story, seed=self.rng_seed)
         init_prompt = self.prompt_manager.get_initial_prompt(
             self.player_name,
             st_story,
@@ -421,13 +323,18 @@ class GameEngine:
         # self.conversation_history.append(
         #    {"role": "user", "content": init_prompt})
         ai_response = self.call_ai(init_prompt)
+        attempt = 0
         while not ai_response:
-            input('无响应内容？任意键重试')
+            attempt += 1
+            self._retry('无响应内容？任意键重试', attempt)
             ai_response = self.call_ai(init_prompt)
         if ai_response:
             ok_sign = self.parse_ai_response(ai_response)
+            attempt = 0
             while not ok_sign:
-                input(f"解析失败，按任意键重试.[注意Token消耗{self.total_tokens}]")
+                attempt += 1
+                self._retry(
+                    f"解析失败，按任意键重试.[注意Token消耗{self.total_tokens}]", attempt)
                 ai_response = self.call_ai(init_prompt)
                 if ai_response:
                     ok_sign = self.parse_ai_response(ai_response)
@@ -440,15 +347,18 @@ class GameEngine:
         """
         进行游戏（后续轮次）
         """
+        if self.cassette is not None:
+            self.cassette.record_action(ACTION_GO, option=option_id, custom=is_custom,
+                                        concluding=is_prompt_concluding)
         if len(self.history_simple_summaries) > self.summary_conclude_val and not is_prompt_concluding and self.conclude_summary_cooldown < 1:
-            self.go_game(option_id, is_custom, True)
+            self.conclude_summary()
         prompt = ""
         if is_prompt_concluding:
             self.conclude_summary()
             return 0
+        rolls = []
         if is_custom:
-            selected_option = {"id": 999,
-                               "text": option_id, "type": "normal", "next_preview": ""}
+            selected_option = Option(id=999, text=option_id)
             # 调用get_action_mode_prompt获取自定义动作的类型等修饰后选项的提示词，对选项进行修饰
             custom_prompt = self.prompt_manager.get_action_mode_prompt(
                 self.player_name,
@@ -462,136 +372,69 @@ class GameEngine:
                 self.custom_config.get_custom_prompt(),
                 self.get_vars_text())
             # 手动解析response，获取type、main_factor、difficulty、base_probability、next_preview并赋予给selected_option
-            self.anime_loader.stop_animation()
-            self.anime_loader.start_animation(
-                "dot", message="等待选项修饰")
-            response = self.call_ai(custom_prompt)
+            self.io.start_status("等待选项修饰", "dot")
+            response = self.call_ai(custom_prompt, CALL_ACTION_MODE)
             self.token_consumes[-1] += self.l_p_token+self.l_c_token
-            self.anime_loader.stop_animation()
+            self.io.stop_status()
             ok_sign = False
+            attempt = 0
             if response:
                 while not ok_sign:
                     try:
                         if not response:
                             raise ValueError("AI响应为空")
                         resp_dict = json.loads(repair_json(response))
-                        selected_option["type"] = resp_dict.get(
-                            "type", "normal")
-                        selected_option["main_factor"] = resp_dict.get(
-                            "main_factor", "LUK")
-                        selected_option["difficulty"] = resp_dict.get(
-                            "difficulty", 0)
-                        selected_option["base_probability"] = resp_dict.get(
-                            "base_probability", 0.3)
-                        selected_option["probability"] = selected_option["base_probability"]
+                        if not isinstance(resp_dict, dict):
+                            raise ValueError(f"行动修饰不是对象: {resp_dict}")
                         # 添加标记，以绕过门槛检测
-                        selected_option["extra"] = "custom_action"
+                        selected_option = Option.parse({
+                            "type": resp_dict.get("type", "normal"),
+                            "main_factor": resp_dict.get("main_factor", "LUK"),
+                            "difficulty": resp_dict.get("difficulty", 0),
+                            "base_probability": resp_dict.get("base_probability", 0.3),
+                        }, id=selected_option.id, text=selected_option.text, extra="custom_action")
                         ok_sign = True
                     except (ValueError, json.JSONDecodeError) as e:
-                        print(f"解析AI响应时出错: {e}")
-                        input(
-                            f"按任意键重试,注意token消耗(本次){self.l_c_token+self.l_p_token}")
-                        print("正在重试...")
-                        response = self.call_ai(custom_prompt)
+                        self.io.emit(EVENT_WARNING, f"解析AI响应时出错: {e}")
+                        attempt += 1
+                        self._retry(
+                            f"按任意键重试,注意token消耗(本次){self.l_c_token+self.l_p_token}", attempt)
+                        self.io.emit(EVENT_INFO, "正在重试...")
+                        response = self.call_ai(custom_prompt, CALL_ACTION_MODE)
 
         else:
             selected_option = next(
-                (opt for opt in self.current_options if int(opt["id"]) == int(option_id)), None)
+                (opt for opt in self.current_options if opt.id == int(option_id)), None)
         if not selected_option:
-            print("无效的选项ID")
+            self.io.emit(EVENT_WARNING, "无效的选项ID")
             return -1
         if selected_option:
-            if selected_option["type"] == "must" and selected_option.get("extra", "") != "custom_action":
-                if self.character_attributes.get(selected_option["main_factor"], 0) < selected_option["difficulty"]:
-                    print(
-                        f"不满足选项要求[{selected_option['main_factor']}≥{selected_option['difficulty']}]")
+            if selected_option.type == "must" and selected_option.extra != "custom_action":
+                if self.character_attributes.get(selected_option.main_factor, 0) < selected_option.difficulty:
+                    self.io.emit(
+                        EVENT_WARNING, f"不满足选项要求[{selected_option.main_factor}≥{selected_option.difficulty}]")
                     return -1
-            elif selected_option["type"] == "must":
+            elif selected_option.type == "must":
                 # 对于自定义操作，我们根据是否达到门槛添加是否成功标识即可，不直接return
-                if self.character_attributes.get(selected_option["main_factor"], 0) >= selected_option["difficulty"]:
-                    selected_option["text"] += COLOR_GREEN + \
-                        "<满足要求-行动成功>"+COLOR_RESET
+                if self.character_attributes.get(selected_option.main_factor, 0) >= selected_option.difficulty:
+                    selected_option.text += "<满足要求-行动成功>"
                 else:
-                    selected_option["text"] += COLOR_RED + \
-                        "<不满足要求-行动失败>"+COLOR_RESET
-            # 处理并检定概率(两次判定:第一次就成功：大成功；第二次:小成功；)
-            if selected_option["type"] == "check":
-                final_chance_mark = False
-                target_prob = selected_option["probability"] + \
-                    (self.character_attributes.get(
-                        selected_option["main_factor"], 0)-selected_option["difficulty"]) * 3 / 2000
-                # 计算形势n影响(若n为正，几率增加0.01*2.2*n**1.25,否则减少0.04*n)
-                situation_factor = self.situation
-                if situation_factor > 0:
-                    target_prob += 0.01*2.2*situation_factor**1.25
-                else:
-                    target_prob += 0.04*situation_factor
-                # 检定成功概率(第一次判定)
-                success_prob = random.uniform(0, 1)
-                print("正在进行第一次检定")
-                probability_check_animation(
-                    success_prob,
-                    target_prob=max(target_prob*0.65, 0.01),
-                    duration=2
-                )
-                if success_prob < max(target_prob*0.65, 0.01):
-                    # 成功
-                    selected_option["text"] += COLOR_GREEN + \
-                        "<检定大成功!>"+COLOR_RESET
-                    print(COLOR_GREEN+"检定大成功! "+COLOR_RESET)
-                else:
-                    print("正在进行第二次检定")
-                    new_success_prob = random.uniform(0, 1)
-                    cur_min = min(new_success_prob, success_prob)
-                    probability_check_animation(
-                        new_success_prob,
-                        target_prob=target_prob,
-                        duration=3
-                    )
-                    if new_success_prob < target_prob:
-                        # 成功
-                        selected_option["text"] += COLOR_YELLOW + \
-                            "<检定小成功>"+COLOR_RESET
-                    else:
-                        # 如果自己的主属性>选项要求+5,则差值的百分比的概率获得最后一次机会
-                        # 目标值是差值的百分比
-                        if self.character_attributes.get(
-                                selected_option["main_factor"], 0)-selected_option["difficulty"] > 5:
-                            last_chance_prob = random.uniform(0, 1)
-                            last_target = (self.character_attributes.get(
-                                selected_option["main_factor"], 0)-selected_option["difficulty"]-5) / 100
-                            if last_chance_prob < last_target:
-                                print(COLOR_MAGENTA+"最后机会"+COLOR_RESET)
-                                last_chance_prob = random.uniform(0, 1)
-                                probability_check_animation(
-                                    last_chance_prob,
-                                    target_prob=last_target,
-                                    duration=2.5
-                                )
-                                if last_chance_prob < last_target:
-                                    selected_option["text"] += COLOR_MAGENTA + \
-                                        "<检定小成功>"+COLOR_RESET
-                                    final_chance_mark = True
-                                else:
-                                    cur_min = min(last_chance_prob, cur_min)
-
-                        if not final_chance_mark and cur_min >= 0.20+target_prob:
-                            selected_option["text"] += COLOR_RED + \
-                                "<检定大失败>"+COLOR_RESET
-                        elif not final_chance_mark:
-                            selected_option["text"] += COLOR_RED + \
-                                "<检定小失败>"+COLOR_RESET
-
-            self.history_choices.append(
-                COLOR_BLUE+selected_option["text"]+COLOR_RESET)
+                    selected_option.text += "<不满足要求-行动失败>"
+            # 处理并检定概率：先算出结果，动画与之后的AI请求同时播放
+            if selected_option.type == "check":
+                tag, rolls = self.roll_option_check(selected_option)
+                selected_option.text += tag
+
+            # 历史中只保存纯文本，颜色在显示时添加
+            self.history_choices.append(selected_option.text)
 
             prompt = self.prompt_manager.get_continuation_prompt(
                 self.player_name,
                 self.current_description,
                 "\n".join(
                     [str(s) for s in self.history_simple_summaries[:-1] if s is not None]),
-                selected_option["text"],
-                selected_option["next_preview"],
+                selected_option.text,
+                selected_option.next_preview,
                 self.custom_config.get_custom_prompt(),
                 self.get_inventory_text_for_prompt(),
                 self.get_attribute_text(),
@@ -603,29 +446,105 @@ class GameEngine:
 
         if not prompt:
             raise ValueError("prompt为空")
-        self.anime_loader.stop_animation()
-        self.anime_loader.start_animation("spinner", message="等待<世界>回应")
+        self.io.stop_status()
+        # 检定动画与AI请求同时进行：动画播放完时仍未响应才显示等待动画，先响应时动画直接显示结果
+        presentation = self.custom_config.check_presentation
+        presenter = self.io.play_checks(
+            rolls, presentation, ("等待<世界>回应", "spinner"))
         ai_response = self.call_ai(prompt)
+        self._end_checks(presenter, presentation)
         if ai_response:
             ok_sign = self.parse_ai_response(ai_response)
+            attempt = 0
             while not ok_sign:
-                input(f"解析失败，按任意键重试.[注意Token消耗{self.total_tokens}]")
+                attempt += 1
+                self._retry(
+                    f"解析失败，按任意键重试.[注意Token消耗{self.total_tokens}]", attempt)
                 ai_response = self.call_ai(prompt)
                 if ai_response:
                     ok_sign = self.parse_ai_response(ai_response)
         self.token_consumes.append(self.l_p_token+self.l_c_token)
         self.conclude_summary_cooldown -= 1
 
-        self.anime_loader.stop_animation()  # type:ignore
+        self.io.stop_status()
         # self.conversation_history.append(
         #    {"role": "assistant", "content": ai_response})
         self.history_descriptions.append(self.current_description)
         return 0
 
+    def roll_option_check(self, option: Option):
+        """
+        对检定选项掷骰(两次判定:第一次就成功：大成功；第二次:小成功；)
+        只计算结果，返回(结果标记, 掷骰记录列表)，动画由调用方之后播放
+        """
+        rolls = []
+        rng = self.turn_rng()
+        attr_value = self.character_attributes.get(option.main_factor, 0)
+        target_prob = option.probability + \
+            (attr_value-option.difficulty) * 3 / 2000
+        # 计算形势n影响(若n为正，几率增加0.01*2.2*n**1.25,否则减少0.04*n)
+        situation_factor = self.situation
+        if situation_factor > 0:
+            target_prob += 0.01*2.2*situation_factor**1.25
+        else:
+            target_prob += 0.04*situation_factor
+        # 检定成功概率(第一次判定)
+        first_roll = CheckRoll(rng.random(), max(target_prob*0.65, 0.01),
+                               "正在进行第一次检定", 2)
+        rolls.append(first_roll)
+        if first_roll.success:
+            first_roll.note = COLOR_GREEN+"检定大成功! "+COLOR_RESET
+            return "<检定大成功!>", rolls
+        second_roll = CheckRoll(rng.random(), target_prob,
+                                "正在进行第二次检定", 3)
+        rolls.append(second_roll)
+        if second_roll.success:
+            return "<检定小成功>", rolls
+        cur_min = min(second_roll.value, first_roll.value)
+        # 如果自己的主属性>选项要求+5,则差值的百分比的概率获得最后一次机会
+        # 目标值是差值的百分比
+        if attr_value-option.difficulty > 5:
+            last_target = (attr_value-option.difficulty-5) / 100
+            if rng.random() < last_target:
+                last_roll = CheckRoll(rng.random(), last_target,
+                                      COLOR_MAGENTA+"最后机会"+COLOR_RESET, 2.5)
+                rolls.append(last_roll)
+                if last_roll.success:
+                    return "<检定小成功>", rolls
+                cur_min = min(last_roll.value, cur_min)
+        if cur_min >= 0.20+target_prob:
+            return "<检定大失败>", rolls
+        return "<检定小失败>", rolls
+
+    @staticmethod
+    def _end_checks(presenter, presentation: str):
+        """AI响应后结束掷骰显示：完整动画播放完，其余方式剩余动画直接显示结果"""
+        if presentation == "full":
+            presenter.join()
+        else:
+            presenter.finish()
+
+    def seed_rng(self, seed: int):
+        """设置检定用的随机数种子(之后的掷骰由种子与回合数决定)"""
+        self.rng_seed = int(seed)
+        self._rng_turn = None
+
+    def turn_rng(self) -> random.Random:
+        """本回合的随机数生成器(由种子与回合数派生，同一回合内的多次掷骰依次取用)"""
+        turn = len(self.history_descriptions)
+        if self._rng_turn != turn:
+            self._rng = random.Random(f"{self.rng_seed}:{turn}")
+            self._rng_turn = turn
+        return self._rng
+
     def think_go_game(self, think_context):
         """玩家思考游戏中的情况"""
+        if self.cassette is not None:
+            self.cassette.record_action(ACTION_THINK, text=think_context)
+        rolls = []
         think_success_or_not = self.probability_check(
-            0.2 + 0.6873 * atan(0.02345 * self.character_attributes.get("INT", 10)), is_enable_double_check=True)
+            0.2 + 0.6873 * atan(0.02345 * self.character_attributes.get("INT", 10)), is_enable_double_check=True,
+            rolls=rolls)
         if think_success_or_not == 3:
             think_context += "(大成功)"
         elif think_success_or_not == 1:
@@ -642,19 +561,51 @@ class GameEngine:
                 [str(s) for s in self.history_simple_summaries[:-1] if s is not None]),
             self.get_inventory_text_for_prompt(),
             self.get_situation_text())
-        self.anime_loader.stop_animation()
-        self.anime_loader.start_animation("dot", message="思考中")
-        res = self.call_ai(prompt)
+        self.io.stop_status()
+        presentation = self.custom_config.check_presentation
+        presenter = self.io.play_checks(
+            rolls, presentation, ("思考中", "dot"))
+        res = self.call_ai(prompt, CALL_THINK)
+        self._end_checks(presenter, presentation)
+        attempt = 0
         while not res:
-            input(f"AI响应失败，按任意键重试.[注意Token消耗{self.total_tokens}]")
-            res = self.call_ai(prompt)
-        self.current_description += "\n\n" + \
-            COLOR_BLUE+f"[思考:{think_context}] "+COLOR_RESET+res
+            attempt += 1
+            self._retry(
+                f"AI响应失败，按任意键重试.[注意Token消耗{self.total_tokens}]", attempt)
+            res = self.call_ai(prompt, CALL_THINK)
+        self.current_description += "\n\n" + f"[思考:{think_context}] " + res
         self.history_descriptions[-1] = self.current_description
         self.token_consumes[-1] += self.l_p_token+self.l_c_token
-        self.anime_loader.stop_animation()  # type:ignore
+        self.io.stop_status()
         return 0
 
+    def game_label(self):
+        """带分支名的游戏ID(主分支只显示游戏ID)"""
+        if self.branch_id == MAIN_BRANCH:
+            return self.game_id
+        return f"{self.game_id}@{self.branch_id}"
+
+    def completed_turns(self) -> int:
+        """已完成(玩家已做出选择)的回合数"""
+        return min(len(self.history_descriptions), len(self.history_choices))
+
+    def iter_turns(self, start: int = 0, stop: Optional[int] = None):
+        """逐条生成第start+1到第stop个已完成回合的记录"""
+        total = self.completed_turns()
+        stop = total if stop is None else min(stop, total)
+        for idx in range(max(start, 0), stop):
+            tokens = self.token_consumes[idx] if idx < len(
+                self.token_consumes) else 0
+            yield TurnRecord(idx + 1, self.history_descriptions[idx], self.history_choices[idx], tokens)
+
+    def add_token_usage(self, usage: TokenUsage):
+        """累计一次AI调用的Token用量"""
+        self.total_prompt_tokens += usage.prompt_tokens
+        self.l_p_token = usage.prompt_tokens
+        self.total_completion_tokens += usage.completion_tokens
+        self.l_c_token = usage.completion_tokens
+        self.total_tokens += usage.total_tokens
+
     def get_token_stats(self):
         """获取token统计信息"""
         return {
@@ -670,12 +621,10 @@ class GameEngine:
         """获取当前道具列表的文本描述"""
         if not self.inventory:
             return "当前没有道具"
-        nums_text = f"{len(self.inventory)}" if len(
-            self.inventory) <= 50 else f"{len(self.inventory)},但其中{len(self.inventory)-50}个道具不会参与剧情。如想，尝试丢弃物品？"
-        available_items = self.inventory.items() if len(
-            self.inventory) <= 50 else list(self.inventory.items())[-50:]
-        no_available_items = list(self.inventory.items())[:-50] if len(
-            self.inventory) > 50 else []
+        total = len(self.inventory)
+        nums_text = f"{total}" if total <= 50 else f"{total},但其中{total-50}个道具不会参与剧情。如想，尝试丢弃物品？"
+        available_items = self.inventory.items_range(-50)
+        no_available_items = self.inventory.items_range(None, -50)
         return f"当前道具列表（{nums_text}）：\n" + "\n".join([f"{idx+1}.{COLOR_YELLOW}{item}{COLOR_RESET}: {desc if need_desc else ''}" for idx, (item, desc) in enumerate(available_items)] + [f"{idx+len(available_items)+1}.{COLOR_RED}[✘]{item}{COLOR_RESET}: {desc}" for idx, (item, desc) in enumerate(no_available_items)])
 
     def get_item_repository_text(self, need_desc=True):
@@ -686,6 +635,10 @@ class GameEngine:
 
     def get_attribute_text(self, colorize=False):
         """获取当前属性列表的文本描述"""
+        return self.render_cache.get(("attribute_text", colorize), state_version(self.character_attributes),
+                                     lambda: self._render_attribute_text(colorize))
+
+    def _render_attribute_text(self, colorize):
         if not self.character_attributes:
             return "玩家当前没有属性"
         if colorize:
@@ -703,12 +656,16 @@ class GameEngine:
 
     def get_inventory_text_for_prompt(self):
         """获取当前道具列表的文本描述，更简洁"""
+        return self.render_cache.get("inventory_text_for_prompt", state_version(self.inventory),
+                                     self._render_inventory_text_for_prompt)
+
+    def _render_inventory_text_for_prompt(self):
         if not self.inventory:
             return "玩家当前没有道具"
         if len(self.inventory) <= 12:
             return "当前道具列表：\n" + "\n".join([f"{COLOR_YELLOW}{item}{COLOR_RESET}(描述:{desc})" for item, desc in self.inventory.items()])
         else:
-            return "当前持有道具：\n" + "\n".join([f"{item}(描述:{desc})" for item, desc in self.inventory.items()][-25:]) + f"\n以及过去的道具:{', '.join([item for item, desc in self.inventory.items()][-35:-12])}"
+            return "当前持有道具：\n" + "\n".join([f"{item}(描述:{desc})" for item, desc in self.inventory.items_range(-25)]) + f"\n以及过去的道具:{', '.join(self.inventory.keys_range(-35, -12))}"
 
     def get_situation_text(self, add_numbers=False):
         """获取当前形势的文本描述"""
@@ -716,6 +673,10 @@ class GameEngine:
             self.situation = 10
         if self.situation < -10:
             self.situation = -10
+        return self.render_cache.get(("situation_text", add_numbers), self.situation,
+                                     lambda: self._render_situation_text(add_numbers))
+
+    def _render_situation_text(self, add_numbers):
         for tp, texts in self.situation_text.items():
             if tp[0] <= self.situation < tp[1]:
                 if add_numbers:
@@ -724,12 +685,12 @@ class GameEngine:
 
     def get_vars_text(self):
         """获取当前变量的文本描述"""
+        return self.render_cache.get("vars_text", state_version(self.variables), self._render_vars_text)
+
+    def _render_vars_text(self):
         if not self.variables:
             return "当前没有变量"
-        text = "游戏变量表：\n"
-        for var_name, var_value in self.variables.items():
-            text += f"{var_name}:{var_value}\n"
-        return text
+        return "游戏变量表：\n" + "".join(f"{var_name}:{var_value}\n" for var_name, var_value in self.variables.items())
 
     def log_game(self, log_file: str):
         """记录游戏信息，处理Unicode编码问题"""
@@ -757,50 +718,91 @@ class GameEngine:
         #    for entry in self.conversation_history:
         #        safe_json_dump(entry, f)
 
-        # 新文件导出剧情及玩家对应的选择
+        # 新文件导出剧情及玩家对应的选择(只追加新完成的回合，历史被改写时才重建)
         narrative_file = log_file.replace(".log", "_narrative.log")
-        with open(narrative_file, "w", encoding="utf-8", errors="replace") as f:
-            for desc, choice in zip(self.history_descriptions, self.history_choices):
-                # 清理文本
-                def clean_text(text):
-                    if text is None:
-                        return ""
-                    if isinstance(text, str):
-                        return text
-                    return str(text)
-
-                clean_desc = clean_text(desc)
-                clean_choice = clean_text(choice)
-                f.write(f"{clean_desc}\n{clean_choice}\n\n")
-
-    def fix_item_name_error(self):
-        """修复物品名中的错误"""
-        fixed_dict = {}
-        for item in self.inventory.keys():
-            if self.inventory[item] != "无描述":
-                fixed_dict[item] = self.inventory[item]
-                continue
-            cur_texts = []
-            name = ""
-            for i in item:
-                if i == ':':
-                    name = "".join(cur_texts)
-                    cur_texts = []
-                    continue
-                if i not in ['"', "'", '{', '}']:
-                    cur_texts.append(i)
-            # 如果无道具名但有描述，则描述去除逗号、句号作为道具名
-            if name == "" and not cur_texts:
-                name = "".join(cur_texts).replace(',', '').replace(
-                    '.', '').replace('，', '').replace('。', '')
-                cur_texts = ["无描述"]
-            fixed_dict[name] = "".join(cur_texts)
-        self.inventory = fixed_dict
+        mark_file = narrative_file + ".mark"
+        # 每回合的剧情在玩家做出选择后才写入，此后不再变化
+        total = self.completed_turns()
+        mark = None if self.narrative_log_stale else self.narrative_log_mark
+        if not self.narrative_log_stale and narrative_file != self.narrative_log_file:
+            # 首次写入该文件：若已有日志及其高水位则接着追加
+            mark = None
+            if os.path.exists(narrative_file) and os.path.exists(mark_file):
+                try:
+                    with open(mark_file, "r", encoding="utf-8") as f:
+                        mark = int(f.read().strip())
+                except ValueError:
+                    mark = None
+        if mark is None or mark > total or not os.path.exists(narrative_file):
+            mode, mark = "w", 0
+        else:
+            mode = "a"
+        if mode == "a" and mark == total:
+            return
+        with open(narrative_file, mode, encoding="utf-8", errors="replace") as f:
+            for record in self.iter_turns(mark, total):
+                f.write(
+                    f"{self._log_text(record.description)}\n{self._log_text(record.choice)}\n\n")
+        with open(mark_file, "w", encoding="utf-8") as f:
+            f.write(str(total))
+        self.narrative_log_file = narrative_file
+        self.narrative_log_mark = total
+        self.narrative_log_stale = False
+
+    def mark_history_rewritten(self):
+        """历史被整体替换(如读档、回退)后调用，使剧情日志在下次写入时重建，本回合的随机数重新派生"""
+        self.narrative_log_stale = True
+        self._rng_turn = None
+
+    @staticmethod
+    def _log_text(text):
+        """清理写入日志的文本(旧存档中的历史可能带有颜色代码)"""
+        if text is None:
+            return ""
+        if isinstance(text, str):
+            return strip_ansi(text)
+        return str(text)
+
+    def fix_item_name_error(self, source: str = SOURCE_SYSTEM):
+        """修复物品名中的错误(有改动时记录为事件)"""
+        if list(fix_item_names(self.inventory).items()) != list(self.inventory.items()):
+            self.record_event(ITEM_FIX_NAMES, source)
+
+    def record_event(self, kind: str, source: str = SOURCE_LLM, **data):
+        """记录一个状态事件并应用到当前状态"""
+        event = make_event(len(self.history_descriptions),
+                           kind, source, **data)
+        apply_event(self, event)
+        self.events.append(event)
+        # 玩家直接修改状态的操作也需要重放(AI指令产生的事件重放时会由录制的回复重新产生)
+        if self.cassette is not None and source == SOURCE_PLAYER:
+            self.cassette.record_action(ACTION_EVENT, kind=kind, data=data)
+        return event
+
+    def replay_events(self):
+        """从起点状态重放全部事件，返回重建的状态"""
+        return fold_events(self.events_base, self.events)
+
+    def compact_events(self, align: int = 1) -> int:
+        """
+        将最早的回退快照之前的事件合并进起点状态events_base并从记录中删除，返回删除的事件数
+        删除数按align条对齐(分块保存时相邻存档的分块保持不变)；保存前调用，事件记录不随游戏进行无限增长
+        """
+        keep_from = self.rewind_ring.min_length("events") if len(
+            self.rewind_ring) else len(self.events)
+        count = keep_from - keep_from % align
+        if count <= 0:
+            return 0
+        self.events_base = capture_event_base(
+            fold_events(self.events_base, self.events[:count]))
+        self.events = self.events[count:]
+        self.rewind_ring.drop_front("events", count)
+        return count
 
     def print_all_messages_await(self):
         """打印所有待显示消息"""
         while self.message_queue:
-            print(self.message_queue.popleft())
+            self.io.emit(EVENT_MESSAGE, self.message_queue.popleft())
 
     def probability_check(self,
                           target: float,
@@ -814,7 +816,7 @@ class GameEngine:
                           is_enable_final_chance: bool = False,
                           final_chance_prob: float = 0.05,
                           final_chance_target: float = 0.05,
-
+                          rolls: Optional[list] = None,
                           ):
         """
         概率判定函数
@@ -831,33 +833,36 @@ class GameEngine:
         is_enable_final_chance: 是否启用最后机会
         final_chance_prob: 最后机会触发概率
         final_chance_target: 最后机会的目标值
+        rolls: 掷骰记录(CheckRoll)追加到此列表，由调用方播放动画；为None时判定后立即播放
         """
+        if rolls is None:
+            rolls = []
+            result = self.probability_check(
+                target, is_enable_normal=is_enable_normal, normal_range_factor=normal_range_factor,
+                is_enable_double_check=is_enable_double_check, first_check_factor=first_check_factor,
+                second_check_factor=second_check_factor, allow_base_first_success=allow_base_first_success,
+                big_failure_prob_addon=big_failure_prob_addon, is_enable_final_chance=is_enable_final_chance,
+                final_chance_prob=final_chance_prob, final_chance_target=final_chance_target, rolls=rolls)
+            self.io.play_checks(
+                rolls, self.custom_config.check_presentation).join()
+            return result
         result = 0
+        rng = self.turn_rng()
         if is_enable_double_check:
             first_result, second_result = 0, 0
             first_target = target * first_check_factor
             if allow_base_first_success:
                 first_target = max(first_target, 0.01)
-            rand_first = random.uniform(0, 1)
-            print("正在进行第一次检定")
-            probability_check_animation(
-                rand_first,
-                target_prob=first_target,
-                duration=2
-            )
+            rand_first = rng.random()
+            rolls.append(CheckRoll(rand_first, first_target, "正在进行第一次检定"))
             if rand_first < first_target:
                 first_result = 1
 
             second_target = target * second_check_factor
             if allow_base_first_success:
                 second_target = max(second_target, 0.01)
-            rand_second = random.uniform(0, 1)
-            print("正在进行第二次检定")
-            probability_check_animation(
-                rand_second,
-                target_prob=second_target,
-                duration=2
-            )
+            rand_second = rng.random()
+            rolls.append(CheckRoll(rand_second, second_target, "正在进行第二次检定"))
             if rand_second < second_target:
                 second_result = 1
 
@@ -877,12 +882,8 @@ class GameEngine:
                 result = -3  # 大失败
 
         else:
-            rand = random.uniform(0, 1)
-            probability_check_animation(
-                rand,
-                target_prob=target,
-                duration=2
-            )
+            rand = rng.random()
+            rolls.append(CheckRoll(rand, target))
             if rand < target:
                 return 2  # 成功
 
@@ -897,20 +898,19 @@ class GameEngine:
         if not is_enable_final_chance:
             return result
 
-        enable_final_chance_prob = random.uniform(0, 1)
+        enable_final_chance_prob = rng.random()
         if enable_final_chance_prob < final_chance_prob:
-            final_chance_rand = random.uniform(0, 1)
-            probability_check_animation(
-                final_chance_rand,
-                target_prob=final_chance_target,
-                duration=2
-            )
+            final_chance_rand = rng.random()
+            rolls.append(CheckRoll(final_chance_rand,
+                         final_chance_target, "最后机会"))
             if final_chance_rand < final_chance_target:
                 return 1  # 小成功
         return result
 
     def is_use_item_ok(self, focus_item: str, player_move: str, target: str = ""):
         """判断使用物品是否合理"""
+        if self.cassette is not None:
+            self.cassette.record_action(ACTION_USE_ITEM, item=focus_item, move=player_move, target=target)
 
         prompt = self.prompt_manager.get_use_item_prompt(
             player_name=self.player_name,
@@ -920,9 +920,9 @@ class GameEngine:
             focus_item_desc=self.inventory[focus_item],
             target=target
         )
-        response = self.call_ai(prompt)
+        response = self.call_ai(prompt, CALL_USE_ITEM)
         if not response:
-            input('注意：AI未给出响应')
+            self.io.pause('注意：AI未给出响应')
             return True
         try:
             is_ok = json.loads(response)["is_valid"] == 1
@@ -931,52 +931,6 @@ class GameEngine:
         self.token_consumes[-1] += self.l_p_token+self.l_c_token
         return is_ok
 
-    def colorize(self, text: str):
-        """
-        对文本进行颜色美化
-        """
-        remain_color_stack = [COLOR_RESET]  # 用于修正嵌套错误
-        remain_need_close_chars_stack = []
-        finally_text = []  # 用于避免频繁创建字符串
-        current_printing_color = COLOR_RESET
-        color_convert_dict = {
-            "<": COLOR_MAGENTA,
-            "[": COLOR_CYAN,
-            "『": COLOR_YELLOW,
-            "《": COLOR_MAGENTA,
-            "「": COLOR_GREEN,
-        }
-        close_chars = {
-            ">": "<",
-            "]": "[",
-            "』": "『",
-            "》": "《",
-            "」": "「",
-        }
-        # 从开始向字符串末尾逐字符扫描替换
-        for i in text:
-            if i in color_convert_dict:
-                current_printing_color = color_convert_dict[i]
-                remain_need_close_chars_stack.append(i)
-                remain_color_stack.append(current_printing_color)
-                finally_text.append(current_printing_color+i)
-            elif i in close_chars:
-                if remain_need_close_chars_stack and remain_need_close_chars_stack[-1] == close_chars[i]:
-                    remain_need_close_chars_stack.pop()
-                else:
-                    input(f"[文本美化]注意：不符合预期的文本嵌套结构{text}\n 文本将不会被美化 \n按任意键继续")
-                    return text
-                if remain_color_stack:
-                    remain_color_stack.pop()
-                    current_printing_color = remain_color_stack[-1] if remain_color_stack else COLOR_RESET
-                    finally_text.append(i+current_printing_color)
-                else:
-                    finally_text.append(i+COLOR_RESET)
-            else:
-                finally_text.append(i)
-        finally_text.append(COLOR_RESET)  # 强制重置颜色
-        return ''.join(finally_text)
-
     def conclude_summary(self):
         """
         总结摘要，清理无用物品和变量
@@ -985,11 +939,13 @@ class GameEngine:
             try:
                 r = json.loads(repair_json(resp))
                 summ = r["summary"]
-                rmv_item = r["rmv_item"]
-                rmv_var = r["rmv_var"]
+                # 提示词要求的字段为useless_items/useless_vars，兼容rmv_item/rmv_var
+                rmv_item = r.get("useless_items", r.get("rmv_item", []))
+                rmv_var = r.get("useless_vars", r.get("rmv_var", []))
                 return 1, summ, rmv_item, rmv_var
             except (json.JSONDecodeError, KeyError, ValueError) as e:
-                print(f"[警告]:总结历史剧情时解析json失败{resp}，错误信息：{e}")
+                self.io.emit(
+                    EVENT_WARNING, f"[警告]:总结历史剧情时解析json失败{resp}，错误信息：{e}")
                 return 0, "", [], []
 
         # 当所有摘要都经过了压缩，我们采取稀释旧摘要策略
@@ -999,25 +955,24 @@ class GameEngine:
                     [str(s) for s in self.history_simple_summaries[:10] if s is not None]),
                 self.get_inventory_text_for_prompt(),
                 self.get_vars_text())
-            self.anime_loader.stop_animation()
-            self.anime_loader.start_animation(
-                "dot", message=COLOR_YELLOW+"正在总结历史剧情 并清理无用信息"+COLOR_RESET)
+            self.io.start_status(
+                COLOR_YELLOW+"正在总结历史剧情 并清理无用信息"+COLOR_RESET, "dot")
             tmp = self.custom_config.max_tokens
             self.custom_config.max_tokens = 20480
-            summary = self.call_ai(prompt)
+            summary = self.call_ai(prompt, CALL_SUMMARY)
             self.custom_config.max_tokens = tmp
-            self.anime_loader.stop_animation()
+            self.io.stop_status()
             ok_sign, summ, rmv_item, rmv_var = phase_summary(summary)
+            attempt = 0
             while not ok_sign:
-                input(f"[警告]:总结历史剧情时解析json失败{summary}，按任意键重试")
-                summary = self.call_ai(prompt)
+                attempt += 1
+                self._retry(
+                    f"[警告]:总结历史剧情时解析json失败{summary}，按任意键重试", attempt)
+                summary = self.call_ai(prompt, CALL_SUMMARY)
                 ok_sign, summ, rmv_item, rmv_var = phase_summary(summary)
             self.history_simple_summaries = [
                 summ]+self.history_simple_summaries[10:]
-            for item in rmv_item:
-                self.iremove_item(item)
-            for var in rmv_var:
-                self.idel_var(var)
+            self.cleanup_items_and_vars(rmv_item, rmv_var)
             self.conclude_summary_cooldown = 10
             self.token_consumes[-1] += self.l_p_token+self.l_c_token
             return 0
@@ -1027,45 +982,34 @@ class GameEngine:
                 [i for i in self.history_simple_summaries if i and len(i) < 400]),
             self.get_inventory_text_for_prompt(),
             self.get_vars_text())
-        self.anime_loader.stop_animation()
-        self.anime_loader.start_animation(
-            "dot", message=COLOR_YELLOW+"正在总结历史剧情"+COLOR_RESET)
+        self.io.start_status(COLOR_YELLOW+"正在总结历史剧情"+COLOR_RESET, "dot")
         tmp = self.custom_config.max_tokens
         self.custom_config.max_tokens = 2048
-        summary = self.call_ai(prompt)
+        summary = self.call_ai(prompt, CALL_SUMMARY)
         self.custom_config.max_tokens = tmp
-        self.anime_loader.stop_animation()
+        self.io.stop_status()
         ok_sign, summ, rmv_item, rmv_var = phase_summary(summary)
+        attempt = 0
         while not ok_sign:
-            input(f"[警告]:总结历史剧情时解析json失败{summary}，按任意键重试")
-            summary = self.call_ai(prompt)
+            attempt += 1
+            self._retry(
+                f"[警告]:总结历史剧情时解析json失败{summary}，按任意键重试", attempt)
+            summary = self.call_ai(prompt, CALL_SUMMARY)
             ok_sign, summ, rmv_item, rmv_var = phase_summary(summary)
         self.history_simple_summaries = [
             i for i in self.history_simple_summaries if i and len(i) >= 400] + [summ]
-        for item in rmv_item:
-            self.iremove_item(item)
-        for var in rmv_var:
-            self.idel_var(var)
+        self.cleanup_items_and_vars(rmv_item, rmv_var)
         self.conclude_summary_cooldown = 10
         self.token_consumes[-1] += self.l_p_token+self.l_c_token
         return 0
 
-    def iremove_item(self, item: str):
-        """
-        构造命令，从物品列表中移除物品
-        """
-        commands = [{
-            "command": "remove_item",
-            "item": item
-        }]
-        self.handle_command(commands)
-
-    def idel_var(self, var: str):
+    def cleanup_items_and_vars(self, items: list, var_names: list):
         """
-        构造命令，从变量列表中移除变量
+        构造指令，从物品列表和变量表中批量移除(总结剧情时清理无用信息)
         """
-        commands = [{
-            "command": "del_var",
-            "var": var
-        }]
-        self.handle_command(commands)
+        commands = [{"command": "remove_item", "value": item} for item in items] + \
+            [{"command": "del_var", "value": var} for var in var_names]
+        try:
+            self.handle_command(commands)
+        except CommandError as e:
+            self.io.emit(EVENT_WARNING, f"[警告]:清理无用物品和变量时出错: {e}")
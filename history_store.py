@@ -0,0 +1,332 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 历史剧情的内容寻址存储
+import os
+import json
+import hashlib
+import weakref
+from collections import OrderedDict
+from collections.abc import MutableSequence
+
+# 每个分块包含的回合数
+HISTORY_CHUNK_SIZE = 32
+# 读档时常驻内存的最近分块数(需覆盖界面显示的最近50回合)
+HISTORY_RESIDENT_CHUNKS = 3
+# 以分块方式保存的历史字段(剧情、选择与状态事件)
+CHUNKED_HISTORY_FIELDS = ("history_descriptions", "history_choices", "events")
+# 其中的文本字段(记录总字数；事件为字典，不计字数)
+TEXT_HISTORY_FIELDS = ("history_descriptions", "history_choices")
+
+# 对象仓库中记录各分块被多少个存档引用的文件
+REFCOUNT_FILE = "refcounts.json"
+
+# 当前存在的LazyHistory(回收分块时，正在进行的游戏引用的分块即使已不在任何存档中也要保留)
+_live_histories = weakref.WeakValueDictionary()
+
+
+class ObjectStore:
+    """
+    每局游戏的对象仓库(saves/<game_id>/objects)
+    历史剧情按固定回合数切分为分块，以分块内容的哈希为键保存；
+    存档只记录分块引用，相邻存档之间相同的分块只会在磁盘上存一份
+    """
+
+    def __init__(self, game_save_dir: str):
+        self.objects_dir = os.path.join(game_save_dir, "objects")
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, f"{digest}.json")
+
+    def put(self, chunk: list) -> str:
+        """写入一个分块，返回其哈希(已存在则不重复写入)"""
+        data = json.dumps(chunk, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.objects_dir, exist_ok=True)
+            # 先写临时文件再替换，避免中断时留下不完整的分块
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest: str) -> list:
+        """读取一个分块"""
+        with open(self._path(digest), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def put_history(self, items, chunk_size: int = HISTORY_CHUNK_SIZE) -> list:
+        """将历史列表切分为分块写入，返回分块引用列表"""
+        refs = []
+        start = 0
+        if (isinstance(items, LazyHistory) and items.chunk_size == chunk_size
+                and items.store.objects_dir == self.objects_dir):
+            # 未加载的分块已在本仓库中且内容未变，直接复用其引用
+            refs = items.cold_refs()
+            start = len(refs) * chunk_size
+        refs.extend(self.put(list(items[i:i+chunk_size]))
+                    for i in range(start, len(items), chunk_size))
+        return refs
+
+    def get_history(self, refs: list) -> list:
+        """根据分块引用列表还原历史列表"""
+        items = []
+        for digest in refs:
+            items.extend(self.get(digest))
+        return items
+
+    def read_refcounts(self):
+        """读取分块引用计数(哈希 -> 引用它的存档数)，没有记录时返回None"""
+        try:
+            with open(os.path.join(self.objects_dir, REFCOUNT_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def write_refcounts(self, counts: dict) -> None:
+        os.makedirs(self.objects_dir, exist_ok=True)
+        path = os.path.join(self.objects_dir, REFCOUNT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(counts, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def retain(self, digest_sets, rebuild) -> None:
+        """
+        写入存档前调用：digest_sets中每个存档引用的分块计数加一
+        没有计数记录时先用rebuild()统计现有存档的引用
+        (先增加计数再写存档、先删存档再减少计数，中断时只会多留分块而不会误删)
+        """
+        counts = self.read_refcounts()
+        if counts is None:
+            counts = rebuild()
+        for digests in digest_sets:
+            for digest in digests:
+                counts[digest] = counts.get(digest, 0) + 1
+        self.write_refcounts(counts)
+
+    def release(self, digest_sets):
+        """
+        存档被覆盖或删除后调用：digest_sets中每个存档引用的分块计数减一，
+        删除计数归零且不被正在进行的游戏引用的分块；返回删除的数量，没有计数记录时返回None
+        """
+        counts = self.read_refcounts()
+        if counts is None:
+            return None
+        live = None
+        removed = 0
+        for digests in digest_sets:
+            for digest in digests:
+                count = counts.get(digest)
+                if count is None:
+                    # 计数与存档不一致时保留分块(由完整回收处理)
+                    continue
+                if count > 1:
+                    counts[digest] = count - 1
+                    continue
+                del counts[digest]
+                if live is None:
+                    live = live_chunks(self.objects_dir)
+                path = self._path(digest)
+                if digest not in live and os.path.exists(path):
+                    os.remove(path)
+                    removed += 1
+        self.write_refcounts(counts)
+        return removed
+
+    def collect_garbage(self, referenced: set) -> int:
+        """删除不再被任何存档或正在进行的游戏引用的分块，返回删除的数量"""
+        if not os.path.isdir(self.objects_dir):
+            return 0
+        referenced = referenced | live_chunks(self.objects_dir)
+        removed = 0
+        for filename in os.listdir(self.objects_dir):
+            digest, ext = os.path.splitext(filename)
+            if ext == ".json" and filename != REFCOUNT_FILE and digest not in referenced:
+                os.remove(os.path.join(self.objects_dir, filename))
+                removed += 1
+        return removed
+
+
+def referenced_chunks(save_data: dict) -> set:
+    """获取一个存档引用的全部分块哈希"""
+    refs = save_data.get("history_refs", {})
+    digests = set()
+    for field in CHUNKED_HISTORY_FIELDS:
+        digests.update(refs.get(field, []))
+    return digests
+
+
+class LazyHistory(MutableSequence):
+    """
+    惰性加载的历史列表
+    较早的回合只以分块引用的形式留在磁盘上，访问时才按分块读取(少量缓存)；
+    最近的回合常驻内存，追加、修改最后一条等常用操作与普通列表开销相同
+    """
+
+    def __init__(self, store: ObjectStore, cold_refs: list, tail: list,
+                 chunk_size: int = HISTORY_CHUNK_SIZE,
+                 cold_chars: int | None = 0,
+                 cache_chunks: int = 4):
+        self.store = store
+        self.chunk_size = chunk_size
+        self._cold_refs = list(cold_refs)  # 均为满分块
+        self._cold_chars = cold_chars  # 未加载部分的总字数(未知时为None)
+        self._tail = list(tail)
+        self._cache = OrderedDict()
+        self._cache_chunks = cache_chunks
+        _live_histories[id(self)] = self
+
+    @classmethod
+    def from_refs(cls, store: ObjectStore, refs: list,
+                  chunk_size: int = HISTORY_CHUNK_SIZE,
+                  total_chars: int | None = None,
+                  resident_chunks: int = HISTORY_RESIDENT_CHUNKS):
+        """根据存档中的分块引用构建，只读取最近的分块"""
+        split = max(len(refs) - resident_chunks, 0)
+        tail = store.get_history(refs[split:])
+        cold_chars = None
+        if total_chars is not None:
+            cold_chars = total_chars - sum(len(it) for it in tail)
+        return cls(store, refs[:split], tail, chunk_size, cold_chars)
+
+    def cold_refs(self) -> list:
+        """未加载部分的分块引用"""
+        return list(self._cold_refs)
+
+    def _cold_len(self) -> int:
+        return len(self._cold_refs) * self.chunk_size
+
+    def _chunk(self, chunk_idx: int) -> list:
+        if chunk_idx in self._cache:
+            self._cache.move_to_end(chunk_idx)
+            return self._cache[chunk_idx]
+        chunk = self.store.get(self._cold_refs[chunk_idx])
+        self._cache[chunk_idx] = chunk
+        if len(self._cache) > self._cache_chunks:
+            self._cache.popitem(last=False)
+        return chunk
+
+    def _materialize_from(self, index: int) -> None:
+        """将index所在分块及之后的部分读入内存(修改较早回合时使用)"""
+        chunk_idx = index // self.chunk_size
+        if chunk_idx >= len(self._cold_refs):
+            return
+        items = self.store.get_history(self._cold_refs[chunk_idx:])
+        if self._cold_chars is not None:
+            self._cold_chars -= sum(len(it) for it in items)
+        self._tail = items + self._tail
+        self._cold_refs = self._cold_refs[:chunk_idx]
+        self._cache.clear()
+
+    def _normalize(self, index: int) -> int:
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("history index out of range")
+        return index
+
+    def __len__(self):
+        return self._cold_len() + len(self._tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._normalize(index)
+        cold_len = self._cold_len()
+        if index >= cold_len:
+            return self._tail[index - cold_len]
+        return self._chunk(index // self.chunk_size)[index % self.chunk_size]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            raise TypeError("LazyHistory does not support slice assignment")
+        index = self._normalize(index)
+        self._materialize_from(index)
+        self._tail[index - self._cold_len()] = value
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            positions = sorted(range(*index.indices(len(self))), reverse=True)
+        else:
+            positions = [self._normalize(index)]
+        if not positions:
+            return
+        self._materialize_from(positions[-1])
+        cold_len = self._cold_len()
+        for pos in positions:
+            del self._tail[pos - cold_len]
+
+    def insert(self, index, value):
+        if index >= len(self):
+            self._tail.append(value)
+            return
+        index = max(index + len(self), 0) if index < 0 else index
+        self._materialize_from(index)
+        self._tail.insert(index - self._cold_len(), value)
+
+    def __iter__(self):
+        for digest in self._cold_refs:
+            # 顺序遍历时不经过缓存，避免挤掉随机访问的分块
+            yield from self.store.get(digest)
+        yield from self._tail
+
+    def __eq__(self, other):
+        if isinstance(other, (list, LazyHistory)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"LazyHistory(len={len(self)}, resident={len(self._tail)})"
+
+    def text_length(self) -> int:
+        """全部条目的总字数，未加载部分使用存档记录的统计值"""
+        if self._cold_chars is None:
+            self._cold_chars = sum(len(it) for digest in self._cold_refs
+                                   for it in self.store.get(digest))
+        return self._cold_chars + sum(len(it) for it in self._tail)
+
+    def resident_items(self) -> list:
+        """当前在内存中的条目(常驻部分与缓存的分块)，不读取磁盘"""
+        items = list(self._tail)
+        for chunk in self._cache.values():
+            items.extend(chunk)
+        return items
+
+    def map_resident(self, func) -> None:
+        """对常驻内存的条目逐条应用func，较早的分块保持原样"""
+        self._tail = [func(it) for it in self._tail]
+
+    def spill(self, refs: list, resident_chunks: int = HISTORY_RESIDENT_CHUNKS) -> None:
+        """
+        保存后调用：将已写入对象仓库、且不在最近resident_chunks个分块内的条目移出内存
+        refs为本列表刚写入得到的完整分块引用
+        """
+        split = len(refs) - resident_chunks
+        moved = split - len(self._cold_refs)
+        if moved <= 0:
+            return
+        moved_items = self._tail[:moved * self.chunk_size]
+        if self._cold_chars is not None:
+            self._cold_chars += sum(len(it) for it in moved_items)
+        self._tail = self._tail[moved * self.chunk_size:]
+        self._cold_refs = list(refs[:split])
+
+
+def live_chunks(objects_dir: str) -> set:
+    """对象仓库中被当前存在的LazyHistory引用(尚未加载)的分块哈希"""
+    digests = set()
+    for history in list(_live_histories.values()):
+        if history.store.objects_dir == objects_dir:
+            digests.update(history.cold_refs())
+    return digests
+
+
+def history_text_length(items) -> int:
+    """历史列表的总字数"""
+    if isinstance(items, LazyHistory):
+        return items.text_length()
+    return sum(len(it) for it in items)
@@ -0,0 +1,83 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# LLM客户端池：同一提供商(base_url+api_key)的所有请求共享一个openai客户端(复用HTTP连接)，
+# 并限制同时发往每个提供商的请求数(多会话服务中各会话的请求在此排队)
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+import openai
+
+# 提供商未配置max_concurrency时的并发请求上限
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class ProviderPool:
+    """按提供商共享的openai客户端与并发限制"""
+
+    def __init__(self, default_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.default_concurrency = default_concurrency
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._slots = {}
+        self.in_flight = Counter()
+        self.peak_in_flight = Counter()
+        self.requests = Counter()
+        self.wait_seconds = Counter()
+
+    @staticmethod
+    def _key(provider: dict):
+        return (provider.get("base_url", ""), provider.get("api_key", ""))
+
+    def client(self, provider: dict) -> openai.OpenAI:
+        """提供商共享的客户端(首次使用时创建)"""
+        key = self._key(provider)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = openai.OpenAI(
+                        api_key=provider.get("api_key", ""),
+                        base_url=provider.get("base_url", ""),
+                    )
+                    self._clients[key] = client
+        return client
+
+    @contextmanager
+    def slot(self, provider: dict):
+        """占用一个发往该提供商的请求名额，名额用尽时等待"""
+        key = self._key(provider)
+        with self._lock:
+            semaphore = self._slots.get(key)
+            if semaphore is None:
+                limit = provider.get("max_concurrency") or self.default_concurrency
+                semaphore = self._slots[key] = threading.BoundedSemaphore(limit)
+        start = time.perf_counter()
+        semaphore.acquire()
+        name = provider.get("name", key[0])
+        with self._lock:
+            self.wait_seconds[name] += time.perf_counter() - start
+            self.requests[name] += 1
+            self.in_flight[name] += 1
+            self.peak_in_flight[name] = max(
+                self.peak_in_flight[name], self.in_flight[name])
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight[name] -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        """各提供商的请求数、当前/峰值并发数与排队等待总时长"""
+        with self._lock:
+            return {name: {"requests": count,
+                           "in_flight": self.in_flight[name],
+                           "peak_in_flight": self.peak_in_flight[name],
+                           "wait_seconds": round(self.wait_seconds[name], 3)}
+                    for name, count in self.requests.items()}
+
+
+# 全局客户端池
+PROVIDER_POOL = ProviderPool()
@@ -4,10 +4,23 @@ import uuid
 import hashlib
 from datetime import datetime
 import json
+import time
 import os
 from game_engine import GameEngine
+from cassette import Cassette, MODE_RECORD, ACTION_STATE
+from history_store import ObjectStore, LazyHistory, HISTORY_CHUNK_SIZE, CHUNKED_HISTORY_FIELDS, TEXT_HISTORY_FIELDS, referenced_chunks, history_text_length
+from sqlite_store import SQLiteSaveStore
+from save_format import write_save_file, read_save_header, read_save_file, MAIN_BRANCH, branch_save_name
+from rewind import RewindRing
+from containers import TrackedDict, Inventory
+from response_parser import PARSE_STATS
+from records import Option
+from screen import Screen, SCREEN_HISTORY_TURNS, HISTORY_PAGE_SIZE
+from render import render_narrative, render_choice, render_cache_info, strip_ansi
+from events import (ITEM_ADD, ITEM_REMOVE, ITEM_MOVE, ITEM_RENAME, ITEM_REDESC, ATTR_SET, VAR_SET, VAR_DEL,
+                    SOURCE_PLAYER, capture_event_base, diff_state, summarize_events)
 from config import LOG_DIR, CURRENT_TIME, CustomConfig, COLOR_GREEN, COLOR_RESET, COLOR_RED, COLOR_YELLOW
-from animes import typewriter_narrative, show_loading_animation, SyncLoadingAnimation
+from animes import typewriter_narrative, SyncLoadingAnimation, KeyPoller, CHECK_PRESENTATIONS
 
 config = CustomConfig()
 
@@ -18,6 +31,19 @@ extra_datas = {
     "think_count_remain": 0,
 }
 
+# SQLite存档后端(配置save_backend为sqlite时使用)
+sqlite_save_store = None
+
+# 主界面画面状态
+SCREEN = Screen()
+
+# 检定显示方式的名称
+CHECK_PRESENTATION_NAMES = {
+    "full": "完整动画",
+    "compressed": "压缩动画(所有掷骰共用一段短动画)",
+    "instant": "直接显示结果",
+}
+
 # 显示函数
 
 
@@ -33,28 +59,27 @@ def display_narrative_with_typewriter(narr: str,
         color: 颜色代码
 
     Returns:
-        bool: 是否被用户中断
+        bool: 是否被用户按键跳过(跳过后其余段落直接输出)
     """
     print("\n" + separator)
 
     paras = narr.split("\n")
-    interrupted = False  # 这里关闭中断功能
-
-    for para in paras:
-        if para.strip() and not interrupted:
-            para_interrupted = typewriter_narrative(
-                para.strip(),
-                color=color,
-                suffix="\n"
-            )
-            if para_interrupted:
-                interrupted = True
-                break
+    skipped = False
 
-    if not interrupted:
-        print(separator)
+    with KeyPoller() as poller:
+        for para in paras:
+            if para.strip():
+                skipped = typewriter_narrative(
+                    para.strip(),
+                    color=color,
+                    suffix="\n",
+                    chars_per_second=0 if skipped else config.typewriter_speed,
+                    poller=poller
+                ) or skipped
 
-    return interrupted
+    print(separator)
+
+    return skipped
 
 
 def generate_game_id():
@@ -65,90 +90,142 @@ def generate_game_id():
     return hash_object.hexdigest()[:8]
 
 
-def save_game(game_engine, save_name="autosave", is_manual_save=False):
+def build_save_data(game_engine, save_name="autosave", extra=None):
+    """
+    构建存档数据(不含历史剧情与选择，由存档后端各自保存)
+    extra为None时保存主程序的extra_datas(多会话服务中各会话传入自己的)
+    """
+    return {
+        "version": VERSION,
+        "save_desc": save_name,
+        "game_id": game_engine.game_id,
+        "branch": game_engine.branch_id,
+        "branch_from": game_engine.branch_from,
+        "timestamp": datetime.now().isoformat(),
+        "player_name": game_engine.player_name,
+        "player_story": game_engine.prompt_manager.prompts_sections.get("user_story", ""),
+        "current_description": game_engine.current_description,
+        "current_options": [opt.to_json() for opt in game_engine.current_options],
+        "current_game_status": game_engine.current_game_status,
+        "history_simple_summaries": game_engine.history_simple_summaries,
+        "inventory": game_engine.inventory,
+        # "conversation_history": game_engine.conversation_history,
+        "total_turns": len(game_engine.history_descriptions),
+        "total_prompt_tokens": game_engine.total_prompt_tokens,
+        "last_prompt_tokens": game_engine.l_p_token,
+        "total_completion_tokens": game_engine.total_completion_tokens,
+        "last_completion_tokens": game_engine.l_c_token,
+        "total_tokens": game_engine.total_tokens,
+        "custom_config": {
+            "max_tokens": game_engine.custom_config.max_tokens,
+            "temperature": game_engine.custom_config.temperature,
+            "frequency_penalty": game_engine.custom_config.frequency_penalty,
+            "presence_penalty": game_engine.custom_config.presence_penalty,
+            "player_name": game_engine.custom_config.player_name,
+            "player_story": game_engine.custom_config.player_story,
+            "porn_value": game_engine.custom_config.porn_value,
+            "violence_value": game_engine.custom_config.violence_value,
+            "blood_value": game_engine.custom_config.blood_value,
+            "horror_value": game_engine.custom_config.horror_value,
+            "custom_prompts": game_engine.custom_config.custom_prompts,
+            "api_provider_choice": game_engine.custom_config.api_provider_choice,
+        },
+        "character_attributes": game_engine.character_attributes,
+        "situation_value": game_engine.situation,
+        "token_consumes": game_engine.token_consumes,
+        "extra_datas": extra_datas if extra is None else extra,
+        "item_repo": game_engine.item_repository,
+        "is_no_options": game_engine.prompt_manager.is_no_options,
+        "variables": game_engine.variables,
+        "events_base": game_engine.events_base,
+        "rewind_journal": game_engine.rewind_ring.to_json(game_engine),
+        "rng_seed": game_engine.rng_seed,
+    }
+
+
+def get_sqlite_store():
+    """获取SQLite存档后端(首次使用时打开数据库)"""
+    global sqlite_save_store
+    if sqlite_save_store is None:
+        sqlite_save_store = SQLiteSaveStore()
+    return sqlite_save_store
+
+
+def save_game(game_engine, save_name="autosave", is_manual_save=False, extra=None):
     """
     保存游戏状态到文件
     """
     try:
+        # 获取或生成游戏ID
+        if not game_engine.game_id:
+            game_engine.game_id = generate_game_id()
+
+        # 回退范围之前的事件合并进事件起点，存档只保存起点与之后的事件
+        game_engine.compact_events(HISTORY_CHUNK_SIZE)
+
+        # 构建保存数据
+        save_data = build_save_data(game_engine, save_name, extra)
+
+        # 生成文件名(非主分支的存档名带分支前缀)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        branch_name = branch_save_name(game_engine.branch_id, save_name)
+        if is_manual_save:
+            name = f"manual_{branch_name}_{timestamp}"
+        else:
+            name = f"{branch_name}_{timestamp}"
+
+        if config.save_backend == "sqlite":
+            get_sqlite_store().save_game(game_engine, save_data, name, is_manual_save)
+            return True, f"游戏已保存到 {game_engine.game_id}/{name}"
+
         # 创建保存目录
         save_dir = "saves"
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
 
-        # 获取或生成游戏ID
-        if not game_engine.game_id:
-            game_engine.game_id = generate_game_id()
-
         # 创建游戏专属目录
         game_save_dir = os.path.join(save_dir, game_engine.game_id)
         if not os.path.exists(game_save_dir):
             os.makedirs(game_save_dir)
 
-        # 构建保存数据
-        save_data = {
-            "version": VERSION,
-            "save_desc": save_name,
-            "game_id": game_engine.game_id,
-            "timestamp": datetime.now().isoformat(),
-            "player_name": game_engine.player_name,
-            "player_story": game_engine.prompt_manager.prompts_sections.get("user_story", ""),
-            "current_description": game_engine.current_description,
-            "current_options": game_engine.current_options,
-            "current_game_status": game_engine.current_game_status,
-            "history_descriptions": game_engine.history_descriptions,
-            "history_choices": game_engine.history_choices,
-            "history_simple_summaries": game_engine.history_simple_summaries,
-            "inventory": game_engine.inventory,
-            # "conversation_history": game_engine.conversation_history,
-            "total_turns": len(game_engine.history_descriptions),
-            "total_prompt_tokens": game_engine.total_prompt_tokens,
-            "last_prompt_tokens": game_engine.l_p_token,
-            "total_completion_tokens": game_engine.total_completion_tokens,
-            "last_completion_tokens": game_engine.l_c_token,
-            "total_tokens": game_engine.total_tokens,
-            "custom_config": {
-                "max_tokens": game_engine.custom_config.max_tokens,
-                "temperature": game_engine.custom_config.temperature,
-                "frequency_penalty": game_engine.custom_config.frequency_penalty,
-                "presence_penalty": game_engine.custom_config.presence_penalty,
-                "player_name": game_engine.custom_config.player_name,
-                "player_story": game_engine.custom_config.player_story,
-                "porn_value": game_engine.custom_config.porn_value,
-                "violence_value": game_engine.custom_config.violence_value,
-                "blood_value": game_engine.custom_config.blood_value,
-                "horror_value": game_engine.custom_config.horror_value,
-                "custom_prompts": game_engine.custom_config.custom_prompts,
-                "api_provider_choice": game_engine.custom_config.api_provider_choice,
-            },
-            "character_attributes": game_engine.character_attributes,
-            "situation_value": game_engine.situation,
-            "token_consumes": game_engine.token_consumes,
-            "extra_datas": extra_datas,
-            "item_repo": game_engine.item_repository,
-            "is_no_options": game_engine.prompt_manager.is_no_options,
-            "variables": game_engine.variables,
-        }
-
-        # 生成文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        if is_manual_save:
-            filename = f"manual_{save_name}_{timestamp}.json"
-        else:
-            filename = f"{save_name}_{timestamp}.json"
+        # 历史剧情以分块方式存入对象仓库，存档只保存分块引用
+        store = ObjectStore(game_save_dir)
+        history_refs = {"chunk_size": HISTORY_CHUNK_SIZE, "chars": {}}
+        for field in CHUNKED_HISTORY_FIELDS:
+            items = getattr(game_engine, field)
+            refs = store.put_history(items)
+            history_refs[field] = refs
+            if field in TEXT_HISTORY_FIELDS:
+                history_refs["chars"][field] = history_text_length(items)
+            # 已落盘的较早回合移出内存，只保留最近的分块
+            if not isinstance(items, LazyHistory):
+                items = LazyHistory(store, [], items)
+                setattr(game_engine, field, items)
+            items.store = store
+            items.spill(refs)
+        save_data["history_refs"] = history_refs
+
+        filename = f"{name}.json"
         filepath = os.path.join(game_save_dir, filename)
+        latest_file = os.path.join(
+            game_save_dir, f"{branch_name}_latest.json")
+
+        # 写入前增加新存档引用的分块计数，被覆盖的存档引用的分块在写入后释放
+        chunks = referenced_chunks(save_data)
+        replaced = [save_file_chunks(path) for path in (filepath, latest_file)]
+        store.retain([chunks, chunks],
+                     lambda: scan_history_refcounts(game_save_dir))
 
-        # 保存到文件
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, ensure_ascii=False, indent=2)
+        # 保存到文件(文件头在前，浏览存档时只需读取文件头)
+        write_save_file(filepath, save_data)
 
         # 更新最新保存文件
-        latest_file = os.path.join(game_save_dir, f"{save_name}_latest.json")
-        with open(latest_file, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, ensure_ascii=False, indent=2)
+        write_save_file(latest_file, save_data)
+        store.release(replaced)
 
-        # 如果不是手动保存，进行自动存档管理
+        # 如果不是手动保存，进行自动存档管理(各分支分别轮换)
         if not is_manual_save:
-            manage_auto_saves(game_save_dir, save_name)
+            manage_auto_saves(game_save_dir, branch_name)
 
         return True, f"游戏已保存到 {game_engine.game_id}/{filename}"
 
@@ -161,7 +238,7 @@ def manage_auto_saves(game_save_dir, save_name="autosave"):
     try:
         # 获取所有自动保存文件
         auto_save_files = [f for f in os.listdir(game_save_dir)
-                           if f.startswith(save_name) and f.endswith('.json')
+                           if f.startswith(save_name + "_") and f.endswith('.json')
                            and not f.startswith('manual_') and not f.endswith('_latest.json')]
 
         if len(auto_save_files) > 10:
@@ -169,20 +246,66 @@ def manage_auto_saves(game_save_dir, save_name="autosave"):
             auto_save_files.sort()  # 文件名包含时间戳，排序后最早的在前
             files_to_delete = auto_save_files[:-10]  # 保留最后10个
 
+            released = []
             for filename in files_to_delete:
                 filepath = os.path.join(game_save_dir, filename)
+                released.append(save_file_chunks(filepath))
                 os.remove(filepath)
 
+            # 被删除的存档引用的分块计数减一，不再被引用的分块随之删除
+            release_history_chunks(game_save_dir, released)
+
     except Exception as e:  # type:ignore
         print(f"自动存档管理失败: {e}")
 
 
-def load_game(game_engine, save_name="autosave", filename=None, game_id=None):
+def save_file_chunks(filepath):
+    """一个存档文件引用的历史分块(只读取history段)；文件不存在时为空"""
+    if not os.path.exists(filepath):
+        return set()
+    return referenced_chunks(read_save_file(filepath, sections=("history",)))
+
+
+def scan_history_refcounts(game_save_dir):
+    """统计该游戏各存档对历史分块的引用数"""
+    counts = {}
+    for filename in os.listdir(game_save_dir):
+        if filename.endswith('.json'):
+            for digest in save_file_chunks(os.path.join(game_save_dir, filename)):
+                counts[digest] = counts.get(digest, 0) + 1
+    return counts
+
+
+def release_history_chunks(game_save_dir, released):
+    """存档删除后释放其引用的分块；没有引用计数记录时(旧版存档目录)完整清理一次"""
+    if ObjectStore(game_save_dir).release(released) is None:
+        collect_history_garbage(game_save_dir)
+
+
+def collect_history_garbage(game_save_dir):
+    """重新统计引用计数，并清理对象仓库中不再被该游戏任何存档引用的历史分块"""
+    counts = scan_history_refcounts(game_save_dir)
+    store = ObjectStore(game_save_dir)
+    if os.path.isdir(store.objects_dir):
+        store.write_refcounts(counts)
+    return store.collect_garbage(set(counts))
+
+
+def load_game(game_engine, save_name="autosave", filename=None, game_id=None, branch=None):
     """
     从文件加载游戏状态
+    只指定游戏ID时，加载branch分支(未指定时为最近游玩的分支)的最新存档
     """
-    global extra_datas
     try:
+        if config.save_backend == "sqlite":
+            save_data = get_sqlite_store().read_save(
+                save_name, filename, game_id, branch)
+            if save_data is None:
+                return False, 0, f"没有找到 {filename or save_name} 的保存"
+            if not confirm_save_version(save_data["version"]):
+                return False, 0, "版本号不匹配"
+            return apply_save_data(game_engine, save_data)
+
         save_dir = "saves"
 
         if not os.path.exists(save_dir):
@@ -204,8 +327,13 @@ def load_game(game_engine, save_name="autosave", filename=None, game_id=None):
                 game_save_dir = os.path.join(save_dir, game_id)
                 if not os.path.exists(game_save_dir):
                     return False, 0, f"没有找到游戏 {game_id} 的保存目录"
-                filepath = os.path.join(
-                    game_save_dir, f"{save_name}_latest.json")
+                if branch:
+                    filepath = os.path.join(
+                        game_save_dir, f"{branch_save_name(branch, save_name)}_latest.json")
+                else:
+                    filepath = find_latest_save(save_dir, save_name, game_id)
+                    if not filepath:
+                        return False, 0, f"没有找到游戏 {game_id} 的 {save_name} 保存文件"
             else:
                 # 查找所有游戏的最新保存
                 filepath = find_latest_save(save_dir, save_name)
@@ -215,39 +343,93 @@ def load_game(game_engine, save_name="autosave", filename=None, game_id=None):
         if not os.path.exists(filepath):
             return False, 0, f"保存文件不存在: {filepath}"
 
-        # 读取保存数据
-        with open(filepath, 'r', encoding='utf-8') as f:
-            save_data = json.load(f)
+        # 先只读文件头检查版本，确认后再解析数据段
+        if not confirm_save_version(read_save_header(filepath)["version"]):
+            return False, 0, "版本号不匹配"
+        save_data = read_save_file(filepath)
+
+        return apply_save_data(game_engine, save_data, os.path.dirname(filepath))
+
+    except Exception as e:  # type:ignore
+        return False, 0, f"加载失败: {str(e)}"
+
+
+def confirm_save_version(save_version):
+    """
+    存档版本与游戏版本不一致时询问是否强制读取
+    """
+    if save_version != VERSION:
+        tmp = input(
+            f"\n[警告]:不匹配的版本号(存档{save_version} -- 游戏{VERSION})\n 强制读取？(y/n)")
+        return tmp.lower() == "y"
+    return True
 
+
+def apply_save_data(game_engine, save_data, game_save_dir=None):
+    """
+    将存档数据恢复到游戏引擎
+    """
+    global extra_datas
+    try:
         # 恢复游戏状态
-        if save_data["version"] != VERSION:
-            tmp = input(
-                f"\n[警告]:不匹配的版本号(存档{save_data['version']} -- 游戏{VERSION})\n 强制读取？(y/n)")
-            if tmp.lower() != "y":
-                return False, 0, "版本号不匹配"
         game_engine.game_id = save_data["game_id"]
+        game_engine.branch_id = save_data.get("branch") or MAIN_BRANCH
+        game_engine.branch_from = save_data.get("branch_from")
         game_engine.player_name = save_data["player_name"]
         game_engine.prompt_manager.prompts_sections["user_story"] = save_data["player_story"]
-        game_engine.current_description = save_data["current_description"]
-        game_engine.current_options = save_data["current_options"]
+        # 旧版存档中的剧情与选项带有颜色代码，读档时去除(颜色在显示时添加)
+        game_engine.current_description = strip_ansi(
+            save_data["current_description"])
+        game_engine.current_options = [Option.from_json(opt)
+                                       for opt in save_data["current_options"]]
+        for option in game_engine.current_options:
+            option.text = strip_ansi(option.text)
+            option.next_preview = strip_ansi(option.next_preview)
         game_engine.current_game_status = save_data["current_game_status"]
-        game_engine.history_descriptions = save_data["history_descriptions"]
-        game_engine.history_choices = save_data["history_choices"]
+        history_refs = save_data.get("history_refs")
+        for field in CHUNKED_HISTORY_FIELDS:
+            if history_refs and field in history_refs:
+                # 只读取最近的分块，较早的回合在访问时按需从对象仓库读取
+                setattr(game_engine, field, LazyHistory.from_refs(
+                    ObjectStore(game_save_dir), history_refs[field],
+                    chunk_size=history_refs.get(
+                        "chunk_size", HISTORY_CHUNK_SIZE),
+                    total_chars=history_refs.get("chars", {}).get(field) if field in TEXT_HISTORY_FIELDS else None))
+            else:
+                # 旧版存档及SQLite存档直接带有完整历史(更早的存档没有事件记录)
+                setattr(game_engine, field, save_data.get(field, []))
+        for field in TEXT_HISTORY_FIELDS:
+            items = getattr(game_engine, field)
+            if isinstance(items, LazyHistory):
+                # 较早的分块不读取，显示与写日志时再去除颜色代码
+                items.map_resident(strip_ansi)
+            else:
+                setattr(game_engine, field, [strip_ansi(it) for it in items])
+        game_engine.mark_history_rewritten()
         game_engine.history_simple_summaries = save_data["history_simple_summaries"]
-        game_engine.inventory = save_data["inventory"]
+        game_engine.inventory = Inventory(save_data["inventory"])
         # game_engine.conversation_history = save_data["conversation_history"]
         game_engine.total_prompt_tokens = save_data["total_prompt_tokens"]
         game_engine.l_p_token = save_data["last_prompt_tokens"]
         game_engine.total_completion_tokens = save_data["total_completion_tokens"]
         game_engine.l_c_token = save_data["last_completion_tokens"]
         game_engine.total_tokens = save_data["total_tokens"]
-        game_engine.character_attributes = save_data["character_attributes"]
+        game_engine.character_attributes = TrackedDict(
+            save_data["character_attributes"])
         game_engine.situation = save_data["situation_value"]
         game_engine.token_consumes = save_data["token_consumes"]
-        game_engine.item_repository = save_data["item_repo"]
+        game_engine.item_repository = Inventory(save_data["item_repo"])
         extra_datas = save_data["extra_datas"]
         game_engine.prompt_manager.is_no_options = save_data["is_no_options"]
-        game_engine.variables = save_data["variables"]
+        game_engine.variables = TrackedDict(save_data["variables"])
+        # 回退快照按偏移引用上面恢复的历史
+        game_engine.rewind_ring = RewindRing.from_json(
+            game_engine, save_data.get("rewind_journal"))
+        # 没有事件记录的旧存档以读档时的状态作为事件起点
+        game_engine.events_base = save_data.get(
+            "events_base") or capture_event_base(game_engine)
+        # 旧存档没有随机数种子，沿用引擎当前的种子
+        game_engine.seed_rng(save_data.get("rng_seed", game_engine.rng_seed))
 
         # 恢复配置
         config_data = save_data["custom_config"]
@@ -267,7 +449,7 @@ def load_game(game_engine, save_name="autosave", filename=None, game_id=None):
 
         timestamp = datetime.fromisoformat(
             save_data["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-        return True, save_data['total_turns'], f"游戏已加载 (游戏ID: {save_data['game_id']}, 保存时间: {timestamp})"
+        return True, save_data['total_turns'], f"游戏已加载 (游戏ID: {game_engine.game_label()}, 保存时间: {timestamp})"
 
     except Exception as e:  # type:ignore
         return False, 0, f"加载失败: {str(e)}"
@@ -284,21 +466,22 @@ def find_save_file_by_name(save_dir, filename):
     return None
 
 
-def find_latest_save(save_dir, save_name="autosave"):
-    """查找所有游戏中最新的保存文件"""
+def find_latest_save(save_dir, save_name="autosave", game_id=None):
+    """查找所有游戏(或指定游戏)各分支中最新的保存文件"""
     latest_save = None
     latest_time = None
 
-    for game_id in os.listdir(save_dir):
-        game_save_dir = os.path.join(save_dir, game_id)
-        if os.path.isdir(game_save_dir):
-            latest_file = os.path.join(
-                game_save_dir, f"{save_name}_latest.json")
-            if os.path.exists(latest_file):
+    for gid in [game_id] if game_id else os.listdir(save_dir):
+        game_save_dir = os.path.join(save_dir, gid)
+        if not os.path.isdir(game_save_dir):
+            continue
+        for filename in os.listdir(game_save_dir):
+            # 主分支为<save_name>_latest.json，其他分支为<分支名>@<save_name>_latest.json
+            if filename == f"{save_name}_latest.json" or filename.endswith(f"@{save_name}_latest.json"):
+                latest_file = os.path.join(game_save_dir, filename)
                 try:
-                    with open(latest_file, 'r', encoding='utf-8') as f:
-                        save_data = json.load(f)
-                    save_time = datetime.fromisoformat(save_data["timestamp"])
+                    header = read_save_header(latest_file)
+                    save_time = datetime.fromisoformat(header["timestamp"])
                     if latest_time is None or save_time > latest_time:
                         latest_time = save_time
                         latest_save = latest_file
@@ -314,6 +497,9 @@ def list_saves():
     列出所有保存文件，按游戏ID分类
     """
     try:
+        if config.save_backend == "sqlite":
+            return get_sqlite_store().list_saves()
+
         save_dir = "saves"
         if not os.path.exists(save_dir):
             return []
@@ -333,13 +519,14 @@ def list_saves():
             for filename in save_files:
                 filepath = os.path.join(game_save_dir, filename)
                 try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        save_data = json.load(f)
+                    # 只读取文件头，不解析剧情与状态
+                    save_data = read_save_header(filepath)
                     timestamp = datetime.fromisoformat(
                         save_data["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-                    save_desc = save_data.get("save_desc", "autosave")
+                    save_desc = save_data.get("save_desc") or "autosave"
                     save_info.append({
                         "game_id": game_id,
+                        "branch": save_data.get("branch") or MAIN_BRANCH,
                         "filename": filename,
                         "player_name": save_data["player_name"],
                         "timestamp": timestamp,
@@ -365,16 +552,27 @@ def delete_save(game_id, filename):
     删除指定的保存文件
     """
     try:
+        if config.save_backend == "sqlite":
+            if get_sqlite_store().delete_save(game_id, filename):
+                return True, f"保存 {game_id}/{filename} 已删除"
+            return False, f"保存 {game_id}/{filename} 不存在"
+
         filepath = os.path.join("saves", game_id, filename)
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            return True, f"保存文件 {game_id}/{filename} 已删除"
-        else:
+        if not os.path.exists(filepath):
             return False, f"保存文件 {game_id}/{filename} 不存在"
+        chunks = save_file_chunks(filepath)
+        os.remove(filepath)
 
     except Exception as e:  # type:ignore
         return False, f"删除失败: {str(e)}"
 
+    # 存档已删除，清理分块失败不影响删除结果(分块只会多留，不会误删)
+    try:
+        release_history_chunks(os.path.join("saves", game_id), [chunks])
+    except Exception as e:  # type:ignore
+        print(f"清理历史分块失败: {e}")
+    return True, f"保存文件 {game_id}/{filename} 已删除"
+
 # 手动保存函数（供用户调用）
 
 
@@ -406,7 +604,7 @@ def manual_load(game_engine):
     for i, save in enumerate(saves, 1):
         save_type = "手动" if save['save_type'] == 'manual' else "自动"
         print(
-            f"{i}.{save['game_id']}{'-'+save['save_desc']if save['save_desc'] != 'autosave' else ''}-{save['player_name']}-回合{save['total_turns']}-{save_type}{'-'+COLOR_YELLOW+"不匹配的游戏版本"+save['ver']+COLOR_RESET if save['ver'] != VERSION else ''}")
+            f"{i}.{save['game_id']}{'@'+save['branch'] if save['branch'] != MAIN_BRANCH else ''}{'-'+save['save_desc']if save['save_desc'] != 'autosave' else ''}-{save['player_name']}-回合{save['total_turns']}-{save_type}{'-'+COLOR_YELLOW+"不匹配的游戏版本"+save['ver']+COLOR_RESET if save['ver'] != VERSION else ''}")
 
     try:
         choice = input("选择要加载的存档编号（输入0取消）: ")
@@ -432,18 +630,85 @@ def manual_load(game_engine):
         return False, 0
 
 
+def fork_game(game_engine: GameEngine):
+    """
+    从本回合(或最近若干回合之前)分出新分支，新分支与原分支共享此前的历史
+    返回分出时所在回合的快照，取消或失败时返回None
+    """
+    existing = {save["branch"] for save in list_saves()
+                if save["game_id"] == game_engine.game_id}
+    print(
+        f"当前分支: {game_engine.branch_id}  已有分支: {', '.join(sorted(existing)) or '无'}")
+    branch = input("新分支名(字母、数字、-、_，留空自动命名，输入0取消)：\n:: ").strip()
+    if branch == "0":
+        return None
+    if not branch:
+        branch = "b" + datetime.now().strftime("%m%d%H%M%S")
+    if not all(c.isalnum() or c in "-_" for c in branch) or branch in existing \
+            or branch in (MAIN_BRANCH, game_engine.branch_id):
+        print("分支名无效或已存在")
+        return None
+    max_steps = game_engine.rewind_ring.max_steps()
+    steps = input(
+        f"从几个回合之前分出？(0为本回合开始，最多{max_steps})\n:: ").strip() or "0"
+    if not steps.isdigit() or int(steps) > max_steps:
+        print("回合数无效")
+        return None
+    # 先保存原分支的当前状态，之后的存档都属于新分支
+    success, message = save_game(game_engine)
+    if not success:
+        print(message)
+        return None
+    from_branch = game_engine.branch_id
+    snapshot = game_engine.rewind_ring.rewind(game_engine, int(steps))
+    if snapshot is None:
+        print("没有可分出的回合")
+        return None
+    game_engine.branch_id = branch
+    game_engine.branch_from = {"branch": from_branch, "turn": snapshot.turn}
+    print(f"已从分支{from_branch}的第{snapshot.turn}回合分出新分支{branch}")
+    return snapshot
+
+
+def toggle_recording(game_engine):
+    """开始/停止录制AI调用与玩家操作(录制文件保存在日志目录，可用tools/replay_cassette.py离线重放)"""
+    if game_engine.cassette is not None:
+        game_engine.cassette.close()
+        print(f"已停止录制: {game_engine.cassette.path}")
+        game_engine.cassette = None
+        return
+    path = os.path.join(
+        LOG_DIR, game_engine.game_label()+f"_{datetime.now().strftime('%Y%m%d_%H%M%S')}.cassette.jsonl")
+    game_engine.cassette = Cassette(path, MODE_RECORD)
+    record_cassette_state(game_engine)
+    print(f"开始录制: {path}")
+
+
+def record_cassette_state(game_engine):
+    """
+    录制中时记录当前的完整状态(重放从此状态继续)
+    在开始录制及读档、回退、分支等不经过AI调用改变状态的操作之后调用
+    """
+    if game_engine.cassette is None:
+        return
+    save_data = build_save_data(game_engine)
+    for field in CHUNKED_HISTORY_FIELDS:
+        save_data[field] = list(getattr(game_engine, field))
+    game_engine.cassette.record_action(ACTION_STATE, save=save_data)
+
+
 def clear_screen():
     """
     清空控制台屏幕
     """
-    os.system('cls' if os.name == 'nt' else 'clear')
+    SCREEN.clear()
 
 
 def display_narrative(narr: str):
     """
     打字机效果显示剧情文本
     """
-    return display_narrative_with_typewriter(narr)
+    return display_narrative_with_typewriter(render_narrative(narr))
 
 
 def display_options(game: GameEngine):
@@ -458,35 +723,35 @@ def display_options(game: GameEngine):
     options, chara_attrs, situation = game.current_options, game.character_attributes, game.situation
     print("\n" + "你准备：")
     for opt in options:
-        print(f"{opt['id']}. {opt['text']}", end="")
+        print(f"{opt.id}. {render_narrative(opt.text)}", end="")
         fix_value = (chara_attrs.get(
-            opt["main_factor"], 0)-opt["difficulty"])*3/2000
+            opt.main_factor, 0)-opt.difficulty)*3/2000
         # 处理形势
         if situation > 0:
             fix_value += 0.01*2.2*situation**1.25
         elif situation < 0:
             fix_value += 0.04*situation
-        if opt["type"] == "check":
+        if opt.type == "check":
             # 根据几率来添加不同提示
-            if opt["probability"] < 0.05-fix_value:
+            if opt.probability < 0.05-fix_value:
                 print(f"[{COLOR_RED}✘{COLOR_RESET}]")
                 has_danger = True
-            elif opt["probability"] < 0.25-fix_value:
+            elif opt.probability < 0.25-fix_value:
                 print(f"[{COLOR_RED}!{COLOR_RESET}]")
                 has_danger = True
-            elif opt["probability"] < 0.70-fix_value:
+            elif opt.probability < 0.70-fix_value:
                 print(f"[{COLOR_YELLOW}?{COLOR_RESET}]")
                 has_event = True
             else:
                 print(f"[{COLOR_GREEN}▲{COLOR_RESET}]")
                 has_goods = True
-        elif opt["type"] == "must":
-            if chara_attrs.get(opt["main_factor"], 0) >= opt["difficulty"]:
+        elif opt.type == "must":
+            if chara_attrs.get(opt.main_factor, 0) >= opt.difficulty:
                 print(
-                    f"{COLOR_GREEN}[✓ {opt['main_factor']}≥{opt['difficulty']}]{COLOR_RESET}")
+                    f"{COLOR_GREEN}[✓ {opt.main_factor}≥{opt.difficulty}]{COLOR_RESET}")
             else:
                 print(
-                    f"{COLOR_RED}[✘ {opt['main_factor']}≥{opt['difficulty']}]{COLOR_RESET}")
+                    f"{COLOR_RED}[✘ {opt.main_factor}≥{opt.difficulty}]{COLOR_RESET}")
         else:
             print()
 
@@ -505,14 +770,14 @@ def get_user_input_and_go(game: GameEngine):
     获取用户输入并执行游戏操作
     """
     while True:
-        loader = show_loading_animation("dot", message="整理中")
-        loader.stop_animation()  # type:ignore
         user_input = input(":: ")
-        if user_input in ['exit', 'vars', 'setvar', 'delvar', 'csmode', 'opi', 'think', 'inv', 'attr', 'conclude_summary', 'help', 'summary', 'save', 'load', 'new', 'config', 'show_init_resp', 'fix_item_name', 'ana_token']:
+        if user_input == "undo" or user_input.startswith("rewind"):
+            return user_input
+        if user_input in ['exit', 'vars', 'setvar', 'delvar', 'csmode', 'opi', 'think', 'inv', 'attr', 'conclude_summary', 'help', 'summary', 'save', 'load', 'new', 'config', 'show_init_resp', 'fix_item_name', 'ana_token', 'fork', 'events', 'render_stats', 'history', 'record']:
             return user_input
         if user_input.isdigit() and 1 <= int(user_input) <= len(game.current_options):
             display_narrative(
-                game.current_options[int(user_input)-1]['next_preview'])
+                game.current_options[int(user_input)-1].next_preview)
         if user_input == "custom" or game.prompt_manager.is_no_options:
             custom_action = input("你决定 (输入空内容以取消,输入0以使用刚刚输入的内容作为行动)：")
             if custom_action == "0":
@@ -527,15 +792,48 @@ def get_user_input_and_go(game: GameEngine):
         return user_input
 
 
-def print_all_history(game: GameEngine, back_range: int = 50):
+def print_turn(record):
+    """
+    打印一个已完成的回合
+    """
+    print(f"{record.turn}:")
+    print(render_narrative(record.description))
+    print(render_choice(record.choice))
+    print("\n" + '-'*40)
+
+
+def print_all_history(game: GameEngine, back_range: int = SCREEN_HISTORY_TURNS):
     """
     打印游戏历史记录
     """
-    for turn, desc, choice in zip(range(1, len(game.history_descriptions[-back_range:])+1), game.history_descriptions[-back_range:], game.history_choices[-back_range:]):
-        print(f"{turn}:")
-        print(desc)
-        print(choice)
-        print("\n" + '-'*40)
+    for record in game.iter_turns(game.completed_turns() - back_range):
+        print_turn(record)
+
+
+def browse_history(game: GameEngine, page_size: int = HISTORY_PAGE_SIZE):
+    """
+    分页查看全部历史剧情
+    """
+    total = game.completed_turns()
+    if not total:
+        input("还没有已完成的回合，按任意键继续...")
+        return
+    pages = (total + page_size - 1) // page_size
+    page = pages - 1
+    while True:
+        clear_screen()
+        for record in game.iter_turns(page * page_size, (page + 1) * page_size):
+            print_turn(record)
+        cmd = input(
+            f"第{page+1}/{pages}页 (回车/n:下一页 p:上一页 数字:跳转到该页 q:返回)\n:: ").strip()
+        if cmd == "q":
+            return
+        if cmd in ("", "n"):
+            page = min(page + 1, pages - 1)
+        elif cmd == "p":
+            page = max(page - 1, 0)
+        elif cmd.isdigit() and 1 <= int(cmd) <= pages:
+            page = int(cmd) - 1
 
 
 def config_game():
@@ -564,6 +862,10 @@ def config_game():
             print(f"12.API提供商 [{current_provider.get('name', '未配置')}]")
             print(f"   - 模型: {current_provider.get('model', '')}")
             print(f"   - api地址: {current_provider.get('base_url', '')}")
+            print(f"13.存档方式 [{config.save_backend}]")
+            print(
+                f"14.打字机速度 [{config.typewriter_speed}字/秒{'(直接输出)' if config.typewriter_speed <= 0 else ''}]")
+            print(f"15.检定显示方式 [{CHECK_PRESENTATION_NAMES[config.check_presentation]}]")
             print("exit. 退出配置(完成配置)")
 
             while True:
@@ -572,7 +874,7 @@ def config_game():
                     is_exit = True
                     config.save_to_file()
                     break
-                if choice.isdigit() and 1 <= int(choice) <= 12:
+                if choice.isdigit() and 1 <= int(choice) <= 15:
                     choice = int(choice)
                     if choice == 1:
                         config.max_tokens = int(input("输入最大输出Token数："))
@@ -602,6 +904,28 @@ def config_game():
                             print(
                                 f"{key}. {provider['name']} (模型: {provider['model']})")
                         config.api_provider_choice = int(input("输入提供商ID："))
+                    elif choice == 13:
+                        backend = input(
+                            "输入存档方式(json: 每局一个目录的JSON文件; sqlite: 单个SQLite数据库)：").strip()
+                        if backend not in ("json", "sqlite"):
+                            input("无效的存档方式")
+                            break
+                        if backend == "sqlite" and config.save_backend != "sqlite":
+                            if input("是否将现有JSON存档导入数据库？(y/n)").strip().lower() == "y":
+                                count = get_sqlite_store().import_json_saves()
+                                input(f"已导入{count}个存档，按任意键继续")
+                        config.save_backend = backend
+                    elif choice == 14:
+                        config.typewriter_speed = max(
+                            float(input("输入打字机速度(字/秒，0为直接输出全文)：")), 0)
+                    elif choice == 15:
+                        for idx, mode in enumerate(CHECK_PRESENTATIONS, 1):
+                            print(f"{idx}. {CHECK_PRESENTATION_NAMES[mode]}")
+                        mode_idx = int(input("输入检定显示方式ID："))
+                        if not 1 <= mode_idx <= len(CHECK_PRESENTATIONS):
+                            input("无效的检定显示方式")
+                            break
+                        config.check_presentation = CHECK_PRESENTATIONS[mode_idx - 1]
 
                     break
                 else:
@@ -612,6 +936,27 @@ def config_game():
             continue
 
 
+def resolve_item_tokens(items: Inventory, tokens: list):
+    """
+    批量解析玩家输入的物品编号/名称，返回(物品名列表(去重), 不存在的输入列表)
+    编号都按操作前的列表解析，批量操作时不会因前面的物品被移走而错位
+    """
+    found, missing = {}, []
+    for token, item_name in items.resolve_many(tokens):
+        if item_name is None:
+            missing.append(token)
+        else:
+            found[item_name] = None
+    return list(found), missing
+
+
+def report_item_batch(found: list, missing: list, done_text: str, missing_text: str):
+    """显示批量物品操作的结果"""
+    for token in missing:
+        print(f"物品 {token} {missing_text}")
+    input(f"物品 {'、'.join(found)} {done_text}" if found else "没有物品被操作")
+
+
 def operate_item(game: GameEngine):
     """
     操作物品
@@ -619,7 +964,7 @@ def operate_item(game: GameEngine):
     show_desc = True
     while True:
         clear_screen()
-        print(game.current_description)
+        print(render_narrative(game.current_description))
         print("当前物品:" + game.get_inventory_text(show_desc))
         print("\n仓库物品:" + game.get_item_repository_text(show_desc))
         print("\n物品操作指令")
@@ -639,78 +984,66 @@ def operate_item(game: GameEngine):
         if user_input == "exit":
             return False
         elif user_input.startswith("*remove"):
-            item_names = user_input.split("*remove")[1].strip().split(" ")
-            for item_name in item_names:
-                if item_name.isdigit() and int(item_name) <= len(game.inventory):
-                    item_name = list(game.inventory.keys())[int(item_name)-1]
-                if item_name in game.inventory:
-                    del game.inventory[item_name]
-                    input(f"物品 {item_name} 已被销毁")
-                else:
-                    input(f"物品 {item_name} 不存在于你的库存中")
+            found, missing = resolve_item_tokens(
+                game.inventory, user_input.split("*remove")[1].strip().split(" "))
+            for item_name in found:
+                game.record_event(ITEM_REMOVE, SOURCE_PLAYER,
+                                  name=item_name, location="inventory")
+            report_item_batch(found, missing, "已被销毁", "不存在于你的库存中")
         elif user_input.startswith("*put"):
-            item_names = user_input.split("*put")[1].strip().split(" ")
-            for item_name in item_names:
-                if item_name.isdigit() and int(item_name) <= len(game.inventory):
-                    item_name = list(game.inventory.keys())[int(item_name)-1]
-                if item_name in game.inventory:
-                    game.item_repository[item_name] = game.inventory[item_name]
-                    del game.inventory[item_name]
-                    input(f"物品 {item_name} 已被存储")
-                else:
-                    input(f"物品 {item_name} 不存在于你的库存中")
+            found, missing = resolve_item_tokens(
+                game.inventory, user_input.split("*put")[1].strip().split(" "))
+            if found:
+                game.record_event(ITEM_MOVE, SOURCE_PLAYER,
+                                  names=found, to="repository")
+            report_item_batch(found, missing, "已被存储", "不存在于你的库存中")
         elif user_input.startswith("*get"):
-            item_names = user_input.split("*get")[1].strip().split(" ")
-            for item_name in item_names:
-                if item_name.isdigit() and int(item_name) <= len(game.item_repository):
-                    item_name = list(game.item_repository.keys())[
-                        int(item_name)-1]
-                if item_name in game.item_repository:
-                    game.inventory[item_name] = game.item_repository[item_name]
-                    del game.item_repository[item_name]
-                    input(f"物品 {item_name} 已被获得")
-                else:
-                    input(f"物品 {item_name} 不存在于物品仓库中")
+            found, missing = resolve_item_tokens(
+                game.item_repository, user_input.split("*get")[1].strip().split(" "))
+            if found:
+                game.record_event(ITEM_MOVE, SOURCE_PLAYER,
+                                  names=found, to="inventory")
+            report_item_batch(found, missing, "已被获得", "不存在于物品仓库中")
         elif user_input.startswith("*add"):
             item_name, item_desc = user_input.split(
                 "*add")[1].strip().split(" ", 1)
-            game.item_repository[item_name] = item_desc
+            game.record_event(ITEM_ADD, SOURCE_PLAYER, name=item_name,
+                              desc=item_desc, location="repository")
             input(f"物品 {item_name} 已被添加")
         elif user_input.startswith("*rename"):
             item_id, new_name = user_input.split(
                 "*rename")[1].strip().split(" ", 1)
-            if item_id.isdigit() and int(item_id) <= len(game.inventory):
-                item_name = list(game.inventory.keys())[int(item_id)-1]
-            if item_name in game.inventory:
-                game.inventory[new_name] = game.inventory[item_name]
-                del game.inventory[item_name]
+            item_name = game.inventory.resolve(item_id)
+            if item_name is not None:
+                game.record_event(ITEM_RENAME, SOURCE_PLAYER,
+                                  name=item_name, new_name=new_name)
                 input(f"物品 {item_name} 已被重命名为 {new_name}")
             else:
-                input(f"物品 {item_name} 不存在于你的库存中")
+                input(f"物品 {item_id} 不存在于你的库存中")
         elif user_input.startswith("*redesc"):
             item_id, new_desc = user_input.split(
                 "*redesc")[1].strip().split(" ", 1)
-            if item_id.isdigit() and int(item_id) <= len(game.inventory):
-                item_name = list(game.inventory.keys())[int(item_id)-1]
-            if item_name in game.inventory:
-                game.inventory[item_name] = new_desc
+            item_name = game.inventory.resolve(item_id)
+            if item_name is not None:
+                game.record_event(ITEM_REDESC, SOURCE_PLAYER,
+                                  name=item_name, desc=new_desc)
                 input(f"物品 {item_name} 已被重描述为 {new_desc}")
             else:
-                input(f"物品 {item_name} 不存在于你的库存中")
+                input(f"物品 {item_id} 不存在于你的库存中")
         elif user_input == "**putall":
-            game.item_repository.update(game.inventory)
-            game.inventory.clear()
+            game.record_event(ITEM_MOVE, SOURCE_PLAYER,
+                              names=list(game.inventory), to="repository")
             input("所有物品已被存储")
         elif user_input == "**getall":
-            game.inventory.update(game.item_repository)
-            game.item_repository.clear()
+            game.record_event(ITEM_MOVE, SOURCE_PLAYER,
+                              names=list(game.item_repository), to="inventory")
             input("所有物品已被获得")
         elif user_input.startswith("*use"):
             itemname, action, target = user_input.split(
                 "*use")[1].strip().split()
-            if itemname.isdigit() and int(itemname) <= len(game.inventory):
-                itemname = list(game.inventory.keys())[int(itemname)-1]
-            if itemname in game.inventory:
+            item_name = game.inventory.resolve(itemname)
+            if item_name is not None:
+                itemname = item_name
                 print("等待合理性判定...")
                 if game.is_use_item_ok(itemname, action, target):
                     print("操作合理，正在执行...")
@@ -729,13 +1062,12 @@ def operate_item(game: GameEngine):
             else:
                 input(f"物品 {itemname} 不存在于你的库存中")
         elif user_input.startswith("*desc"):
-            item_name = user_input.split("*desc")[1].strip()
-            if item_name.isdigit() and int(item_name) <= len(game.inventory):
-                item_name = list(game.inventory.keys())[int(item_name)-1]
-            if item_name in game.inventory:
+            item_id = user_input.split("*desc")[1].strip()
+            item_name = game.inventory.resolve(item_id)
+            if item_name is not None:
                 input(f"物品 {item_name} 的描述为: {game.inventory[item_name]}")
             else:
-                input(f"物品 {item_name} 不存在于你的库存中")
+                input(f"物品 {item_id} 不存在于你的库存中")
         elif user_input == "*showdesc":
             show_desc = not show_desc
         else:
@@ -744,6 +1076,42 @@ def operate_item(game: GameEngine):
     return False
 
 
+def show_events(game: GameEngine, back_range: int = 30):
+    """
+    显示最近的状态事件，并校验重放全部事件得到的状态与当前状态是否一致
+    """
+    clear_screen()
+    total = len(game.events)
+    print(f"状态事件共{total}条，最近{min(back_range, total)}条：")
+    for event in game.events[max(total - back_range, 0):]:
+        data = {k: v for k, v in event.items()
+                if k not in ("turn", "type", "source")}
+        print(f"[回合{event['turn']}] {event['source']}:{event['type']} {data if data else ''}")
+    print("\n按来源与类型统计：")
+    for (source, kind), count in sorted(summarize_events(game.events).items()):
+        print(f"{source}:{kind} × {count}")
+    mismatched = diff_state(game, game.replay_events())
+    if mismatched:
+        print(f"{COLOR_RED}重放结果与当前状态不一致: {', '.join(mismatched)}{COLOR_RESET}")
+    else:
+        print(f"{COLOR_GREEN}重放结果与当前状态一致{COLOR_RESET}")
+
+
+def show_render_stats(game: GameEngine):
+    """
+    显示文本渲染缓存的命中情况(调试用)
+    """
+    clear_screen()
+    print("文本渲染缓存(渲染器: 命中/未命中)：")
+    for cache in (game.render_cache, game.custom_config.render_cache):
+        for name, hits, misses in cache.stats():
+            if isinstance(name, tuple):
+                name = f"{name[0]}({', '.join(map(str, name[1:]))})"
+            print(f"{name}: {hits}/{misses}")
+    for name, hits, misses in render_cache_info():
+        print(f"{name}: {hits}/{misses}")
+
+
 def analyze_token_consume(game: GameEngine):
     """
     分析游戏过程中token消耗趋势
@@ -879,8 +1247,8 @@ def new_game(no_auto_load=False):
             except ValueError:
                 print("请输入6个数")
                 continue
-            for key, val in zip(GAME.character_attributes.keys(), attrs):
-                GAME.character_attributes[key] = val
+            GAME.record_event(ATTR_SET, SOURCE_PLAYER, attrs=dict(
+                zip(GAME.character_attributes.keys(), attrs)))
             break
         print(GAME.get_attribute_text(colorize=True))
         tmp = input("以自定义模式开局？(y/n)")
@@ -907,35 +1275,61 @@ def new_game(no_auto_load=False):
 
     while GAME.current_game_status == "ongoing":
 
-        clear_screen()
-        print_all_history(GAME)
+        frame_start = time.perf_counter()
+        typewriter_used = not no_repeat_sign
+        completed_turns = GAME.completed_turns()
+        first_new_turn = SCREEN.pending_turns(completed_turns)
+        if first_new_turn is None:
+            # 屏幕已被清空或历史被替换：整屏重绘最近的回合
+            clear_screen()
+            print_all_history(GAME)
+            description_delta = GAME.current_description
+        else:
+            # 只追加新完成回合的选择(其剧情已在屏幕上)与剧情的新增部分
+            for record in GAME.iter_turns(first_new_turn):
+                print(render_choice(record.choice))
+                print("\n" + '-'*40)
+            if first_new_turn < completed_turns:
+                description_delta = GAME.current_description
+            else:
+                description_delta = SCREEN.description_delta(
+                    GAME.current_description)
+                if description_delta is None:
+                    description_delta = GAME.current_description
         if not no_repeat_sign:
             display_narrative(GAME.current_description)
             no_repeat_sign = True
-        else:
-            print(GAME.current_description)
+        elif description_delta:
+            print(render_narrative(description_delta))
+        SCREEN.mark_drawn(completed_turns, GAME.current_description)
         print(GAME.get_situation_text())
         GAME.print_all_messages_await()
         show_item_var_caution(GAME)
         display_options(GAME)
 
         print(
-            f"字数:{sum([len(it) for it in GAME.history_descriptions])} | Token/all:{GAME.l_c_token+GAME.l_p_token}/{GAME.total_tokens} | Ver:{VERSION} | [{GAME.game_id}]")
+            f"字数:{SCREEN.word_counter.update(GAME.history_descriptions)} | Token/all:{GAME.l_c_token+GAME.l_p_token}/{GAME.total_tokens} | Ver:{VERSION} | [{GAME.game_label()}]")
+        if not typewriter_used:
+            SCREEN.record_redraw(time.perf_counter() - frame_start)
         if show_init_resp:
             print(GAME.current_response)
             print(GAME.get_token_stats())
+            print(PARSE_STATS.report())
+            print(SCREEN.redraw_stats())
         if not GAME.current_description.strip() or not GAME.current_options:
             print("可能出现错误")
             print(GAME.current_response)
         GAME.log_game(os.path.join(
-            LOG_DIR, GAME.game_id+f"_{CURRENT_TIME}.log"))
+            LOG_DIR, GAME.game_label()+f"_{CURRENT_TIME}.log"))
         save_game(GAME)
+        GAME.rewind_ring.capture(GAME, extra_datas)
         user_input = get_user_input_and_go(GAME)
 
         if user_input == "exit":
             return 'exit'
         elif user_input == "csmode":
             GAME.prompt_manager.is_no_options = not GAME.prompt_manager.is_no_options
+            record_cassette_state(GAME)
             print(f"自定义模式{'开启' if GAME.prompt_manager.is_no_options else '关闭'}")
             input("按任意键继续...")
             continue
@@ -949,6 +1343,13 @@ def new_game(no_auto_load=False):
                 continue
             input("按任意键继续...")
             continue
+        elif user_input == "history":
+            browse_history(GAME)
+            continue
+        elif user_input == "record":
+            toggle_recording(GAME)
+            input("按任意键继续...")
+            continue
         elif user_input == "summary":
             clear_screen()
             print("摘要")
@@ -974,7 +1375,7 @@ def new_game(no_auto_load=False):
             print(GAME.get_vars_text())
             name = input("请输入要设置的变量名：\n:: ")
             val = input("请输入要设置的变量值：\n:: ")
-            GAME.variables[name] = val
+            GAME.record_event(VAR_SET, SOURCE_PLAYER, vars={name: val})
             input("完成设置，按任意键继续...")
             continue
         elif user_input == "delvar":
@@ -984,7 +1385,7 @@ def new_game(no_auto_load=False):
             if name not in GAME.variables:
                 input("变量不存在，按任意键继续...")
                 continue
-            del GAME.variables[name]
+            GAME.record_event(VAR_DEL, SOURCE_PLAYER, name=name)
             input("完成删除，按任意键继续...")
             continue
         elif user_input == "save":
@@ -996,6 +1397,8 @@ def new_game(no_auto_load=False):
             if loadsuccess:
                 print("成功加载，按任意键继续...")
                 no_repeat_sign = False  # 加载游戏成功，重新启用打字机效果
+                SCREEN.invalidate()
+                record_cassette_state(GAME)
                 continue
             else:
                 print("加载失败，按任意键继续...")
@@ -1003,6 +1406,34 @@ def new_game(no_auto_load=False):
         elif user_input == "config":
             config_game()
             continue
+        elif user_input == "fork":
+            snapshot = fork_game(GAME)
+            if snapshot is not None:
+                extra_datas = dict(snapshot.extra)
+                no_repeat_sign = False
+                SCREEN.invalidate()
+                record_cassette_state(GAME)
+            input("按任意键继续...")
+            continue
+        elif user_input == "undo" or user_input.startswith("rewind"):
+            if user_input == "undo":
+                steps = "1"
+            else:
+                steps = user_input[len("rewind"):].strip() or input(
+                    f"回退几个回合？(0为回到本回合开始，最多{GAME.rewind_ring.max_steps()})\n:: ").strip()
+            if not steps.isdigit():
+                input("请输入回合数，按任意键继续...")
+                continue
+            snapshot = GAME.rewind_ring.rewind(GAME, int(steps))
+            if snapshot is None:
+                input(
+                    f"无法回退{steps}个回合(最多{GAME.rewind_ring.max_steps()})，按任意键继续...")
+                continue
+            extra_datas = dict(snapshot.extra)
+            no_repeat_sign = False  # 回退后重新以打字机效果显示本回合
+            SCREEN.invalidate()
+            record_cassette_state(GAME)
+            continue
         elif user_input == "new":
             return 'new_game'
         elif user_input == "show_init_resp":
@@ -1011,13 +1442,21 @@ def new_game(no_auto_load=False):
             input("按任意键继续...")
             continue
         elif user_input == "fix_item_name":
-            GAME.fix_item_name_error()
+            GAME.fix_item_name_error(SOURCE_PLAYER)
             print("道具名修复完成")
             input("按任意键继续...")
             continue
         elif user_input == "ana_token":
             analyze_token_consume(GAME)
             continue
+        elif user_input == "events":
+            show_events(GAME)
+            input("按任意键继续...")
+            continue
+        elif user_input == "render_stats":
+            show_render_stats(GAME)
+            input("按任意键继续...")
+            continue
         elif user_input == "think":
             if extra_datas["think_count_remain"] <= 0:
                 input("你无法再思考了，做出决定吧.(按任意键继续)")
@@ -1036,6 +1475,9 @@ def new_game(no_auto_load=False):
             print("可用指令：")
             print(f"{COLOR_GREEN}save{COLOR_RESET}:保存游戏")
             print(f"{COLOR_GREEN}load{COLOR_RESET}:读取游戏")
+            print(f"{COLOR_GREEN}undo{COLOR_RESET}:撤销上一回合")
+            print(f"{COLOR_GREEN}rewind k{COLOR_RESET}:回退k个回合")
+            print(f"{COLOR_GREEN}fork{COLOR_RESET}:从当前或之前的回合分出新分支")
             print(f"{COLOR_GREEN}new{COLOR_RESET}:新游戏")
             print(f"{COLOR_GREEN}config{COLOR_RESET}:配置游戏")
             print(f"{COLOR_GREEN}exit{COLOR_RESET}: 退出游戏")
@@ -1043,6 +1485,7 @@ def new_game(no_auto_load=False):
             print(f"{COLOR_GREEN}opi{COLOR_RESET}:进行道具操作")
             print(f"{COLOR_GREEN}attr{COLOR_RESET}:显示属性")
             print(f"{COLOR_GREEN}summary{COLOR_RESET}:查看摘要")
+            print(f"{COLOR_GREEN}history{COLOR_RESET}:分页查看全部历史剧情")
             print(f"{COLOR_GREEN}vars{COLOR_RESET}:查看变量")
             print(f"{COLOR_YELLOW}custom{COLOR_RESET}:自定义行动")
             print(f"{COLOR_YELLOW}csmode{COLOR_RESET}:切换自定义模式")
@@ -1051,6 +1494,9 @@ def new_game(no_auto_load=False):
             print(f"{COLOR_YELLOW}delvar{COLOR_RESET}:删除变量")
             print(f"{COLOR_RED}conclude_summary{COLOR_RESET}:手动总结当前摘要(不推荐)")
             print(f"{COLOR_RED}ana_token{COLOR_RESET}:统计token数据")
+            print(f"{COLOR_RED}events{COLOR_RESET}:查看状态事件记录并校验重放结果")
+            print(f"{COLOR_RED}render_stats{COLOR_RESET}:查看文本渲染缓存的命中情况(debug)")
+            print(f"{COLOR_RED}record{COLOR_RESET}:开始/停止录制AI调用(离线重放用,debug)")
             print(f"{COLOR_RED}fix_item_name{COLOR_RESET}:修复道具名中的错误")
             print(
                 f"{COLOR_RED}show_init_resp{COLOR_RESET}:切换显示对每轮剧情的AI的原始相应与Token信息(debug)")
@@ -0,0 +1,140 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 选项、回合、Token用量、AI回复与检定掷骰的记录类型(__slots__数据类，只在解析时校验一次)
+from dataclasses import dataclass, replace
+from typing import Optional
+
+
+def _as_float(value, default: float = 0.0) -> float:
+    """概率值转换为浮点数，空值或无法转换时为default"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(slots=True)
+class Option:
+    """一个可选行动"""
+    id: int
+    text: str
+    type: str = "normal"  # normal/check/must
+    main_factor: str = ""
+    difficulty: int = 0
+    base_probability: float = 0.0
+    probability: Optional[float] = None  # 只有检定(check)选项有
+    next_preview: str = ""
+    extra: str = ""  # "custom_action"表示自定义行动(绕过门槛检测)
+
+    @classmethod
+    def parse(cls, raw: dict, **overrides) -> "Option":
+        """
+        校验并规范化AI给出的选项，格式错误时抛出ValueError/TypeError
+        ({'id': 1, 'text': '选项1', 'type': 'check','main_factor':'STR','base_probability': 0.5,'next_preview': '下一个预览'})
+        """
+        if not isinstance(raw, dict):
+            raise TypeError(f"选项不是对象: {raw}")
+        raw = dict(raw, **overrides)
+        option_type = str(raw.get("type", "normal"))
+        base_probability = _as_float(raw.get("base_probability", 0.0))
+        # 检定选项总有概率(基础概率作为初始概率)，未提供时为0
+        probability = base_probability if option_type == "check" else None
+        main_factor = str(raw.get("main_factor", "") or "")
+        if option_type == "must" and not main_factor:
+            main_factor = "LUK"
+        return cls(
+            id=int(raw.get("id", 0)),
+            text=str(raw.get("text", "")),
+            type=option_type,
+            main_factor=main_factor,
+            difficulty=int(float(raw.get("difficulty", 0) or 0)),
+            base_probability=base_probability,
+            probability=probability,
+            next_preview=str(raw.get("next_preview", "") or ""),
+            extra=str(raw.get("extra", "") or ""),
+        )
+
+    def to_json(self) -> dict:
+        """存档中的形式(与旧版存档的选项字典相同)"""
+        data = {
+            "id": self.id,
+            "text": self.text,
+            "type": self.type,
+            "main_factor": self.main_factor,
+            "difficulty": self.difficulty,
+            "base_probability": self.base_probability,
+            "next_preview": self.next_preview,
+        }
+        if self.probability is not None:
+            data["probability"] = self.probability
+        if self.extra:
+            data["extra"] = self.extra
+        return data
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Option":
+        """从存档读取(旧版存档中的选项同样经过规范化)"""
+        return cls.parse(data)
+
+    def copy(self) -> "Option":
+        return replace(self)
+
+
+@dataclass(slots=True)
+class TurnRecord:
+    """
+    一个已完成回合的记录(剧情、玩家的选择、该回合的Token消耗)
+    历史仍按列分别保存(便于分块存储与回退截断)，需要逐回合处理时再组装为记录
+    """
+    turn: int  # 从1开始
+    description: str
+    choice: str
+    tokens: int = 0
+
+
+@dataclass(slots=True)
+class TokenUsage:
+    """一次AI调用的Token用量"""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+    @classmethod
+    def from_api(cls, usage) -> "TokenUsage":
+        """由API响应的usage对象构造"""
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        total_tokens = getattr(usage, "total_tokens",
+                               0) or prompt_tokens + completion_tokens
+        return cls(prompt_tokens, completion_tokens, total_tokens)
+
+
+@dataclass(slots=True)
+class LLMReply:
+    """一次AI调用的回复(正文、推理内容与Token用量)，可写入录制文件后原样重放"""
+    content: str = ""
+    reasoning_content: str = ""
+    usage: Optional[TokenUsage] = None
+
+    @classmethod
+    def from_api(cls, response) -> "LLMReply":
+        """由API响应构造(只取第一个候选)"""
+        message = response.choices[0].message
+        usage = getattr(response, "usage", None)
+        return cls(message.content or "",
+                   getattr(message, "reasoning_content", None) or "",
+                   TokenUsage.from_api(usage) if usage is not None else None)
+
+
+@dataclass(slots=True)
+class CheckRoll:
+    """一次检定掷骰：结果先算出，之后再按显示方式播放动画"""
+    value: float  # 掷出的随机数(小于目标值即成功)
+    target: float
+    label: str = ""  # 掷骰前显示的提示
+    duration: float = 2.0  # 完整动画的时长(秒)
+    note: str = ""  # 掷骰后显示的提示
+
+    @property
+    def success(self) -> bool:
+        return self.value < self.target
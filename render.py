@@ -0,0 +1,101 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 显示层文本渲染：游戏状态与存档只保存纯文本，显示时才添加颜色(结果带LRU缓存)
+import re
+from functools import lru_cache
+from config import (COLOR_RED, COLOR_GREEN, COLOR_YELLOW, COLOR_BLUE,
+                    COLOR_MAGENTA, COLOR_CYAN, COLOR_RESET)
+
+# 缓存的渲染结果条数(剧情、选项、历史选择共用)
+RENDER_CACHE_SIZE = 256
+
+# 括号 -> 颜色
+COLOR_CONVERT = {
+    "<": COLOR_MAGENTA,
+    "[": COLOR_CYAN,
+    "『": COLOR_YELLOW,
+    "《": COLOR_MAGENTA,
+    "「": COLOR_GREEN,
+}
+# 闭括号 -> 对应的开括号
+CLOSE_CHARS = {
+    ">": "<",
+    "]": "[",
+    "』": "『",
+    "》": "《",
+    "」": "「",
+}
+# 选项检定结果标记 -> 颜色(追加在历史选择末尾)
+OUTCOME_TAGS = {
+    "<满足要求-行动成功>": COLOR_GREEN,
+    "<不满足要求-行动失败>": COLOR_RED,
+    "<检定大成功!>": COLOR_GREEN,
+    "<检定小成功>": COLOR_YELLOW,
+    "<检定小失败>": COLOR_RED,
+    "<检定大失败>": COLOR_RED,
+}
+
+_ANSI_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+_BRACKET_PATTERN = re.compile(
+    "[" + re.escape("".join(COLOR_CONVERT) + "".join(CLOSE_CHARS)) + "]")
+
+
+def strip_ansi(text: str) -> str:
+    """去除文本中的ANSI颜色代码(旧版存档中的剧情与选择带有颜色代码)"""
+    if "\x1b" not in text:
+        return text
+    return _ANSI_PATTERN.sub("", text)
+
+
+def colorize(text: str) -> str:
+    """
+    对文本进行颜色美化：只定位括号字符，括号之间的文本整段复制
+    括号嵌套不符合预期时返回原文本(不美化)
+    """
+    color_stack = [COLOR_RESET]
+    open_stack = []
+    parts = []
+    last = 0
+    for match in _BRACKET_PATTERN.finditer(text):
+        pos = match.start()
+        char = text[pos]
+        parts.append(text[last:pos])
+        last = pos + 1
+        color = COLOR_CONVERT.get(char)
+        if color is not None:
+            open_stack.append(char)
+            color_stack.append(color)
+            parts.append(color + char)
+        elif open_stack and open_stack[-1] == CLOSE_CHARS[char]:
+            open_stack.pop()
+            color_stack.pop()
+            parts.append(char + color_stack[-1])
+        else:
+            return text
+    parts.append(text[last:])
+    parts.append(COLOR_RESET)  # 强制重置颜色
+    return "".join(parts)
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_narrative(text: str) -> str:
+    """剧情、选项与预览文本的显示形式"""
+    if not text:
+        return text
+    return colorize(strip_ansi(text))
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_choice(text: str) -> str:
+    """历史选择的显示形式：选项文本美化后整体为蓝色，末尾的检定结果标记单独着色"""
+    text = strip_ansi(text)
+    for tag, color in OUTCOME_TAGS.items():
+        if text.endswith(tag):
+            return COLOR_BLUE + render_narrative(text[:-len(tag)]) + color + tag + COLOR_RESET + COLOR_RESET
+    return COLOR_BLUE + render_narrative(text) + COLOR_RESET
+
+
+def render_cache_info() -> list:
+    """[(渲染函数名, 命中次数, 未命中次数)]，供调试查看"""
+    return [(func.__name__, func.cache_info().hits, func.cache_info().misses)
+            for func in (render_narrative, render_choice)]
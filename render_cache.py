@@ -0,0 +1,40 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 文本渲染缓存：按状态版本缓存道具、属性、变量等文本，状态不变时直接复用
+from collections import Counter
+
+
+def state_version(data):
+    """TrackedDict的版本号；普通字典无法判断是否被修改，返回一个每次都不同的key"""
+    return getattr(data, "version", None) or object()
+
+
+class RenderCache:
+    """
+    每个渲染器(名称+参数)只保留最近一次的 (版本key, 文本)
+    key与上次相同即命中；状态被修改后key随之改变，下次调用时重新渲染
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def get(self, name, key, render):
+        """返回name渲染器在key下的文本，未命中时调用render()生成"""
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == key:
+            self.hits[name] += 1
+            return entry[1]
+        self.misses[name] += 1
+        text = render()
+        self.entries[name] = (key, text)
+        return text
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> list:
+        """[(渲染器名, 命中次数, 未命中次数)]"""
+        names = sorted(set(self.hits) | set(self.misses), key=str)
+        return [(name, self.hits[name], self.misses[name]) for name in names]
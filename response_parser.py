@@ -0,0 +1,139 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# AI响应的JSON解析：严格解析 -> 只规范结构位置上的中文标点 -> json_repair修复，逐级回退
+import re
+import json
+import time
+from json_repair import repair_json
+
+# 解析级别
+TIER_STRICT = "strict"          # 原样json.loads
+TIER_NORMALIZED = "normalized"  # 字符串外的中文标点换成英文后json.loads
+TIER_REPAIRED = "repaired"      # 全部中文标点替换后用json_repair修复(旧的解析方式)
+PARSE_TIERS = (TIER_STRICT, TIER_NORMALIZED, TIER_REPAIRED)
+
+# 中文标点 -> 英文标点
+PUNCTUATION_MAP = {"，": ",", "：": ":", "“": '"', "”": '"'}
+
+# 规范化时需要处理的字符：引号、转义符与中文标点
+_SIGNIFICANT_PATTERN = re.compile('[\\\\"' + "".join(PUNCTUATION_MAP) + "]")
+
+
+class ParseStats:
+    """各级解析的尝试次数、成功次数与累计耗时"""
+
+    def __init__(self):
+        self.attempts = dict.fromkeys(PARSE_TIERS, 0)
+        self.successes = dict.fromkeys(PARSE_TIERS, 0)
+        self.seconds = dict.fromkeys(PARSE_TIERS, 0.0)
+        self.failures = 0  # 各级都失败的次数
+
+    def record(self, tier: str, elapsed: float, ok: bool):
+        self.attempts[tier] += 1
+        self.seconds[tier] += elapsed
+        if ok:
+            self.successes[tier] += 1
+
+    def report(self) -> str:
+        """各级解析统计的文本"""
+        lines = ["JSON解析(级别: 成功/尝试, 平均耗时)："]
+        for tier in PARSE_TIERS:
+            attempts = self.attempts[tier]
+            avg = self.seconds[tier] / attempts * 1000 if attempts else 0.0
+            lines.append(
+                f"{tier}: {self.successes[tier]}/{attempts}, {avg:.3f}ms")
+        lines.append(f"全部失败: {self.failures}")
+        return "\n".join(lines)
+
+
+# 全局解析统计
+PARSE_STATS = ParseStats()
+
+
+def extract_json_span(text: str) -> str:
+    """提取第一个'{'到最后一个'}'之间的部分，找不到完整的花括号对时返回原文"""
+    start_idx = text.find('{')
+    end_idx = text.rfind('}')
+    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
+        return text[start_idx:end_idx+1]
+    return text
+
+
+def normalize_punctuation(text: str) -> str:
+    """
+    只把字符串之外(结构位置)的中文逗号、冒号、引号换成英文，字符串内的剧情文本保持不变
+    以中文引号开始的字符串视为普通字符串，其结束的中文引号同样被替换
+    """
+    parts = []
+    last = 0
+    in_string = False
+    chinese_quoted = False  # 当前字符串是否以中文引号开始
+    skip_to = -1  # 被转义的字符位置
+    for match in _SIGNIFICANT_PATTERN.finditer(text):
+        pos = match.start()
+        if pos < skip_to:
+            continue
+        char = text[pos]
+        if in_string:
+            if char == "\\":
+                skip_to = pos + 2
+            elif char == '"':
+                in_string = False
+            elif char == "”" and chinese_quoted:
+                parts.append(text[last:pos] + '"')
+                last = pos + 1
+                in_string = False
+            continue
+        if char == '"':
+            in_string, chinese_quoted = True, False
+        elif char in "“”":
+            in_string, chinese_quoted = True, True
+            parts.append(text[last:pos] + '"')
+            last = pos + 1
+        elif char != "\\":
+            parts.append(text[last:pos] + PUNCTUATION_MAP[char])
+            last = pos + 1
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def _legacy_normalize(text: str) -> str:
+    """旧的解析方式：不区分位置地替换全部中文引号、冒号和逗号"""
+    return text.replace("“", '"').replace("”", '"').replace("：", ":").replace('，', ',')
+
+
+def parse_json_response(response: str, stats: ParseStats = PARSE_STATS):
+    """
+    逐级解析AI响应中的JSON，返回(解析结果, 成功的级别)
+    各级都失败时抛出最后一级的异常(json.JSONDecodeError/ValueError)
+    """
+    json_content = extract_json_span(response)
+    start = time.perf_counter()
+    try:
+        result = json.loads(json_content)
+        stats.record(TIER_STRICT, time.perf_counter() - start, True)
+        return result, TIER_STRICT
+    except ValueError:
+        stats.record(TIER_STRICT, time.perf_counter() - start, False)
+
+    start = time.perf_counter()
+    normalized = normalize_punctuation(json_content)
+    if normalized != json_content:
+        try:
+            result = json.loads(normalized)
+            stats.record(TIER_NORMALIZED, time.perf_counter() - start, True)
+            return result, TIER_NORMALIZED
+        except ValueError:
+            stats.record(TIER_NORMALIZED,
+                         time.perf_counter() - start, False)
+
+    start = time.perf_counter()
+    try:
+        result = json.loads(repair_json(
+            extract_json_span(_legacy_normalize(response))))
+    except ValueError:
+        stats.record(TIER_REPAIRED, time.perf_counter() - start, False)
+        stats.failures += 1
+        raise
+    stats.record(TIER_REPAIRED, time.perf_counter() - start, True)
+    return result, TIER_REPAIRED
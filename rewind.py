@@ -0,0 +1,221 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 回合级撤销/回退：在内存中保留最近若干回合开始时的状态快照
+from collections import deque
+from containers import TrackedDict, Inventory, next_version
+from records import Option
+
+# 保留的回合快照数
+REWIND_CAPACITY = 10
+# 整局只会追加(及修改最后一项)的列表；快照只记录长度与最后一项，回退时截断当前列表即可
+APPEND_ONLY_FIELDS = ("history_descriptions",
+                      "history_choices", "token_consumes", "events")
+# 字典状态写时复制：未被修改时，相邻快照共享同一份副本(字段 -> 容器类型)
+TRACKED_DICT_FIELDS = {"inventory": Inventory, "item_repository": Inventory,
+                       "variables": TrackedDict, "character_attributes": TrackedDict}
+# 直接记录的标量状态
+VALUE_FIELDS = ("current_description", "current_game_status", "situation",
+                "conclude_summary_cooldown", "total_prompt_tokens", "l_p_token",
+                "total_completion_tokens", "l_c_token", "total_tokens")
+
+
+class TurnSnapshot:
+    """某一回合开始(选项刚显示)时的游戏状态"""
+
+    def __init__(self, turn: int, lists: dict, summaries: tuple,
+                 dicts: dict, values: dict, extra: dict):
+        self.turn = turn
+        self.lists = lists  # {字段: (长度, 最后一项)}
+        self.summaries = summaries  # (列表对象, 长度, 最后一项)
+        self.dicts = dicts  # {字段: (版本号, 副本)}
+        self.values = values
+        self.extra = extra  # 主程序的extra_datas
+
+    def restore(self, engine):
+        """将快照恢复到引擎，只处理与当前状态不同的部分"""
+        for field, (length, last) in self.lists.items():
+            items = getattr(engine, field)
+            del items[length:]
+            if length and items[-1] != last:
+                items[-1] = last
+        # 摘要在总结时会被整体替换，旧列表此后不再变化
+        items, length, last = self.summaries
+        del items[length:]
+        if length:
+            items[-1] = last
+        engine.history_simple_summaries = items
+        for field, (version, data) in self.dicts.items():
+            current = getattr(engine, field)
+            if isinstance(current, TrackedDict) and current.version == version:
+                continue
+            restored = TRACKED_DICT_FIELDS[field](data)
+            restored.version = version
+            setattr(engine, field, restored)
+        for field in VALUE_FIELDS:
+            setattr(engine, field, self.values[field])
+        engine.current_options = [opt.copy()
+                                  for opt in self.values["current_options"]]
+        engine.prompt_manager.is_no_options = self.values["is_no_options"]
+        engine.message_queue.clear()
+        engine.mark_history_rewritten()
+
+
+class RewindRing:
+    """
+    最近REWIND_CAPACITY个回合的状态快照环
+    最新的快照对应当前回合的开始；回退k回合即恢复倒数第k+1个快照
+    """
+
+    def __init__(self, capacity: int = REWIND_CAPACITY):
+        self.snapshots = deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def max_steps(self) -> int:
+        """当前最多可回退的回合数"""
+        return max(len(self.snapshots) - 1, 0)
+
+    def clear(self):
+        self.snapshots.clear()
+
+    def min_length(self, field: str) -> int:
+        """最早的快照记录的列表长度(之前的条目不会再被回退到)"""
+        return self.snapshots[0].lists[field][0]
+
+    def drop_front(self, field: str, count: int) -> None:
+        """列表开头的count项被删除后，修正各快照记录的长度"""
+        for snapshot in self.snapshots:
+            length, last = snapshot.lists[field]
+            snapshot.lists[field] = (length - count, last)
+
+    def capture(self, engine, extra: dict) -> TurnSnapshot:
+        """记录当前回合开始时的状态(同一回合只记录一次)"""
+        turn = len(engine.history_descriptions)
+        prev = self.snapshots[-1] if self.snapshots else None
+        if prev is not None and prev.turn == turn:
+            return prev
+        lists = {}
+        for field in APPEND_ONLY_FIELDS:
+            items = getattr(engine, field)
+            lists[field] = (len(items), items[-1] if items else None)
+        summaries = engine.history_simple_summaries
+        dicts = {}
+        for field in TRACKED_DICT_FIELDS:
+            current = getattr(engine, field)
+            if not isinstance(current, TrackedDict):
+                current = TRACKED_DICT_FIELDS[field](current)
+                setattr(engine, field, current)
+            if prev is not None and prev.dicts[field][0] == current.version:
+                dicts[field] = prev.dicts[field]
+            else:
+                dicts[field] = (current.version, dict(current))
+        values = {field: getattr(engine, field) for field in VALUE_FIELDS}
+        # 选项字典在检定时会被原地修改，需要复制
+        values["current_options"] = [opt.copy()
+                                     for opt in engine.current_options]
+        values["is_no_options"] = engine.prompt_manager.is_no_options
+        snapshot = TurnSnapshot(
+            turn, lists,
+            (summaries, len(summaries), summaries[-1] if summaries else None),
+            dicts, values, dict(extra))
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def rewind(self, engine, steps: int = 1):
+        """
+        回退steps回合(0为回到本回合开始)，返回恢复的快照
+        可回退的回合数不足时不做任何修改，返回None
+        """
+        if steps < 0 or steps >= len(self.snapshots):
+            return None
+        for _ in range(steps):
+            self.snapshots.pop()
+        snapshot = self.snapshots[-1]
+        snapshot.restore(engine)
+        return snapshot
+
+    def to_json(self, engine) -> dict:
+        """
+        导出为存档中的回退日志：历史列表只记录偏移(长度)，
+        共享的字典副本只保存一次
+        """
+        blobs, blob_keys = {}, {}
+
+        def intern(obj):
+            key = blob_keys.get(id(obj))
+            if key is None:
+                key = blob_keys[id(obj)] = str(len(blobs))
+                blobs[key] = obj
+            return key
+
+        turns = []
+        for snapshot in self.snapshots:
+            lasts = {}
+            for field, (length, last) in snapshot.lists.items():
+                # 与当前列表中对应位置相同的最后一项不必保存
+                if length and getattr(engine, field)[length - 1] != last:
+                    lasts[field] = last
+            items, length, last = snapshot.summaries
+            if items is engine.history_simple_summaries:
+                summaries = {"len": length}
+                if length and items[length - 1] != last:
+                    summaries["last"] = last
+            else:
+                summaries = {"items": intern(
+                    list(items[:length - 1]) + [last] if length else [])}
+            values = dict(snapshot.values)
+            values["current_options"] = [opt.to_json()
+                                         for opt in values["current_options"]]
+            # 回合开始时的剧情就是历史剧情的最后一项
+            if values["current_description"] == snapshot.lists["history_descriptions"][1]:
+                del values["current_description"]
+            turns.append({
+                "turn": snapshot.turn,
+                "lengths": {field: length for field, (length, _) in snapshot.lists.items()},
+                "lasts": lasts,
+                "summaries": summaries,
+                "dicts": {field: intern(data) for field, (_, data) in snapshot.dicts.items()},
+                "values": values,
+                "extra": snapshot.extra,
+            })
+        return {"capacity": self.snapshots.maxlen, "blobs": blobs, "turns": turns}
+
+    @classmethod
+    def from_json(cls, engine, data):
+        """根据回退日志与引擎中已恢复的历史重建快照环"""
+        if not data:
+            return cls()
+        ring = cls(data.get("capacity", REWIND_CAPACITY))
+        blobs = data["blobs"]
+        versions = {key: next_version() for key in blobs}
+        summaries_len = len(engine.history_simple_summaries)
+        for entry in data["turns"]:
+            lists = {}
+            for field, length in entry["lengths"].items():
+                items = getattr(engine, field)
+                if length > len(items):
+                    # 日志与历史不一致(如存档被手动修改)，放弃回退日志
+                    return cls(ring.snapshots.maxlen)
+                last = entry["lasts"].get(
+                    field, items[length - 1] if length else None)
+                lists[field] = (length, last)
+            summaries = entry["summaries"]
+            if "items" in summaries:
+                items = list(blobs[summaries["items"]])
+                summaries = (items, len(items), items[-1] if items else None)
+            else:
+                items = engine.history_simple_summaries
+                length = min(summaries["len"], summaries_len)
+                summaries = (items, length, summaries.get(
+                    "last", items[length - 1] if length else None))
+            dicts = {field: (versions[key], blobs[key])
+                     for field, key in entry["dicts"].items()}
+            values = dict(entry["values"])
+            values["current_options"] = [Option.from_json(opt)
+                                         for opt in values["current_options"]]
+            values.setdefault("current_description",
+                              lists["history_descriptions"][1])
+            ring.snapshots.append(TurnSnapshot(
+                entry["turn"], lists, summaries, dicts, values, entry["extra"]))
+        return ring
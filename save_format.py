@@ -0,0 +1,108 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# JSON存档文件布局：定长元数据头 + 按需解析的数据段
+import os
+import json
+
+SAVE_FORMAT = 2
+# 文件头固定长度(字节)，以换行结尾，不足部分用空格填充
+SAVE_HEADER_SIZE = 4096
+# 写入文件头的元数据字段
+HEADER_FIELDS = ("version", "game_id", "branch", "player_name",
+                 "timestamp", "total_turns", "save_desc")
+# 随回合数增长的字段单独成段，浏览存档时不需要解析
+HISTORY_SECTION_FIELDS = ("history_refs", "history_descriptions", "history_choices",
+                          "history_simple_summaries", "token_consumes")
+# 文件头中过长的文本字段截断到此长度(完整值仍保存在数据段中)
+HEADER_TEXT_LIMIT = 64
+# 主分支；其他分支的存档名以"<分支名>@"开头
+MAIN_BRANCH = "main"
+
+
+def branch_save_name(branch: str, save_name: str) -> str:
+    """带分支前缀的存档名(主分支不加前缀，与旧存档一致)"""
+    if not branch or branch == MAIN_BRANCH:
+        return save_name
+    return f"{branch}@{save_name}"
+
+
+def write_save_file(filepath: str, save_data: dict):
+    """
+    按"文件头 + state段 + history段"的布局写入存档
+    文件头记录元数据与各段的字节偏移，可用一次有界read()读取
+    """
+    history = {k: save_data[k]
+               for k in HISTORY_SECTION_FIELDS if k in save_data}
+    state = {k: v for k, v in save_data.items() if k not in history}
+    state_bytes = json.dumps(state, ensure_ascii=False,
+                             indent=2).encode('utf-8') + b"\n"
+    history_bytes = json.dumps(history, ensure_ascii=False,
+                               separators=(',', ':')).encode('utf-8') + b"\n"
+    header = {"save_format": SAVE_FORMAT}
+    header.update({k: save_data.get(k) for k in HEADER_FIELDS})
+    header["sections"] = {
+        "state": [SAVE_HEADER_SIZE, len(state_bytes)],
+        "history": [SAVE_HEADER_SIZE + len(state_bytes), len(history_bytes)],
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    if len(header_bytes) >= SAVE_HEADER_SIZE:
+        for key in ("player_name", "save_desc"):
+            if isinstance(header[key], str):
+                header[key] = header[key][:HEADER_TEXT_LIMIT]
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        if len(header_bytes) >= SAVE_HEADER_SIZE:
+            raise ValueError("存档文件头过长")
+    header_bytes = header_bytes.ljust(SAVE_HEADER_SIZE - 1) + b"\n"
+
+    # 先写临时文件再替换，避免中断时留下不完整的存档
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header_bytes)
+        f.write(state_bytes)
+        f.write(history_bytes)
+    os.replace(tmp_path, filepath)
+
+
+def _parse_header(head: bytes):
+    """解析文件头，不是新布局时返回None"""
+    line = head.split(b"\n", 1)[0]
+    try:
+        header = json.loads(line.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if isinstance(header, dict) and header.get("save_format") == SAVE_FORMAT:
+        return header
+    return None
+
+
+def read_save_header(filepath: str) -> dict:
+    """
+    读取存档元数据(version, game_id, player_name, timestamp, total_turns, save_desc)
+    新布局只读取定长文件头；旧版存档(整个文件为一个JSON)只能完整解析
+    """
+    with open(filepath, 'rb') as f:
+        header = _parse_header(f.read(SAVE_HEADER_SIZE))
+    if header is not None:
+        return header
+    save_data = read_save_file(filepath)
+    header = {"save_format": 1}
+    header.update({k: save_data.get(k) for k in HEADER_FIELDS})
+    return header
+
+
+def read_save_file(filepath: str, sections=("state", "history")) -> dict:
+    """
+    读取存档数据，只解析sections中指定的数据段
+    旧版存档总是完整解析
+    """
+    with open(filepath, 'rb') as f:
+        header = _parse_header(f.read(SAVE_HEADER_SIZE))
+        if header is None:
+            f.seek(0)
+            return json.loads(f.read().decode('utf-8'))
+        save_data = {k: header[k] for k in HEADER_FIELDS}
+        for name in sections:
+            offset, length = header["sections"][name]
+            f.seek(offset)
+            save_data.update(json.loads(f.read(length).decode('utf-8')))
+    return save_data
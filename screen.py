@@ -0,0 +1,102 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 终端画面：用ANSI转义清屏(不启动子进程)，主界面只追加新内容，并统计绘制耗时
+import os
+import sys
+from collections import deque
+from history_store import history_text_length
+
+# 清屏(含回滚缓冲区)并把光标移到左上角
+CLEAR_SEQUENCE = "\033[2J\033[3J\033[H"
+# 整屏重绘时显示的最近回合数(更早的回合用history指令分页查看)
+SCREEN_HISTORY_TURNS = 10
+# 分页查看历史时每页的回合数
+HISTORY_PAGE_SIZE = 5
+# 保留的绘制耗时样本数
+REDRAW_SAMPLES = 20
+
+
+class WordCounter:
+    """
+    历史剧情字数的增量统计：只累加新增的回合；
+    最后一条被修改(如思考追加内容)时只重算该条，历史被替换或截断时才整体重算
+    """
+
+    def __init__(self):
+        self.items = None
+        self.count = 0
+        self.total = 0
+        self.last_len = 0
+
+    def update(self, items) -> int:
+        """返回items的总字数"""
+        length = len(items)
+        if items is not self.items or length < self.count:
+            self.items = items
+            self.total = history_text_length(items)
+        else:
+            if self.count:
+                self.total += len(items[self.count - 1]) - self.last_len
+            for idx in range(self.count, length):
+                self.total += len(items[idx])
+        self.count = length
+        self.last_len = len(items[-1]) if length else 0
+        return self.total
+
+
+class Screen:
+    """
+    主界面画面状态：记录屏幕上已显示到第几个回合、显示的当前剧情
+    只有屏幕被清空(菜单、读档、回退等)后才整屏重绘，否则只追加新完成的回合与剧情的新增部分
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream  # None表示当前的sys.stdout
+        self.dirty = True
+        self.shown_turns = 0  # 屏幕上已显示的已完成回合数
+        self.shown_description = ""  # 屏幕上显示的当前剧情
+        self.redraw_times = deque(maxlen=REDRAW_SAMPLES)
+        self.word_counter = WordCounter()
+        if os.name == "nt":
+            os.system("")  # 启用Windows控制台的ANSI转义支持
+
+    def clear(self):
+        """清空屏幕，之后主界面需要整屏重绘"""
+        stream = self.stream or sys.stdout
+        stream.write(CLEAR_SEQUENCE)
+        stream.flush()
+        self.dirty = True
+
+    def invalidate(self):
+        """游戏状态被整体替换(读档、回退、分支)后调用"""
+        self.dirty = True
+
+    def pending_turns(self, completed_turns: int):
+        """
+        返回需要追加显示的第一个回合下标(从0开始)
+        屏幕已失效或回合数不是刚好增加0或1个时返回None(需要整屏重绘)
+        """
+        if self.dirty or not 0 <= completed_turns - self.shown_turns <= 1:
+            return None
+        return self.shown_turns
+
+    def description_delta(self, description: str):
+        """当前剧情中尚未显示的部分；与已显示的内容无关时返回None"""
+        if description.startswith(self.shown_description):
+            return description[len(self.shown_description):]
+        return None
+
+    def mark_drawn(self, completed_turns: int, description: str):
+        self.dirty = False
+        self.shown_turns = completed_turns
+        self.shown_description = description
+
+    def record_redraw(self, seconds: float):
+        self.redraw_times.append(seconds)
+
+    def redraw_stats(self) -> str:
+        """最近若干次绘制(不含打字机效果)的耗时"""
+        if not self.redraw_times:
+            return "绘制耗时: 无数据"
+        times = [t * 1000 for t in self.redraw_times]
+        return f"绘制耗时(最近{len(times)}次): 最近{times[-1]:.2f}ms 平均{sum(times) / len(times):.2f}ms 最大{max(times):.2f}ms"
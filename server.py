@@ -0,0 +1,487 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 多会话游戏服务：基于asyncio的HTTP/1.1 JSON服务(只用标准库)，每个会话一个使用HeadlessIO的GameEngine
+# 引擎调用在线程池中执行；同一会话的请求串行处理，各会话发往同一LLM提供商的请求共享客户端并受并发上限限制
+# 用法: python server.py [--host 127.0.0.1] [--port 8765]
+#
+# 接口(请求与响应均为JSON)：
+#   POST   /sessions                    开始新游戏 {"story", "player_name", "attributes": [6个数], "no_options", "game_id", "seed": 检定随机数种子}
+#                                       (存档目录为"<会话id>-<game_id>"，不同会话即使game_id相同也不会写入同一目录)
+#   GET    /sessions/<id>               最近一次操作完成时的状态(不等待进行中的操作)
+#   POST   /sessions/<id>/turn          选择选项 {"option": 选项ID} 或自定义行动 {"custom": "行动描述"}
+#   POST   /sessions/<id>/think         思考 {"text": "疑问"}
+#   POST   /sessions/<id>/use-item      使用物品 {"item": 物品名或编号, "action", "target", "force": 不合理时是否仍执行}
+#   POST   /sessions/<id>/save          保存 {"name": 手动存档名(留空为自动存档)}
+#   DELETE /sessions/<id>               结束会话
+#   GET    /stats                       会话数、内存占用与各提供商的请求统计
+import re
+import sys
+import copy
+import json
+import time
+import asyncio
+import argparse
+import threading
+import dataclasses
+from http import HTTPStatus
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from game_engine import GameEngine
+from engine_io import HeadlessIO, RetryExhausted
+from render_cache import RenderCache
+from render import strip_ansi
+from history_store import LazyHistory
+from llm_pool import PROVIDER_POOL
+from events import ATTR_SET, SOURCE_PLAYER
+import main as game_main
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# 最多同时存在的会话数
+MAX_SESSIONS = 1000
+# 全部会话的内存预算(字节)，超出时淘汰最久未活动的空闲会话
+MEMORY_BUDGET = 512 * 1024 * 1024
+# 执行引擎调用的线程数(LLM请求在这些线程中阻塞等待)
+WORKER_THREADS = 64
+# 请求体大小上限(字节)
+MAX_BODY_SIZE = 64 * 1024
+# 每个会话两次响应之间最多保留的事件数
+SESSION_EVENT_LIMIT = 1000
+# 客户端指定的游戏ID与存档名(用作存档目录与文件名的一部分，不能含路径分隔符等字符)
+SAFE_NAME_PATTERN = re.compile(r"[\w-]{1,64}")
+
+
+class ApiError(Exception):
+    """返回给客户端的错误"""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _sizeof_text(items) -> int:
+    return sum(sys.getsizeof(it) for it in items)
+
+
+def estimate_memory(engine: GameEngine) -> int:
+    """
+    会话占用内存的估计(字节)：统计历史、摘要、选项、背包、变量、事件等主要状态
+    已落盘的历史分块不计入
+    """
+    size = 0
+    for field in ("history_descriptions", "history_choices", "history_simple_summaries"):
+        items = getattr(engine, field)
+        if isinstance(items, LazyHistory):
+            items = items.resident_items()
+        size += sys.getsizeof(items) + _sizeof_text(items)
+    for data in (engine.inventory, engine.item_repository, engine.variables,
+                 engine.character_attributes):
+        size += sys.getsizeof(data) + _sizeof_text(data.keys()) + _sizeof_text(data.values())
+    for option in engine.current_options:
+        size += sys.getsizeof(option) + \
+            sys.getsizeof(option.text) + sys.getsizeof(option.next_preview)
+    for event in engine.events:
+        size += sys.getsizeof(event) + _sizeof_text(event.values())
+    size += sys.getsizeof(engine.token_consumes) + _sizeof_text(engine.token_consumes)
+    size += sys.getsizeof(engine.current_description) + \
+        sys.getsizeof(engine.current_response or "")
+    return size
+
+
+def _safe_name(body: dict, key: str) -> str:
+    """读取客户端指定的名称(可留空)，不符合SAFE_NAME_PATTERN时返回400"""
+    value = str(body.get(key, "")).strip()
+    if value and not SAFE_NAME_PATTERN.fullmatch(value):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{key}只能包含字母、数字、下划线与连字符(最多64个字符)")
+    return value
+
+
+def _json_default(obj):
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    return str(obj)
+
+
+class Session:
+    """一个玩家的游戏会话"""
+
+    def __init__(self, session_id: str, engine: GameEngine, io: HeadlessIO):
+        self.id = session_id
+        self.engine = engine
+        self.io = io
+        self.lock = asyncio.Lock()  # 同一会话的请求串行处理
+        self.extra = {"turns": 0, "think_count_remain": 0}  # 与主程序的extra_datas相同
+        self.last_active = time.monotonic()
+        self.memory = 0
+        self.snapshot = {}
+        self.take_snapshot()
+
+    def reset_think_count(self):
+        """每回合重置思考次数(与主程序相同)"""
+        self.extra["think_count_remain"] = int(max(
+            min(self.engine.character_attributes["INT"]//8, 4), -1)) + 1
+
+    def take_snapshot(self) -> None:
+        """记录引擎状态的副本(在持有会话锁时调用)，查询状态时直接返回副本，不必等待会话锁"""
+        engine = self.engine
+        self.snapshot = {
+            "session_id": self.id,
+            "game_id": engine.game_id,
+            "turn": len(engine.history_descriptions),
+            "status": engine.current_game_status,
+            "description": engine.current_description,
+            "options": [opt.to_json() for opt in engine.current_options],
+            "situation": engine.situation,
+            "attributes": dict(engine.character_attributes),
+            "inventory": dict(engine.inventory),
+            "variables": dict(engine.variables),
+            "think_count_remain": self.extra["think_count_remain"],
+            "total_tokens": engine.total_tokens,
+        }
+
+    def state(self) -> dict:
+        """返回给客户端的状态(最近一次记录的副本，附带上次响应以来的引擎事件)"""
+        events = []
+        for event in self.io.drain():
+            event["text"] = strip_ansi(event["text"])
+            events.append(event)
+        return dict(self.snapshot, memory_bytes=self.memory, events=events)
+
+
+class GameServer:
+    """会话管理与请求分派"""
+
+    def __init__(self, base_config=None, max_sessions: int = MAX_SESSIONS,
+                 memory_budget: int = MEMORY_BUDGET):
+        self.base_config = base_config or game_main.config
+        self.max_sessions = max_sessions
+        self.memory_budget = memory_budget
+        self.sessions = OrderedDict()  # 按最近活动排序
+        self.save_lock = threading.Lock()  # 存档后端不支持并发写入
+        self.request_count = 0
+        self.evicted = 0
+
+    # 会话管理
+
+    def _new_session(self, player_name: str = "") -> Session:
+        # 每个会话使用配置的副本(总结时会临时修改max_tokens)
+        config = copy.copy(self.base_config)
+        config.render_cache = RenderCache()
+        if player_name:
+            config.player_name = player_name
+        io = HeadlessIO(event_limit=SESSION_EVENT_LIMIT)
+        engine = GameEngine(config, io)
+        session_id = game_main.generate_game_id()
+        while session_id in self.sessions:
+            session_id = game_main.generate_game_id()
+        return Session(session_id, engine, io)
+
+    def _get(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"会话{session_id}不存在")
+        self.sessions.move_to_end(session_id)
+        session.last_active = time.monotonic()
+        return session
+
+    def total_memory(self) -> int:
+        return sum(session.memory for session in self.sessions.values())
+
+    def _evict(self, keep: Session = None, room: int = 0) -> None:
+        """会话数(加上要新建的room个)或内存超出上限时，淘汰最久未活动的空闲会话"""
+        for session_id in list(self.sessions):
+            if len(self.sessions) + room <= self.max_sessions and self.total_memory() <= self.memory_budget:
+                return
+            session = self.sessions[session_id]
+            if session is keep or session.lock.locked():
+                continue
+            del self.sessions[session_id]
+            self.evicted += 1
+
+    async def _run(self, session: Session, func, with_state: bool = True):
+        """
+        在线程池中执行引擎操作(同一会话串行)，之后更新内存统计
+        返回(结果, 状态)；状态快照在持有会话锁时记录(不会与同一会话的其他操作交错)，with_state为False时状态为None
+        """
+        async with session.lock:
+            if session.id not in self.sessions:
+                raise ApiError(HTTPStatus.GONE, f"会话{session.id}已结束")
+            try:
+                result = await asyncio.to_thread(func)
+            except RetryExhausted as e:
+                raise ApiError(HTTPStatus.BAD_GATEWAY, f"AI响应失败: {e}") from e
+            finally:
+                session.memory = estimate_memory(session.engine)
+                session.last_active = time.monotonic()
+                session.take_snapshot()
+            state = session.state() if with_state else None
+        self._evict(keep=session)
+        return result, state
+
+    async def _state(self, session: Session) -> dict:
+        """返回最近一次操作完成时的状态快照，不等待会话锁(进行中的回合可能要等LLM响应很久)"""
+        return session.state()
+
+    # 接口
+
+    async def start(self, body: dict) -> dict:
+        game_id = _safe_name(body, "game_id")
+        self._evict(room=1)
+        if len(self.sessions) >= self.max_sessions:
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "会话数已达上限")
+        session = self._new_session(str(body.get("player_name", "")))
+        engine = session.engine
+        attrs = body.get("attributes")
+        if attrs is not None:
+            try:
+                attrs = [float(it) for it in attrs]
+            except (TypeError, ValueError) as e:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "attributes应为6个数") from e
+            if len(attrs) != 6:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "attributes应为6个数")
+        seed = body.get("seed")
+        if seed is not None:
+            # bool是int的子类，true/false不能作为种子
+            if isinstance(seed, bool) or not isinstance(seed, int):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "seed应为整数")
+            engine.seed_rng(seed)
+
+        def run():
+            if attrs is not None:
+                engine.record_event(ATTR_SET, SOURCE_PLAYER, attrs=dict(
+                    zip(engine.character_attributes.keys(), attrs)))
+            engine.prompt_manager.is_no_options = bool(body.get("no_options"))
+            # 存档目录按会话区分，不同会话指定相同的game_id时不会互相覆盖存档
+            engine.game_id = f"{session.id}-{game_id}" if game_id else ""
+            engine.start_game(str(body.get("story", "")))
+            if not engine.game_id:
+                engine.game_id = game_main.generate_game_id()
+            session.reset_think_count()
+
+        self.sessions[session.id] = session
+        try:
+            _, state = await self._run(session, run)
+        except Exception:
+            self.sessions.pop(session.id, None)
+            raise
+        return state
+
+    async def turn(self, session: Session, body: dict) -> dict:
+        custom = str(body.get("custom", "")).strip()
+        option = body.get("option")
+        if not custom and not isinstance(option, int):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "需要option(选项ID)或custom(自定义行动)")
+
+        def run():
+            if session.engine.current_game_status != "ongoing":
+                raise ApiError(HTTPStatus.CONFLICT, "游戏已结束")
+            if custom:
+                result = session.engine.go_game(custom, True)
+            else:
+                result = session.engine.go_game(option)
+            if result == -1:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "无效的选项或不满足选项要求")
+            session.extra["turns"] += 1
+            session.reset_think_count()
+
+        _, state = await self._run(session, run)
+        return state
+
+    async def think(self, session: Session, body: dict) -> dict:
+        text = str(body.get("text", "")).strip()
+        if not text:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "需要text(思考的疑问)")
+
+        def run():
+            if session.extra["think_count_remain"] <= 0:
+                raise ApiError(HTTPStatus.CONFLICT, "本回合已无法再思考")
+            session.engine.think_go_game(text)
+            session.extra["think_count_remain"] -= 1
+
+        _, state = await self._run(session, run)
+        return state
+
+    async def use_item(self, session: Session, body: dict) -> dict:
+        engine = session.engine
+        action = str(body.get("action", "")).strip()
+        target = str(body.get("target", "")).strip()
+        if not action:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "需要action(进行什么操作)")
+
+        def run():
+            # 物品与游戏状态在会话锁内检查(等待期间其他请求可能已用掉物品或结束游戏)
+            if engine.current_game_status != "ongoing":
+                raise ApiError(HTTPStatus.CONFLICT, "游戏已结束")
+            item_name = engine.inventory.resolve(str(body.get("item", "")))
+            if item_name is None:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"物品{body.get('item')}不存在于库存中")
+            is_ok = engine.is_use_item_ok(item_name, action, target)
+            if not is_ok and not body.get("force"):
+                return False
+            engine.go_game(
+                f"对{target}使用背包里的物品{item_name}进行{action}操作" + ("" if is_ok else " (操作不合理!)"), True)
+            session.extra["turns"] += 1
+            session.reset_think_count()
+            return True
+
+        accepted, state = await self._run(session, run)
+        state["accepted"] = accepted
+        return state
+
+    async def save(self, session: Session, body: dict) -> dict:
+        name = _safe_name(body, "name")
+
+        def run():
+            with self.save_lock:
+                return game_main.save_game(session.engine, name or "autosave",
+                                           is_manual_save=bool(name), extra=session.extra)
+
+        (ok, message), _ = await self._run(session, run, with_state=False)
+        if not ok:
+            raise ApiError(HTTPStatus.INTERNAL_SERVER_ERROR, message)
+        return {"session_id": session.id, "message": message}
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "evicted": self.evicted,
+            "requests": self.request_count,
+            "memory_bytes": self.total_memory(),
+            "memory_budget": self.memory_budget,
+            "providers": PROVIDER_POOL.stats(),
+        }
+
+    async def dispatch(self, method: str, path: str, body: dict):
+        """返回(状态码, 响应对象)"""
+        parts = [p for p in path.split("?", 1)[0].split("/") if p]
+        if parts == ["stats"] and method == "GET":
+            return HTTPStatus.OK, self.stats()
+        if parts == ["sessions"] and method == "POST":
+            return HTTPStatus.CREATED, await self.start(body)
+        if len(parts) == 2 and parts[0] == "sessions":
+            if method == "GET":
+                return HTTPStatus.OK, await self._state(self._get(parts[1]))
+            if method == "DELETE":
+                session = self._get(parts[1])
+                del self.sessions[session.id]
+                return HTTPStatus.OK, {"session_id": session.id, "message": "会话已结束"}
+        if len(parts) == 3 and parts[0] == "sessions" and method == "POST":
+            handler = {"turn": self.turn, "think": self.think,
+                       "use-item": self.use_item, "save": self.save}.get(parts[2])
+            if handler is not None:
+                return HTTPStatus.OK, await handler(self._get(parts[1]), body)
+        raise ApiError(HTTPStatus.NOT_FOUND, f"未知接口 {method} {path}")
+
+    # HTTP
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个连接上的请求(支持keep-alive)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "请求格式错误"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get(
+                    "connection", "").lower() != "close"
+                try:
+                    length = self._content_length(headers)
+                except ApiError as e:
+                    # 无法确定请求体的边界，回复后关闭连接
+                    await self._respond(writer, e.status, {"error": e.message}, False)
+                    break
+                raw = await reader.readexactly(length) if length else b""
+                status, payload = await self._handle(method, path, raw)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _content_length(headers: dict) -> int:
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length格式错误") from e
+        if length < 0:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length格式错误")
+        if length > MAX_BODY_SIZE:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "请求体过大")
+        return length
+
+    async def _handle(self, method: str, path: str, raw: bytes):
+        self.request_count += 1
+        try:
+            body = json.loads(raw.decode("utf-8")) if raw else {}
+            if not isinstance(body, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST, "请求体应为JSON对象")
+            return await self.dispatch(method, path, body)
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return HTTPStatus.BAD_REQUEST, {"error": "请求体不是合法的JSON"}
+        except ApiError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:  # type:ignore
+            print(f"[错误]:处理{method} {path}时出错: {e!r}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict, keep_alive: bool):
+        data = json.dumps(payload, ensure_ascii=False,
+                          default=_json_default).encode("utf-8")
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+
+async def serve(game_server: GameServer, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                workers: int = WORKER_THREADS, on_ready=None):
+    """运行服务直到被取消；on_ready(实际端口)在开始监听后调用"""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="engine"))
+    server = await asyncio.start_server(game_server.handle_connection, host, port)
+    if on_ready:
+        on_ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多会话游戏服务")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    parser.add_argument("--memory-mb", type=int,
+                        default=MEMORY_BUDGET // (1024 * 1024), help="全部会话的内存预算(MB)")
+    parser.add_argument("--workers", type=int, default=WORKER_THREADS,
+                        help="执行引擎调用的线程数")
+    args = parser.parse_args()
+    game_server = GameServer(max_sessions=args.max_sessions,
+                             memory_budget=args.memory_mb * 1024 * 1024)
+    try:
+        asyncio.run(serve(game_server, args.host, args.port, args.workers,
+                          on_ready=lambda port: print(f"游戏服务已启动: http://{args.host}:{port}")))
+    except KeyboardInterrupt:
+        print("游戏服务已停止")
+
+
+if __name__ == "__main__":
+    main()
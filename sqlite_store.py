@@ -0,0 +1,446 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# SQLite存档后端
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+from history_store import ObjectStore, CHUNKED_HISTORY_FIELDS, HISTORY_CHUNK_SIZE
+from save_format import read_save_file, MAIN_BRANCH
+
+SQLITE_SAVE_FILE = os.path.join("saves", "saves.db")
+# 每局游戏保留的自动存档数
+MAX_AUTO_SAVES = 10
+# 除历史剧情、摘要、物品、变量与状态事件外，其余状态整体以JSON保存在saves.state中
+TABLE_FIELDS = ("history_descriptions", "history_choices", "history_simple_summaries",
+                "inventory", "item_repo", "variables", "events")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games(
+    game_id TEXT PRIMARY KEY,
+    player_name TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+-- 回合以父指针组成一棵树：每个存档只记录最新回合，同一前缀的回合由多个存档共享
+CREATE TABLE IF NOT EXISTS turns(
+    turn_id INTEGER PRIMARY KEY,
+    game_id TEXT NOT NULL REFERENCES games(game_id) ON DELETE CASCADE,
+    parent_id INTEGER REFERENCES turns(turn_id),
+    turn_idx INTEGER NOT NULL,
+    choice TEXT,            -- 进入本回合的玩家选择(第一回合为NULL)
+    description TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_turns_game ON turns(game_id, turn_idx);
+CREATE TABLE IF NOT EXISTS saves(
+    save_id INTEGER PRIMARY KEY,
+    game_id TEXT NOT NULL REFERENCES games(game_id) ON DELETE CASCADE,
+    branch TEXT NOT NULL DEFAULT 'main', -- 分支名，同一局的各分支共享回合树中的公共前缀
+    name TEXT NOT NULL,
+    save_desc TEXT NOT NULL,
+    save_type TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    player_name TEXT,
+    total_turns INTEGER NOT NULL,
+    version TEXT,
+    head_turn_id INTEGER REFERENCES turns(turn_id),
+    choice_count INTEGER NOT NULL,
+    pending_choices TEXT NOT NULL, -- 未能与回合对齐的多余选择(JSON)
+    state TEXT NOT NULL,
+    UNIQUE(game_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_saves_time ON saves(timestamp);
+CREATE TABLE IF NOT EXISTS save_summaries(
+    save_id INTEGER NOT NULL REFERENCES saves(save_id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    text TEXT,
+    PRIMARY KEY(save_id, idx)
+);
+CREATE TABLE IF NOT EXISTS save_items(
+    save_id INTEGER NOT NULL REFERENCES saves(save_id) ON DELETE CASCADE,
+    location TEXT NOT NULL, -- inventory(背包) / repository(仓库)
+    pos INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    PRIMARY KEY(save_id, location, pos)
+);
+CREATE TABLE IF NOT EXISTS save_variables(
+    save_id INTEGER NOT NULL REFERENCES saves(save_id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value TEXT, -- JSON
+    PRIMARY KEY(save_id, name)
+);
+-- 状态事件按固定条数切分为分块，以内容哈希为键保存，相邻存档之间相同的分块只存一份
+CREATE TABLE IF NOT EXISTS event_chunks(
+    game_id TEXT NOT NULL REFERENCES games(game_id) ON DELETE CASCADE,
+    digest TEXT NOT NULL,
+    data TEXT NOT NULL, -- JSON
+    PRIMARY KEY(game_id, digest)
+);
+CREATE TABLE IF NOT EXISTS save_event_chunks(
+    save_id INTEGER NOT NULL REFERENCES saves(save_id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY(save_id, idx)
+);
+"""
+
+
+class SQLiteSaveStore:
+    """
+    单文件SQLite存档后端(WAL模式)
+    与JSON存档提供相同的保存/读取/列出/删除功能：
+    每次保存只插入新增的回合，自动存档轮换在一个事务内完成，列表查询走索引
+    """
+
+    def __init__(self, db_path: str = SQLITE_SAVE_FILE):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # 多会话服务在线程池中保存，连接会被不同线程使用(调用方负责串行化写入)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        # 每局游戏最近一次同步到数据库的回合: game_id -> [(turn_id, choice, description)]
+        self._synced_turns = {}
+        # 每局游戏最近一次同步的事件满分块: game_id -> [digest]
+        self._synced_events = {}
+
+    def close(self):
+        self.conn.close()
+
+    def _migrate(self):
+        """升级旧版数据库：补充分支列并建立按分支轮换的索引"""
+        columns = {row["name"]
+                   for row in self.conn.execute("PRAGMA table_info(saves)")}
+        with self.conn:
+            if "branch" not in columns:
+                self.conn.execute(
+                    f"ALTER TABLE saves ADD COLUMN branch TEXT NOT NULL DEFAULT '{MAIN_BRANCH}'")
+            self.conn.execute("DROP INDEX IF EXISTS idx_saves_rotation")
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_saves_branch_rotation ON saves(game_id, branch, save_type, save_desc, timestamp)")
+
+    # 回合同步
+
+    def _sync_turns(self, game_id: str, descriptions, choices, full_check: bool = False):
+        """
+        将当前历史同步为回合树上的一条路径，返回最新回合的turn_id
+        只插入与上次同步相比新增或改变的回合；未改变的前缀直接复用
+        full_check为False时只校验上次同步路径的末尾(游戏中只有最后一回合会被修改)
+        """
+        synced = self._synced_turns.get(game_id, [])
+        total = len(descriptions)
+        common = min(len(synced), total)
+        check_from = 0 if full_check else max(common - 2, 0)
+        # 找到第一个发生变化的回合
+        diverge = common
+        for idx in range(check_from, common):
+            _, s_choice, s_desc = synced[idx]
+            choice = choices[idx-1] if 0 < idx <= len(choices) else None
+            if s_desc != descriptions[idx] or s_choice != choice:
+                diverge = idx
+                break
+        path = synced[:diverge]
+        parent_id = path[-1][0] if path else None
+        for idx in range(diverge, total):
+            choice = choices[idx-1] if 0 < idx <= len(choices) else None
+            cur = self.conn.execute(
+                "INSERT INTO turns(game_id, parent_id, turn_idx, choice, description) VALUES (?, ?, ?, ?, ?)",
+                (game_id, parent_id, idx, choice, descriptions[idx]))
+            parent_id = cur.lastrowid
+            path.append((parent_id, choice, descriptions[idx]))
+        self._synced_turns[game_id] = path
+        return parent_id
+
+    def _sync_events(self, game_id: str, events, full_check: bool = False) -> list:
+        """
+        将状态事件按分块写入event_chunks，返回分块引用列表
+        上次同步的满分块在分界分块的哈希一致时直接复用(游戏中事件只会追加)，只写入其后的分块；
+        分界分块已变化时(如回退后事件被截断又重新追加到相同长度)向前逐块比对，从第一个变化的分块开始重新写入
+        """
+        synced = [] if full_check else self._synced_events.get(game_id, [])
+        reuse = min(len(synced), len(events) // HISTORY_CHUNK_SIZE)
+        chunks = {}
+        while reuse:
+            chunks[reuse - 1] = _event_chunk(events, reuse - 1)
+            if chunks[reuse - 1][1] == synced[reuse - 1]:
+                break
+            reuse -= 1
+        refs = synced[:reuse]
+        for start in range(reuse * HISTORY_CHUNK_SIZE, len(events), HISTORY_CHUNK_SIZE):
+            idx = start // HISTORY_CHUNK_SIZE
+            data, digest = chunks.get(idx) or _event_chunk(events, idx)
+            self.conn.execute(
+                "INSERT OR IGNORE INTO event_chunks(game_id, digest, data) VALUES (?, ?, ?)",
+                (game_id, digest, data))
+            refs.append(digest)
+        return refs
+
+    def _read_events(self, save_id: int):
+        """读取存档引用的全部事件，返回(事件列表, 分块引用列表)"""
+        events, refs = [], []
+        for row in self.conn.execute("""
+                SELECT s.digest, c.data FROM save_event_chunks s JOIN saves v ON v.save_id = s.save_id
+                JOIN event_chunks c ON c.game_id = v.game_id AND c.digest = s.digest
+                WHERE s.save_id = ? ORDER BY s.idx""", (save_id,)):
+            events.extend(json.loads(row["data"]))
+            refs.append(row["digest"])
+        return events, refs
+
+    def _read_turns(self, head_turn_id):
+        """沿父指针读取从第一回合到head的全部回合"""
+        if head_turn_id is None:
+            return []
+        rows = self.conn.execute("""
+            WITH RECURSIVE path(turn_id, parent_id, turn_idx, choice, description) AS (
+                SELECT turn_id, parent_id, turn_idx, choice, description FROM turns WHERE turn_id = ?
+                UNION ALL
+                SELECT t.turn_id, t.parent_id, t.turn_idx, t.choice, t.description
+                FROM turns t JOIN path p ON t.turn_id = p.parent_id
+            )
+            SELECT turn_id, choice, description FROM path ORDER BY turn_idx
+        """, (head_turn_id,)).fetchall()
+        return [(row["turn_id"], row["choice"], row["description"]) for row in rows]
+
+    def _collect_garbage(self, game_id: str) -> int:
+        """删除不在任何存档路径上的回合及不被任何存档引用的事件分块"""
+        cur = self.conn.execute("""
+            DELETE FROM turns WHERE game_id = ? AND turn_id NOT IN (
+                WITH RECURSIVE live(turn_id) AS (
+                    SELECT head_turn_id FROM saves WHERE game_id = ? AND head_turn_id IS NOT NULL
+                    UNION
+                    SELECT t.parent_id FROM turns t JOIN live l ON t.turn_id = l.turn_id
+                    WHERE t.parent_id IS NOT NULL
+                )
+                SELECT turn_id FROM live
+            )
+        """, (game_id, game_id))
+        removed = cur.rowcount
+        synced = self._synced_turns.get(game_id)
+        # 只有缓存路径的最新回合被删除时才需重新同步(保存后缓存路径即为新存档的路径，不会被回收)
+        if removed and synced and not self.conn.execute(
+                "SELECT 1 FROM turns WHERE turn_id = ?", (synced[-1][0],)).fetchone():
+            self._synced_turns.pop(game_id, None)
+        cur = self.conn.execute("""
+            DELETE FROM event_chunks WHERE game_id = ? AND digest NOT IN (
+                SELECT s.digest FROM save_event_chunks s JOIN saves v ON v.save_id = s.save_id
+                WHERE v.game_id = ?
+            )
+        """, (game_id, game_id))
+        # 同上，只有缓存引用的分块被删除时才需重新写入
+        synced_events = set(self._synced_events.get(game_id, ()))
+        if cur.rowcount and synced_events:
+            kept = self.conn.execute(
+                f"SELECT COUNT(*) FROM event_chunks WHERE game_id = ? AND digest IN ({','.join('?' * len(synced_events))})",
+                (game_id, *synced_events)).fetchone()[0]
+            if kept < len(synced_events):
+                self._synced_events.pop(game_id, None)
+        return removed + cur.rowcount
+
+    # 存档接口
+
+    def save_game(self, game_engine, save_data: dict, name: str, is_manual_save: bool = False,
+                  keep_auto: int = MAX_AUTO_SAVES, full_check: bool = False):
+        """保存一个存档，自动存档在同一事务内轮换"""
+        game_id = save_data["game_id"]
+        branch = save_data.get("branch") or MAIN_BRANCH
+        save_type = "manual" if is_manual_save else "auto"
+        descriptions = game_engine.history_descriptions
+        choices = game_engine.history_choices
+        state = {k: v for k, v in save_data.items() if k not in TABLE_FIELDS}
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO games(game_id, player_name, created_at, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(game_id) DO UPDATE SET player_name = excluded.player_name, updated_at = excluded.updated_at
+            """, (game_id, save_data["player_name"], save_data["timestamp"], save_data["timestamp"]))
+            head_turn_id = self._sync_turns(
+                game_id, descriptions, choices, full_check)
+            event_refs = self._sync_events(game_id, game_engine.events, full_check)
+            # 同一秒内的同名存档直接覆盖(与JSON存档的文件覆盖行为一致)
+            self.conn.execute(
+                "DELETE FROM saves WHERE game_id = ? AND name = ?", (game_id, name))
+            cur = self.conn.execute("""
+                INSERT INTO saves(game_id, branch, name, save_desc, save_type, timestamp, player_name, total_turns,
+                                  version, head_turn_id, choice_count, pending_choices, state)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (game_id, branch, name, save_data["save_desc"], save_type, save_data["timestamp"],
+                  save_data["player_name"], save_data["total_turns"], save_data["version"],
+                  head_turn_id, min(len(choices), max(len(descriptions) - 1, 0)),
+                  json.dumps(list(choices[max(len(descriptions) - 1, 0):]), ensure_ascii=False),
+                  json.dumps(state, ensure_ascii=False)))
+            save_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO save_summaries(save_id, idx, text) VALUES (?, ?, ?)",
+                [(save_id, idx, text) for idx, text in enumerate(save_data["history_simple_summaries"])])
+            self.conn.executemany(
+                "INSERT INTO save_items(save_id, location, pos, name, description) VALUES (?, ?, ?, ?, ?)",
+                [(save_id, "inventory", pos, item, desc)
+                 for pos, (item, desc) in enumerate(save_data["inventory"].items())] +
+                [(save_id, "repository", pos, item, desc)
+                 for pos, (item, desc) in enumerate(save_data["item_repo"].items())])
+            self.conn.executemany(
+                "INSERT INTO save_variables(save_id, name, value) VALUES (?, ?, ?)",
+                [(save_id, var, json.dumps(val, ensure_ascii=False))
+                 for var, val in save_data["variables"].items()])
+            self.conn.executemany(
+                "INSERT INTO save_event_chunks(save_id, idx, digest) VALUES (?, ?, ?)",
+                [(save_id, idx, digest) for idx, digest in enumerate(event_refs)])
+            if not is_manual_save:
+                self.conn.execute("""
+                    DELETE FROM saves WHERE save_id IN (
+                        SELECT save_id FROM saves
+                        WHERE game_id = ? AND branch = ? AND save_type = 'auto' AND save_desc = ?
+                        ORDER BY timestamp DESC, save_id DESC LIMIT -1 OFFSET ?
+                    )
+                """, (game_id, branch, save_data["save_desc"], keep_auto))
+                self._collect_garbage(game_id)
+        # 在回收之后记录(本次存档引用的分块不会被回收)
+        self._synced_events[game_id] = event_refs[:len(game_engine.events) // HISTORY_CHUNK_SIZE]
+        return save_id
+
+    def _find_save(self, save_name="autosave", name=None, game_id=None, branch=None):
+        if name and game_id:
+            return self.conn.execute(
+                "SELECT * FROM saves WHERE game_id = ? AND name = ?", (game_id, name)).fetchone()
+        if name:
+            return self.conn.execute(
+                "SELECT * FROM saves WHERE name = ? ORDER BY timestamp DESC LIMIT 1", (name,)).fetchone()
+        if game_id and branch:
+            return self.conn.execute(
+                "SELECT * FROM saves WHERE game_id = ? AND branch = ? AND save_desc = ? ORDER BY timestamp DESC, save_id DESC LIMIT 1",
+                (game_id, branch, save_name)).fetchone()
+        if game_id:
+            return self.conn.execute(
+                "SELECT * FROM saves WHERE game_id = ? AND save_desc = ? ORDER BY timestamp DESC, save_id DESC LIMIT 1",
+                (game_id, save_name)).fetchone()
+        return self.conn.execute(
+            "SELECT * FROM saves WHERE save_desc = ? ORDER BY timestamp DESC, save_id DESC LIMIT 1",
+            (save_name,)).fetchone()
+
+    def read_save(self, save_name="autosave", name=None, game_id=None, branch=None):
+        """
+        读取存档，返回与JSON存档结构相同的字典(历史剧情为完整列表)
+        只指定game_id时读取branch分支(未指定时为最近保存的分支)的最新存档；找不到时返回None
+        """
+        row = self._find_save(save_name, name, game_id, branch)
+        if row is None:
+            return None
+        save_id = row["save_id"]
+        save_data = json.loads(row["state"])
+        path = self._read_turns(row["head_turn_id"])
+        save_data["history_descriptions"] = [desc for _, _, desc in path]
+        save_data["history_choices"] = [choice for _, choice, _ in path[1:]][:row["choice_count"]] + \
+            json.loads(row["pending_choices"])
+        save_data["history_simple_summaries"] = [r["text"] for r in self.conn.execute(
+            "SELECT text FROM save_summaries WHERE save_id = ? ORDER BY idx", (save_id,))]
+        save_data["inventory"], save_data["item_repo"] = {}, {}
+        for r in self.conn.execute(
+                "SELECT location, name, description FROM save_items WHERE save_id = ? ORDER BY location, pos", (save_id,)):
+            target = save_data["inventory"] if r["location"] == "inventory" else save_data["item_repo"]
+            target[r["name"]] = r["description"]
+        save_data["variables"] = {r["name"]: json.loads(r["value"]) for r in self.conn.execute(
+            "SELECT name, value FROM save_variables WHERE save_id = ? ORDER BY rowid", (save_id,))}
+        # 之后在同一局继续保存时，从读取的路径与事件分块开始增量同步
+        self._synced_turns[row["game_id"]] = path
+        if "events" in save_data:
+            # 旧版数据库的存档中事件随状态整体保存
+            self._synced_events.pop(row["game_id"], None)
+        else:
+            save_data["events"], refs = self._read_events(save_id)
+            self._synced_events[row["game_id"]] = refs[:len(save_data["events"]) // HISTORY_CHUNK_SIZE]
+        return save_data
+
+    def list_saves(self):
+        """列出所有存档(按时间倒序)"""
+        saves = []
+        for row in self.conn.execute("""
+                SELECT game_id, branch, name, player_name, timestamp, total_turns, save_type, save_desc, version
+                FROM saves ORDER BY timestamp DESC, save_id DESC"""):
+            saves.append({
+                "game_id": row["game_id"],
+                "branch": row["branch"],
+                "filename": row["name"],
+                "player_name": row["player_name"],
+                "timestamp": datetime.fromisoformat(row["timestamp"]).strftime("%Y-%m-%d %H:%M:%S"),
+                "total_turns": row["total_turns"],
+                "save_type": row["save_type"],
+                "save_desc": row["save_desc"],
+                "ver": row["version"],
+            })
+        return saves
+
+    def delete_save(self, game_id: str, name: str) -> bool:
+        """删除存档，返回是否存在该存档"""
+        with self.conn:
+            cur = self.conn.execute(
+                "DELETE FROM saves WHERE game_id = ? AND name = ?", (game_id, name))
+            if not cur.rowcount:
+                return False
+            self._collect_garbage(game_id)
+        return True
+
+    # 导入
+
+    def import_json_saves(self, save_dir: str = "saves") -> int:
+        """
+        将JSON存档目录(saves/<game_id>/*.json)导入数据库，返回导入的存档数
+        *_latest.json只是最新存档的副本，仅在该局没有其他存档时导入
+        """
+        imported = 0
+        if not os.path.isdir(save_dir):
+            return 0
+        for game_id in sorted(os.listdir(save_dir)):
+            game_save_dir = os.path.join(save_dir, game_id)
+            if not os.path.isdir(game_save_dir):
+                continue
+            filenames = [f for f in os.listdir(game_save_dir) if f.endswith('.json')]
+            regular = [f for f in filenames if not f.endswith('_latest.json')]
+            entries = []
+            for filename in regular or filenames:
+                try:
+                    save_data = read_save_file(os.path.join(game_save_dir, filename))
+                except (json.JSONDecodeError, OSError) as e:
+                    print(f"导入时跳过无法读取的存档 {game_id}/{filename}: {e}")
+                    continue
+                entries.append((save_data["timestamp"], filename, save_data))
+            self._synced_turns.pop(game_id, None)
+            for _, filename, save_data in sorted(entries, key=lambda e: e[:2]):
+                history = {}
+                for field in CHUNKED_HISTORY_FIELDS:
+                    if field in save_data.get("history_refs", {}):
+                        history[field] = ObjectStore(game_save_dir).get_history(
+                            save_data["history_refs"][field])
+                    else:
+                        history[field] = save_data.get(field, [])
+                save_data = {k: v for k, v in save_data.items()
+                             if k != "history_refs" and k not in CHUNKED_HISTORY_FIELDS}
+                save_data.setdefault("save_desc", "autosave")
+                # 复用save_game的写入逻辑，导入的存档不参与轮换；导入顺序不一定沿同一分支，需完整比对回合
+                self.save_game(_ImportedHistory(**history), save_data,
+                               filename[:-len('.json')], is_manual_save=filename.startswith("manual_"),
+                               keep_auto=len(entries), full_check=True)
+                imported += 1
+        return imported
+
+
+def _event_chunk(events, idx: int):
+    """第idx个事件分块的(JSON文本, 哈希)"""
+    data = json.dumps(list(events[idx * HISTORY_CHUNK_SIZE:(idx + 1) * HISTORY_CHUNK_SIZE]),
+                      ensure_ascii=False, separators=(',', ':'))
+    return data, hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class _ImportedHistory:
+    """导入时向save_game提供历史剧情"""
+
+    def __init__(self, history_descriptions, history_choices, events):
+        self.history_descriptions = history_descriptions
+        self.history_choices = history_choices
+        self.events = events
@@ -0,0 +1,26 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 测试的公共启动代码：将仓库根目录加入导入路径，并在导入游戏模块前切换到临时目录
+# (导入配置、引擎或主程序时会在当前目录创建配置与日志目录，不应留在仓库中)
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+START_DIR = os.getcwd()
+
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+SANDBOX_DIR = tempfile.mkdtemp(prefix="ai_text_adv_tests_")
+os.chdir(SANDBOX_DIR)
+
+
+def _cleanup():
+    os.chdir(START_DIR)
+    shutil.rmtree(SANDBOX_DIR, ignore_errors=True)
+
+
+atexit.register(_cleanup)
@@ -0,0 +1,69 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 背包/仓库容器测试
+import random
+
+from containers import Inventory
+
+
+def assert_in_sync(inventory: Inventory):
+    """缓存的物品名顺序与字典本身的顺序一致"""
+    assert inventory.keys_range() == list(inventory)
+    assert inventory._seqs == sorted(inventory._seqs)
+    assert len(inventory._seqs) == len(inventory)
+
+
+def test_remove_keeps_positions_without_rebuild():
+    inventory = Inventory({f"道具{i}": "" for i in range(10)})
+    keys = inventory._keys
+    del inventory["道具3"]
+    inventory.pop("道具0")
+    inventory.pop("不存在", None)
+    # 原地移除，不会重建列表
+    assert inventory._keys is keys
+    assert inventory.key_at(0) == "道具1"
+    assert inventory.resolve("3") == "道具4"
+    assert inventory.key_at(-1) == "道具9"
+    assert_in_sync(inventory)
+
+
+def test_move_items_and_bulk_updates():
+    inventory = Inventory({"剑": "a", "盾": "b", "药": "c"})
+    repository = Inventory({"钥匙": "d"})
+    names = [name for _, name in inventory.resolve_many(["3", "1"])]
+    inventory.move_items(names, repository)
+    assert inventory.keys_range() == ["盾"]
+    assert repository.keys_range() == ["钥匙", "药", "剑"]
+    inventory.update({"盾": "新", "绳子": "e"})
+    inventory |= {"火把": "f"}
+    inventory.setdefault("盾", "不变")
+    inventory.setdefault("地图", "g")
+    assert inventory.items_range(-2) == [("火把", "f"), ("地图", "g")]
+    assert inventory.popitem() == ("地图", "g")
+    for container in (inventory, repository):
+        assert_in_sync(container)
+    inventory.clear()
+    inventory["新剑"] = ""
+    assert inventory.key_at(0) == "新剑"
+
+
+def test_random_operations_match_dict_order():
+    rng = random.Random(35)
+    inventory = Inventory({f"初始{i}": "" for i in range(20)})
+    repository = Inventory()
+    for step in range(500):
+        op = rng.randrange(5)
+        if op == 0 or not inventory:
+            inventory[f"道具{step}"] = ""
+        elif op == 1:
+            del inventory[inventory.key_at(rng.randrange(len(inventory)))]
+        elif op == 2:
+            inventory.pop(inventory.key_at(rng.randrange(len(inventory))))
+        elif op == 3:
+            tokens = [str(rng.randint(1, len(inventory))) for _ in range(3)]
+            names = list(dict.fromkeys(name for _, name in inventory.resolve_many(tokens)))
+            inventory.move_items(names, repository)
+        else:
+            inventory.update({f"批量{step}": "", f"批量{step}b": ""})
+        assert_in_sync(inventory)
+    assert_in_sync(repository)
@@ -0,0 +1,42 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 状态事件记录测试
+from game_engine import GameEngine
+from engine_io import HeadlessIO
+from events import ITEM_ADD, ATTR_CHANGE, VAR_SET, SOURCE_PLAYER, EVENT_STATE_FIELDS, diff_state, fold_events
+from rewind import REWIND_CAPACITY
+
+CHUNK = 8
+
+
+def play_turn(engine: GameEngine, turn: int):
+    """开始新回合(记录回退快照)并产生若干事件"""
+    engine.rewind_ring.capture(engine, {})
+    engine.record_event(ITEM_ADD, name=f"物品{turn}", desc="描述", location="inventory")
+    engine.record_event(ATTR_CHANGE, attr="STR", delta=1)
+    engine.record_event(VAR_SET, SOURCE_PLAYER, vars={"turn": turn})
+    engine.history_descriptions.append(f"剧情{turn}")
+
+
+def test_fold_events_rebuilds_state_after_compaction():
+    engine = GameEngine(io=HeadlessIO())
+    for turn in range(40):
+        play_turn(engine, turn)
+        engine.compact_events(CHUNK)
+        rebuilt = fold_events(engine.events_base, engine.events)
+        assert {field: getattr(rebuilt, field) for field in EVENT_STATE_FIELDS} == \
+            {field: getattr(engine, field) for field in EVENT_STATE_FIELDS}
+    # 只保留回退范围内(及对齐余下)的事件
+    assert len(engine.events) < 3 * REWIND_CAPACITY + CHUNK
+
+
+def test_rewind_after_compaction_matches_replay():
+    engine = GameEngine(io=HeadlessIO())
+    for turn in range(30):
+        play_turn(engine, turn)
+    engine.compact_events(CHUNK)
+    strength = engine.character_attributes["STR"]
+    # 回退3回合即回到倒数第4回合开始时
+    assert engine.rewind_ring.rewind(engine, 3)
+    assert engine.character_attributes["STR"] == strength - 4
+    assert diff_state(engine, engine.replay_events()) == []
@@ -0,0 +1,38 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 游戏引擎测试
+import json
+from game_engine import GameEngine
+from engine_io import HeadlessIO
+
+COMMANDS = [
+    {"command": "change_attr", "value": {"STR": 2}},
+    {"command": "add_item", "value": {"火把": "照明用"}},
+]
+
+
+def make_response(**fields) -> str:
+    response = {"commands": COMMANDS, "summary": "摘要"}
+    response.update(fields)
+    return json.dumps(response, ensure_ascii=False)
+
+
+def test_rejected_response_applies_nothing():
+    engine = GameEngine(io=HeadlessIO())
+    strength = engine.character_attributes["STR"]
+    events = len(engine.events)
+    options = [{"id": 1, "text": "前进", "type": "normal"}]
+
+    # 缺少描述或选项的响应被拒绝(之后重试)，其指令不应被应用
+    assert engine.parse_ai_response(make_response(options=options)) is None
+    assert engine.parse_ai_response(make_response(description="剧情")) is None
+    assert engine.character_attributes["STR"] == strength
+    assert "火把" not in engine.inventory
+    assert len(engine.events) == events
+    assert engine.history_simple_summaries == []
+
+    assert engine.parse_ai_response(make_response(description="剧情", options=options))
+    assert engine.character_attributes["STR"] == strength + 2
+    assert "火把" in engine.inventory
+    assert engine.current_description == "剧情"
+    assert engine.history_simple_summaries == ["摘要"]
@@ -0,0 +1,75 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 历史分块存储与惰性历史列表测试
+from history_store import ObjectStore, LazyHistory
+
+CHUNK = 4
+
+
+def make_history(tmp_path, total: int = 18, resident_chunks: int = 1):
+    """写入total条历史后按存档读取的方式构建(只有最近resident_chunks个分块常驻内存)"""
+    store = ObjectStore(str(tmp_path))
+    items = [f"回合{i}" for i in range(total)]
+    refs = store.put_history(items, chunk_size=CHUNK)
+    history = LazyHistory.from_refs(store, refs, chunk_size=CHUNK,
+                                    resident_chunks=resident_chunks)
+    return store, items, history
+
+
+def test_put_history_shares_unchanged_chunks(tmp_path):
+    store = ObjectStore(str(tmp_path))
+    items = [f"回合{i}" for i in range(10)]
+    refs = store.put_history(items, chunk_size=CHUNK)
+    assert len(refs) == 3
+    items.append("回合10")
+    assert store.put_history(items, chunk_size=CHUNK)[:2] == refs[:2]
+    assert store.get_history(refs) == items[:10]
+
+
+def test_slicing_reads_cold_chunks(tmp_path):
+    _, items, history = make_history(tmp_path)
+    assert len(history) == len(items)
+    assert history.cold_refs()  # 较早的分块未读入内存
+    assert history[:] == items
+    assert history[3:11] == items[3:11]
+    assert history[::5] == items[::5]
+    assert history[-3:] == items[-3:]
+    assert history[0] == items[0] and history[-1] == items[-1]
+    assert list(history) == items
+    assert history == items
+
+
+def test_setitem_and_delete_materialize_only_from_the_changed_chunk(tmp_path):
+    _, items, history = make_history(tmp_path)
+    cold = len(history.cold_refs())
+    history[-1] = "改写"
+    items[-1] = "改写"
+    assert len(history.cold_refs()) == cold  # 改写最后一条不读取较早的分块
+    history[5] = "改写较早回合"
+    items[5] = "改写较早回合"
+    assert len(history.cold_refs()) == 5 // CHUNK
+    del history[10:]
+    del items[10:]
+    history.append("新回合")
+    items.append("新回合")
+    assert history == items
+
+
+def test_spill_moves_saved_chunks_out_of_memory(tmp_path):
+    store = ObjectStore(str(tmp_path))
+    history = LazyHistory(store, [], [], chunk_size=CHUNK)
+    items = []
+    for turn in range(5 * CHUNK + 2):
+        history.append(f"回合{turn}")
+        items.append(f"回合{turn}")
+    refs = store.put_history(history, chunk_size=CHUNK)
+    history.spill(refs, resident_chunks=2)
+    # 6个分块中较早的4个移出内存，最近的2个(含未满的分块)常驻
+    assert history.cold_refs() == refs[:4]
+    assert history.resident_items() == items[4 * CHUNK:]
+    assert history == items
+    # 再次保存时直接复用未加载的分块引用
+    history.append("新回合")
+    items.append("新回合")
+    assert store.put_history(history, chunk_size=CHUNK)[:4] == refs[:4]
+    assert history == items
@@ -0,0 +1,57 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# JSON存档与历史分块回收测试
+import os
+from datetime import datetime, timedelta
+import pytest
+import main as game_main
+from game_engine import GameEngine
+from engine_io import HeadlessIO
+from history_store import ObjectStore, HISTORY_CHUNK_SIZE
+
+
+class FakeClock(datetime):
+    """每次调用now前进一秒(每次自动存档的文件名都不同)"""
+    current = datetime(2025, 1, 1)
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.current += timedelta(seconds=1)
+        return cls.current
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = GameEngine(io=HeadlessIO())
+    # 存档写入临时目录
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(game_main.config, "save_backend", "json")
+    monkeypatch.setattr(game_main, "datetime", FakeClock)
+    engine.game_id = "test_game"
+    return engine
+
+
+def chunk_files(store: ObjectStore) -> set:
+    return {os.path.splitext(f)[0] for f in os.listdir(store.objects_dir)
+            if f.endswith(".json") and not f.startswith("refcounts")}
+
+
+def test_autosave_rotation_keeps_refcounts_exact(engine):
+    game_save_dir = os.path.join("saves", engine.game_id)
+    for turn in range(HISTORY_CHUNK_SIZE + 12):
+        engine.history_descriptions.append(f"剧情{turn}")
+        engine.history_choices.append(f"选择{turn}")
+        ok, message = game_main.save_game(engine)
+        assert ok, message
+        # 改写最后一回合，使被轮换删除的存档留下不再被引用的分块
+        engine.history_descriptions[-1] += "(修改)"
+    store = ObjectStore(game_save_dir)
+    counts = game_main.scan_history_refcounts(game_save_dir)
+    assert store.read_refcounts() == counts
+    # 只保留仍被存档或正在进行的游戏引用的分块
+    assert chunk_files(store) - set(counts) <= set(engine.history_descriptions.cold_refs())
+    assert set(counts) <= chunk_files(store)
+
+    name = sorted(f for f in os.listdir(game_save_dir) if not f.endswith("_latest.json"))[0]
+    assert game_main.delete_save(engine.game_id, name)[0]
+    assert store.read_refcounts() == game_main.scan_history_refcounts(game_save_dir)
@@ -0,0 +1,61 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# AI响应JSON解析测试
+import pytest
+from response_parser import (ParseStats, parse_json_response, normalize_punctuation, extract_json_span,
+                             TIER_STRICT, TIER_NORMALIZED, TIER_REPAIRED)
+
+
+def test_strict_tier():
+    stats = ParseStats()
+    result, tier = parse_json_response('好的：\n{"description": "你醒了，四周一片漆黑。"}\n', stats)
+    assert tier == TIER_STRICT
+    assert result == {"description": "你醒了，四周一片漆黑。"}
+    assert stats.attempts == {TIER_STRICT: 1, TIER_NORMALIZED: 0, TIER_REPAIRED: 0}
+    assert stats.successes[TIER_STRICT] == 1
+
+
+def test_normalized_tier_keeps_punctuation_inside_strings():
+    stats = ParseStats()
+    response = '{"description"："他说：“走吧，快点。”"，“summary”：“离开”}'
+    result, tier = parse_json_response(response, stats)
+    assert tier == TIER_NORMALIZED
+    # 字符串内的中文标点保持不变，结构位置上的被替换
+    assert result == {"description": "他说：“走吧，快点。”", "summary": "离开"}
+    assert stats.attempts[TIER_STRICT] == 1 and stats.successes[TIER_STRICT] == 0
+    assert stats.successes[TIER_NORMALIZED] == 1
+    assert stats.attempts[TIER_REPAIRED] == 0
+
+
+def test_repaired_tier():
+    stats = ParseStats()
+    result, tier = parse_json_response('{"description": "未闭合的响应", "options": [1, 2,', stats)
+    assert tier == TIER_REPAIRED
+    assert result["description"] == "未闭合的响应"
+    assert stats.successes == {TIER_STRICT: 0, TIER_NORMALIZED: 0, TIER_REPAIRED: 1}
+    assert stats.failures == 0
+
+
+def test_stats_accumulate_and_report():
+    stats = ParseStats()
+    for response in ('{"a": 1}', '{"a"：1}', '{"a": 1'):
+        parse_json_response(response, stats)
+    assert stats.attempts == {TIER_STRICT: 3, TIER_NORMALIZED: 1, TIER_REPAIRED: 1}
+    assert stats.successes == {TIER_STRICT: 1, TIER_NORMALIZED: 1, TIER_REPAIRED: 1}
+    report = stats.report()
+    assert f"{TIER_STRICT}: 1/3" in report
+    assert "全部失败: 0" in report
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"a"："b"}', '{"a":"b"}'),
+    ('{"a": "x，y"}', '{"a": "x，y"}'),
+    ('{"a": "引号\\"，内"}', '{"a": "引号\\"，内"}'),
+])
+def test_normalize_punctuation(text, expected):
+    assert normalize_punctuation(text) == expected
+
+
+def test_extract_json_span():
+    assert extract_json_span('前缀{"a": {"b": 1}}后缀') == '{"a": {"b": 1}}'
+    assert extract_json_span("没有JSON") == "没有JSON"
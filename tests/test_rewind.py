@@ -0,0 +1,88 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 回合撤销/回退测试
+from game_engine import GameEngine
+from engine_io import HeadlessIO
+from records import Option
+from rewind import RewindRing
+
+
+def start_turn(engine: GameEngine, turn: int):
+    engine.history_descriptions.append(f"剧情{turn}")
+    engine.current_description = f"剧情{turn}"
+    engine.current_options = [Option(id=1, text=f"选项{turn}")]
+    engine.token_consumes.append(turn)
+    engine.history_simple_summaries.append(f"摘要{turn}")
+    return engine.rewind_ring.capture(engine, {"turns": turn})
+
+
+def test_capture_shares_unchanged_dicts():
+    engine = GameEngine(io=HeadlessIO())
+    first = start_turn(engine, 0)
+    engine.history_choices.append("选择0")
+    engine.inventory["火把"] = "照明用"
+    second = start_turn(engine, 1)
+    # 未修改的字典与上一快照共享同一份副本，修改过的重新复制
+    assert second.dicts["variables"] is first.dicts["variables"]
+    assert second.dicts["inventory"] is not first.dicts["inventory"]
+    # 同一回合只记录一次
+    assert engine.rewind_ring.capture(engine, {}) is second
+    assert len(engine.rewind_ring) == 2
+
+
+def test_snapshot_is_isolated_from_later_changes():
+    engine = GameEngine(io=HeadlessIO())
+    snapshot = start_turn(engine, 0)
+    engine.inventory["火把"] = "照明用"
+    engine.variables["好感度"] = 1
+    engine.character_attributes["STR"] += 5
+    engine.current_options[0].text = "被修改的选项"
+    assert "火把" not in snapshot.dicts["inventory"][1]
+    assert "好感度" not in snapshot.dicts["variables"][1]
+    assert snapshot.values["current_options"][0].text == "选项0"
+
+
+def test_rewind_restores_state_and_stays_isolated():
+    engine = GameEngine(io=HeadlessIO())
+    strength = engine.character_attributes["STR"]
+    start_turn(engine, 0)
+    for turn in range(1, 4):
+        engine.history_choices.append(f"选择{turn - 1}")
+        engine.inventory[f"物品{turn}"] = "描述"
+        engine.character_attributes["STR"] += 1
+        engine.situation += 1
+        start_turn(engine, turn)
+    assert engine.rewind_ring.max_steps() == 3
+
+    snapshot = engine.rewind_ring.rewind(engine, 2)
+    assert snapshot.turn == 2
+    assert list(engine.history_descriptions) == ["剧情0", "剧情1"]
+    assert list(engine.history_choices) == ["选择0"]
+    assert list(engine.inventory) == ["物品1"]
+    assert engine.character_attributes["STR"] == strength + 1
+    assert engine.situation == 1
+    assert engine.current_description == "剧情1"
+    assert engine.history_simple_summaries == ["摘要0", "摘要1"]
+    assert len(engine.rewind_ring) == 2
+
+    # 恢复后的状态与快照互不影响：修改后再回到本回合开始仍是快照中的状态
+    engine.inventory["新物品"] = "描述"
+    engine.current_options[0].text = "被修改的选项"
+    engine.rewind_ring.rewind(engine, 0)
+    assert list(engine.inventory) == ["物品1"]
+    assert engine.current_options[0].text == "选项1"
+
+    assert engine.rewind_ring.rewind(engine, 5) is None
+
+
+def test_journal_round_trip():
+    engine = GameEngine(io=HeadlessIO())
+    start_turn(engine, 0)
+    engine.history_choices.append("选择0")
+    engine.inventory["火把"] = "照明用"
+    start_turn(engine, 1)
+    ring = RewindRing.from_json(engine, engine.rewind_ring.to_json(engine))
+    assert len(ring) == 2
+    ring.rewind(engine, 1)
+    assert "火把" not in engine.inventory
+    assert list(engine.history_descriptions) == ["剧情0"]
@@ -0,0 +1,64 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 存档文件布局测试
+import json
+from save_format import (write_save_file, read_save_file, read_save_header,
+                         SAVE_HEADER_SIZE, HEADER_TEXT_LIMIT, MAIN_BRANCH)
+
+SAVE_DATA = {
+    "version": "0.1.6b",
+    "game_id": "abcd1234",
+    "branch": MAIN_BRANCH,
+    "player_name": "玩家",
+    "timestamp": "2025-01-01T00:00:00",
+    "total_turns": 3,
+    "save_desc": "autosave",
+    "inventory": {"火把": "照明用"},
+    "variables": {"好感度": 3},
+    "history_refs": {"history_descriptions": ["a", "b"]},
+    "history_simple_summaries": ["摘要1", "摘要2"],
+    "token_consumes": [10, 20, 30],
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "save.json")
+    write_save_file(path, SAVE_DATA)
+    assert read_save_file(path) == SAVE_DATA
+    header = read_save_header(path)
+    assert header["save_format"] == 2
+    assert {k: header[k] for k in ("version", "game_id", "total_turns")} == \
+        {"version": "0.1.6b", "game_id": "abcd1234", "total_turns": 3}
+    # 文件头定长，数据段从固定偏移开始
+    with open(path, 'rb') as f:
+        assert f.read(SAVE_HEADER_SIZE).endswith(b"\n")
+
+
+def test_read_single_section(tmp_path):
+    path = str(tmp_path / "save.json")
+    write_save_file(path, SAVE_DATA)
+    history = read_save_file(path, sections=("history",))
+    assert history["history_refs"] == SAVE_DATA["history_refs"]
+    assert "inventory" not in history
+    state = read_save_file(path, sections=("state",))
+    assert state["inventory"] == SAVE_DATA["inventory"]
+    assert "history_refs" not in state
+
+
+def test_long_header_text_is_truncated_only_in_header(tmp_path):
+    path = str(tmp_path / "save.json")
+    save_data = dict(SAVE_DATA, player_name="名" * SAVE_HEADER_SIZE)
+    write_save_file(path, save_data)
+    assert len(read_save_header(path)["player_name"]) == HEADER_TEXT_LIMIT
+    assert read_save_file(path, sections=("state",))["player_name"] == save_data["player_name"]
+
+
+def test_legacy_file_fallback(tmp_path):
+    path = tmp_path / "legacy.json"
+    path.write_text(json.dumps(SAVE_DATA, ensure_ascii=False, indent=2), encoding='utf-8')
+    assert read_save_file(str(path)) == SAVE_DATA
+    assert read_save_file(str(path), sections=("history",)) == SAVE_DATA
+    header = read_save_header(str(path))
+    assert header["save_format"] == 1
+    assert header["game_id"] == "abcd1234"
+
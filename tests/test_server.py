@@ -0,0 +1,103 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# 多会话游戏服务测试
+import asyncio
+import threading
+from http import HTTPStatus
+import pytest
+import main as game_main
+from game_engine import GameEngine
+from server import GameServer, ApiError
+from sqlite_store import SQLiteSaveStore
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path, monkeypatch):
+    store = SQLiteSaveStore(str(tmp_path / "saves.db"))
+    monkeypatch.setattr(game_main.config, "save_backend", "sqlite")
+    monkeypatch.setattr(game_main, "sqlite_save_store", store)
+    yield store
+    store.close()
+
+
+def test_save_from_different_worker_threads(sqlite_backend, monkeypatch):
+    server = GameServer()
+    session = server._new_session()
+    session.engine.game_id = "test_game"
+    server.sessions[session.id] = session
+    threads = set()
+    save_game = game_main.save_game
+
+    def recording_save_game(*args, **kwargs):
+        threads.add(threading.get_ident())
+        return save_game(*args, **kwargs)
+
+    monkeypatch.setattr(game_main, "save_game", recording_save_game)
+    # 每次asyncio.run使用新的默认线程池，两次保存在不同的工作线程中执行
+    for name in ("first", "second"):
+        result = asyncio.run(server.save(session, {"name": name}))
+        assert result["session_id"] == session.id
+    assert len(threads) == 2
+    names = {row["filename"] for row in sqlite_backend.list_saves()}
+    assert len(names) == 2
+
+
+@pytest.mark.parametrize("body", [
+    {"game_id": "../../x"},
+    {"game_id": "/tmp/x"},
+    {"game_id": "a" * 65},
+])
+def test_start_rejects_unsafe_game_id(body):
+    server = GameServer()
+    with pytest.raises(ApiError) as excinfo:
+        asyncio.run(server.start(body))
+    assert excinfo.value.status == HTTPStatus.BAD_REQUEST
+    assert not server.sessions
+
+
+@pytest.mark.parametrize("name", ["../x", "a/b", "a.json"])
+def test_save_rejects_unsafe_name(name):
+    server = GameServer()
+    session = server._new_session()
+    server.sessions[session.id] = session
+    with pytest.raises(ApiError) as excinfo:
+        asyncio.run(server.save(session, {"name": name}))
+    assert excinfo.value.status == HTTPStatus.BAD_REQUEST
+
+
+def test_state_does_not_wait_for_running_turn():
+    server = GameServer()
+    session = server._new_session()
+    server.sessions[session.id] = session
+    asyncio.run(server._run(session, lambda: session.engine.inventory.update({"剑": "锋利"})))
+    session.io.emit("info", "获得了剑")
+
+    async def poll_during_turn():
+        async with session.lock:
+            # 进行中的回合修改的状态不会出现在快照里
+            session.engine.inventory["盾"] = ""
+            return await asyncio.wait_for(server.dispatch("GET", f"/sessions/{session.id}", {}), 1)
+
+    status, state = asyncio.run(poll_during_turn())
+    assert status == HTTPStatus.OK
+    assert state["inventory"] == {"剑": "锋利"}
+    assert [event["text"] for event in state["events"]] == ["获得了剑"]
+
+
+def test_same_game_id_gets_separate_save_dirs(monkeypatch):
+    monkeypatch.setattr(GameEngine, "start_game", lambda self, story: None)
+    server = GameServer()
+    first = asyncio.run(server.start({"game_id": "shared"}))
+    second = asyncio.run(server.start({"game_id": "shared"}))
+    assert first["game_id"] == f"{first['session_id']}-shared"
+    assert second["game_id"] == f"{second['session_id']}-shared"
+    assert first["game_id"] != second["game_id"]
+
+
+@pytest.mark.parametrize("seed", [True, False, 1.5, "7"])
+def test_start_rejects_non_int_seed(seed):
+    server = GameServer()
+    with pytest.raises(ApiError) as excinfo:
+        asyncio.run(server.start({"seed": seed}))
+    assert excinfo.value.status == HTTPStatus.BAD_REQUEST
+    assert not server.sessions
@@ -0,0 +1,94 @@
+# Copyright (c) 2025 [687jsassd]
+# MIT License
+# SQLite存档后端测试
+from datetime import datetime, timedelta
+from history_store import HISTORY_CHUNK_SIZE
+from sqlite_store import SQLiteSaveStore, MAX_AUTO_SAVES
+
+GAME_ID = "test_game"
+START = datetime(2025, 1, 1)
+
+
+class FakeEngine:
+    """向save_game提供历史剧情与事件"""
+
+    def __init__(self):
+        self.history_descriptions = ["开局"]
+        self.history_choices = []
+        self.events = []
+
+    def play(self, label: str):
+        self.history_choices.append(f"选择{label}")
+        self.history_descriptions.append(f"剧情{label}")
+
+
+class InsertCounter:
+    """统计插入turns表的行数"""
+
+    def __init__(self, store: SQLiteSaveStore):
+        self.count = 0
+        store.conn.set_trace_callback(self._trace)
+
+    def _trace(self, statement: str):
+        if statement.lstrip().startswith("INSERT INTO turns"):
+            self.count += 1
+
+
+def autosave(store: SQLiteSaveStore, engine: FakeEngine, seq: int):
+    save_data = {
+        "game_id": GAME_ID,
+        "player_name": "测试",
+        "timestamp": (START + timedelta(seconds=seq)).isoformat(),
+        "save_desc": "autosave",
+        "total_turns": len(engine.history_descriptions),
+        "version": "test",
+        "history_simple_summaries": [],
+        "inventory": {},
+        "item_repo": {},
+        "variables": {},
+    }
+    store.save_game(engine, save_data, f"autosave_{seq:04d}")
+
+
+def test_saves_after_rewind_insert_only_new_turns(tmp_path):
+    store = SQLiteSaveStore(str(tmp_path / "saves.db"))
+    engine = FakeEngine()
+    seq = 0
+    for turn in range(20):
+        engine.play(f"a{turn}")
+        seq += 1
+        autosave(store, engine, seq)
+    # 回退5回合后走另一条分支，轮换会逐步回收旧分支上的回合
+    del engine.history_descriptions[-5:]
+    del engine.history_choices[-5:]
+    counter = InsertCounter(store)
+    inserted = []
+    for turn in range(MAX_AUTO_SAVES + 5):
+        engine.play(f"b{turn}")
+        before = counter.count
+        seq += 1
+        autosave(store, engine, seq)
+        inserted.append(counter.count - before)
+    assert inserted == [1] * len(inserted)
+    turn_rows = store.conn.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+    assert turn_rows == len(engine.history_descriptions)
+
+    loaded = store.read_save(game_id=GAME_ID)
+    assert loaded["history_descriptions"] == engine.history_descriptions
+    store.close()
+
+
+def test_events_refilled_to_same_length_are_rewritten(tmp_path):
+    store = SQLiteSaveStore(str(tmp_path / "saves.db"))
+    engine = FakeEngine()
+    engine.events = [{"turn": 0, "type": "var_set", "vars": {"n": i}}
+                     for i in range(HISTORY_CHUNK_SIZE * 3)]
+    autosave(store, engine, 1)
+    # 回退后事件被截断，之后又追加到相同长度(内容不同)
+    del engine.events[HISTORY_CHUNK_SIZE // 2:]
+    engine.events += [{"turn": 1, "type": "var_set", "vars": {"m": i}}
+                      for i in range(HISTORY_CHUNK_SIZE * 3 - len(engine.events))]
+    engine.play("a")
+    autosave(store, engine, 2)
+    assert store.read_save(game_id=GAME_ID)["events"] == engine.events
+    store.close()
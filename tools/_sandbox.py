@@ -0,0 +1,37 @@
+# 工具脚本的公共启动代码：将仓库根目录加入导入路径，并在导入游戏模块前切换到临时目录
+# (导入配置、引擎或主程序时会在当前目录创建配置与日志目录，不应留在启动目录中)
+# 临时目录在退出时删除；命令行中带--keep-sandbox时保留(查看其中的配置、日志与存档)
+# 用法(在导入游戏模块之前): from _sandbox import START_DIR, enter_sandbox; enter_sandbox("bench_xxx_")
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# 启动时的目录(命令行参数中的相对路径相对于此目录)
+START_DIR = os.getcwd()
+KEEP_FLAG = "--keep-sandbox"
+
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+def _cleanup(path: str) -> None:
+    os.chdir(START_DIR)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def enter_sandbox(prefix: str) -> str:
+    """切换到新建的临时目录，返回其路径"""
+    # 在各工具解析参数前取出本标志，工具自身的参数不受影响
+    keep = KEEP_FLAG in sys.argv
+    if keep:
+        sys.argv = [arg for arg in sys.argv if arg != KEEP_FLAG]
+    path = tempfile.mkdtemp(prefix=prefix)
+    os.chdir(path)
+    if keep:
+        print(f"临时目录: {path}")
+    else:
+        atexit.register(_cleanup, path)
+    return path
@@ -0,0 +1,87 @@
+# 文本着色基准测试：1KB/10KB/100KB剧情文本的着色耗时
+# 对比旧实现(逐字符扫描)与只定位括号字符的单遍实现，并校验两者输出逐字节一致
+# 用法: python tools/bench_colorize.py
+import time
+import random
+
+from _sandbox import enter_sandbox
+
+enter_sandbox("bench_color_")
+
+from config import COLOR_RESET  # noqa: E402
+from render import colorize, COLOR_CONVERT, CLOSE_CHARS  # noqa: E402
+
+TEXT_SIZES = [1024, 10 * 1024, 100 * 1024]
+ROUNDS = 20
+
+
+def legacy_colorize(text: str) -> str:
+    """旧实现(去掉了括号不匹配时等待输入的部分)"""
+    remain_color_stack = [COLOR_RESET]
+    remain_need_close_chars_stack = []
+    finally_text = []
+    current_printing_color = COLOR_RESET
+    for i in text:
+        if i in COLOR_CONVERT:
+            current_printing_color = COLOR_CONVERT[i]
+            remain_need_close_chars_stack.append(i)
+            remain_color_stack.append(current_printing_color)
+            finally_text.append(current_printing_color+i)
+        elif i in CLOSE_CHARS:
+            if remain_need_close_chars_stack and remain_need_close_chars_stack[-1] == CLOSE_CHARS[i]:
+                remain_need_close_chars_stack.pop()
+            else:
+                return text
+            if remain_color_stack:
+                remain_color_stack.pop()
+                current_printing_color = remain_color_stack[-1] if remain_color_stack else COLOR_RESET
+                finally_text.append(i+current_printing_color)
+            else:
+                finally_text.append(i+COLOR_RESET)
+        else:
+            finally_text.append(i)
+    finally_text.append(COLOR_RESET)
+    return ''.join(finally_text)
+
+
+def make_narrative(size: int, rng: random.Random) -> str:
+    """生成约size字节(UTF-8)的剧情文本，平均每句含一处(可能嵌套的)括号"""
+    sentences = []
+    total = 0
+    while total < size:
+        sentence = "你沿着山路前行，远处传来钟声，风吹过树林"
+        if rng.random() < 0.7:
+            opener = rng.choice(list(COLOR_CONVERT))
+            closer = next(c for c, o in CLOSE_CHARS.items() if o == opener)
+            inner = "神秘的老人"
+            if rng.random() < 0.2:
+                inner = f"「{inner}」的话"
+            sentence += f"{opener}{inner}{closer}"
+        sentence += "。"
+        sentences.append(sentence)
+        total += len(sentence.encode("utf-8"))
+    return "".join(sentences)
+
+
+def bench(func, text: str) -> float:
+    """返回着色ROUNDS次的平均耗时(毫秒)"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(text)
+    return (time.perf_counter() - start) * 1000 / ROUNDS
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    # 随机短文本(含括号不匹配的情况)校验输出一致
+    alphabet = "ab，" + "".join(COLOR_CONVERT) + "".join(CLOSE_CHARS)
+    for _ in range(20000):
+        sample = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        assert colorize(sample) == legacy_colorize(sample), sample
+    print(f"{'文本大小':>8} | {'旧实现(ms)':>10} | {'单遍实现(ms)':>12} | {'加速比':>8}")
+    for size in TEXT_SIZES:
+        text = make_narrative(size, rng)
+        assert colorize(text) == legacy_colorize(text)
+        old = bench(legacy_colorize, text)
+        new = bench(colorize, text)
+        print(f"{size // 1024:>6}KB | {old:>10.3f} | {new:>12.3f} | {old / new:>7.1f}x")
@@ -0,0 +1,66 @@
+# 指令处理基准测试：大背包下整批处理大量add_item指令的耗时
+# 对比旧实现(每条add_item前都整体重建一次背包)与整批校验、只修复一次物品名的指令引擎
+# 用法: python tools/bench_commands.py
+import time
+
+from _sandbox import enter_sandbox
+
+enter_sandbox("bench_cmd_")
+
+from game_engine import GameEngine  # noqa: E402
+from events import fix_item_names  # noqa: E402
+
+INVENTORY_SIZES = [1000, 5000, 20000]
+BATCH_SIZES = [100, 500]
+
+
+def make_batch(size: int) -> list:
+    """一批指令：add_item为主，夹杂属性与变量修改"""
+    batch = []
+    for i in range(size):
+        if i % 10 == 8:
+            batch.append({"command": "change_attr", "value": {"STR": 1}})
+        elif i % 10 == 9:
+            batch.append({"command": "set_var", "value": {f"v{i}": i}})
+        else:
+            batch.append({"command": "add_item", "value": {f"新道具{i}": "描述"}})
+    return batch
+
+
+def legacy_apply(engine: GameEngine, commands: list):
+    """旧实现中add_item的主要开销：每条指令前都调用一次物品名修复"""
+    for command in commands:
+        value = command["value"]
+        if command["command"] == "add_item":
+            item_name, item_desc = list(value.keys())[0], list(value.values())[0]
+            engine.inventory = fix_item_names(engine.inventory)
+            if item_name in engine.inventory:
+                return
+            engine.inventory[item_name] = item_desc
+            engine.message_queue.append(f"你获得了道具{item_name}")
+        elif command["command"] == "change_attr":
+            for attr, delta in value.items():
+                engine.character_attributes[attr] += float(delta)
+                engine.message_queue.append(f"属性{attr}变动{delta}")
+        elif command["command"] == "set_var":
+            engine.variables.update(value)
+
+
+def bench(inventory_size: int, batch_size: int, apply_func) -> float:
+    """返回处理一批指令的耗时(毫秒)"""
+    engine = GameEngine()
+    engine.inventory = {f"道具{i}": f"描述{i}" for i in range(inventory_size)}
+    batch = make_batch(batch_size)
+    start = time.perf_counter()
+    apply_func(engine, batch)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    print(f"{'背包大小':>8} | {'指令数':>6} | {'旧实现(ms)':>10} | {'指令引擎(ms)':>12} | {'加速比':>8}")
+    for inv_size in INVENTORY_SIZES:
+        for batch_size in BATCH_SIZES:
+            old = bench(inv_size, batch_size, legacy_apply)
+            new = bench(inv_size, batch_size,
+                        lambda engine, batch: engine.handle_command(batch))
+            print(f"{inv_size:>8} | {batch_size:>6} | {old:>10.2f} | {new:>12.2f} | {old / new:>7.1f}x")
@@ -0,0 +1,71 @@
+# 背包基准测试：大背包下按编号批量存储物品与生成道具列表文本的耗时
+# 对比旧实现(每个编号都重建一次物品名列表)与按编号O(1)访问的Inventory
+# 用法: python tools/bench_inventory.py
+import time
+
+from _sandbox import enter_sandbox
+
+enter_sandbox("bench_inv_")
+
+from containers import Inventory  # noqa: E402
+from game_engine import GameEngine  # noqa: E402
+
+INVENTORY_SIZES = [1000, 10000, 50000]
+BATCH_SIZE = 500
+TEXT_ROUNDS = 200
+
+
+def legacy_put(inventory: dict, repository: dict, tokens: list):
+    """旧实现：每个编号都把物品名整体转换为列表后再取下标，并逐个移动"""
+    for token in tokens:
+        if token.isdigit() and int(token) <= len(inventory):
+            token = list(inventory.keys())[int(token) - 1]
+        if token in inventory:
+            repository[token] = inventory.pop(token)
+
+
+def inventory_put(inventory: Inventory, repository: Inventory, tokens: list):
+    """新实现：先按操作前的编号全部解析，再批量移动"""
+    names = [name for _, name in inventory.resolve_many(tokens) if name is not None]
+    inventory.move_items(names, repository)
+
+
+def legacy_prompt_text(inventory: dict) -> str:
+    """旧实现的提示词道具文本：每次都为全部道具生成文本后再切片"""
+    return "\n".join([f"{item}(描述:{desc})" for item, desc in inventory.items()][-25:]) + \
+        ', '.join([item for item, desc in inventory.items()][-35:-12])
+
+
+def bench_put(size: int, put_func, container) -> float:
+    """返回批量存储BATCH_SIZE个物品的耗时(毫秒)；编号从大到小，保证都有效"""
+    inventory = container({f"道具{i}": f"描述{i}" for i in range(size)})
+    repository = container()
+    tokens = [str(size - i * 2) for i in range(BATCH_SIZE)]
+    start = time.perf_counter()
+    put_func(inventory, repository, tokens)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_text(size: int, text_func) -> float:
+    """返回生成TEXT_ROUNDS次提示词道具文本的耗时(毫秒)"""
+    engine = GameEngine()
+    engine.inventory = Inventory({f"道具{i}": f"描述{i}" for i in range(size)})
+    start = time.perf_counter()
+    for _ in range(TEXT_ROUNDS):
+        text_func(engine)
+    return (time.perf_counter() - start) * 1000
+
+
+if __name__ == "__main__":
+    print(f"按编号批量存储{BATCH_SIZE}个物品")
+    print(f"{'背包大小':>8} | {'旧实现(ms)':>10} | {'Inventory(ms)':>13} | {'加速比':>8}")
+    for size in INVENTORY_SIZES:
+        old = bench_put(size, legacy_put, dict)
+        new = bench_put(size, inventory_put, Inventory)
+        print(f"{size:>8} | {old:>10.2f} | {new:>13.2f} | {old / new:>7.1f}x")
+    print(f"\n生成{TEXT_ROUNDS}次提示词道具文本")
+    print(f"{'背包大小':>8} | {'旧实现(ms)':>10} | {'Inventory(ms)':>13} | {'加速比':>8}")
+    for size in INVENTORY_SIZES:
+        old = bench_text(size, lambda engine: legacy_prompt_text(engine.inventory))
+        new = bench_text(size, lambda engine: engine.get_inventory_text_for_prompt())
+        print(f"{size:>8} | {old:>10.2f} | {new:>13.2f} | {old / new:>7.1f}x")
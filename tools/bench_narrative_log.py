@@ -0,0 +1,50 @@
+# 剧情日志写入开销基准测试：对比"每轮整体重写"与"只追加新回合"在长局中的每轮耗时
+# 用法: python tools/bench_narrative_log.py
+import os
+import time
+
+from _sandbox import enter_sandbox
+
+enter_sandbox("bench_log_")
+
+from game_engine import GameEngine  # noqa: E402
+
+SESSION_LENGTHS = [100, 1000, 5000]
+MEASURE_TURNS = 50  # 每个长度下统计最后若干轮的平均耗时
+DESC_TEXT = "你沿着青石小路走进了镇子，[店小二]迎了上来，『客官里边请』。" * 4
+
+
+def rewrite_log(engine: GameEngine, log_file: str):
+    """旧实现：每轮以'w'模式重写全部剧情"""
+    narrative_file = log_file.replace(".log", "_narrative.log")
+    with open(narrative_file, "w", encoding="utf-8", errors="replace") as f:
+        for desc, choice in zip(engine.history_descriptions, engine.history_choices):
+            f.write(f"{desc}\n{choice}\n\n")
+
+
+def bench(length: int, log_func) -> float:
+    """模拟length轮游戏，每轮写一次日志，返回最后MEASURE_TURNS轮的平均耗时(毫秒)"""
+    engine = GameEngine()
+    log_file = os.path.join(os.getcwd(), f"bench_{length}_{log_func.__name__}.log")
+    cost = 0.0
+    for turn in range(length):
+        engine.history_descriptions.append(f"{turn}:{DESC_TEXT}")
+        engine.history_choices.append(f"选项{turn}")
+        start = time.perf_counter()
+        log_func(engine, log_file)
+        if turn >= length - MEASURE_TURNS:
+            cost += time.perf_counter() - start
+    return cost / MEASURE_TURNS * 1000
+
+
+def append_log(engine: GameEngine, log_file: str):
+    """新实现：GameEngine.log_game 只追加新回合"""
+    engine.log_game(log_file)
+
+
+if __name__ == "__main__":
+    print(f"{'回合数':>8} | {'整体重写(ms/轮)':>16} | {'追加写入(ms/轮)':>16} | {'加速比':>8}")
+    for n in SESSION_LENGTHS:
+        old = bench(n, rewrite_log)
+        new = bench(n, append_log)
+        print(f"{n:>8} | {old:>16.3f} | {new:>16.3f} | {old / new:>7.1f}x")
@@ -0,0 +1,64 @@
+# AI响应解析基准测试：格式正确的响应在旧解析方式与分级解析下的耗时
+# 旧方式总是先全文替换中文标点再调用json_repair；分级解析先严格json.loads，失败才逐级回退
+# 用法: python tools/bench_parse.py
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from json_repair import repair_json  # noqa: E402
+from response_parser import parse_json_response, ParseStats  # noqa: E402
+
+DESCRIPTION_SIZES = [500, 2000, 8000]
+ROUNDS = 50
+
+
+def legacy_parse(response: str):
+    """旧的解析方式"""
+    response = response.replace("“", '"').replace(
+        "”", '"').replace("：", ":").replace('，', ',')
+    start_idx, end_idx = response.find('{'), response.rfind('}')
+    return json.loads(repair_json(response[start_idx:end_idx+1]))
+
+
+def make_response(size: int, structural_cn: bool = False) -> str:
+    """生成一条带size字剧情与4个选项的响应；structural_cn为True时结构位置使用中文标点"""
+    data = {
+        "description": ("你推开木门，看见「老人」说：“来了？”" * (size // 18 + 1))[:size],
+        "summary": "主角进入木屋，遇到老人",
+        "options": [{"id": i, "text": f"选项{i}：询问老人", "type": "check", "main_factor": "CHA",
+                     "difficulty": 10, "base_probability": 0.5, "next_preview": "老人抬起头，"}
+                    for i in range(1, 5)],
+        "commands": [{"command": "change_situation", "value": "+1"}],
+    }
+    text = json.dumps(data, ensure_ascii=False)
+    if structural_cn:
+        text = text.replace('", "', '"，"').replace('": ', '"：')
+    return "好的，以下是剧情：\n" + text
+
+
+def bench(func, response: str) -> float:
+    """返回解析ROUNDS次的平均耗时(毫秒)"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(response)
+    return (time.perf_counter() - start) * 1000 / ROUNDS
+
+
+if __name__ == "__main__":
+    stats = ParseStats()
+    print(f"{'剧情字数':>8} | {'结构标点':>8} | {'旧方式(ms)':>10} | {'分级解析(ms)':>12} | {'加速比':>8}")
+    for size in DESCRIPTION_SIZES:
+        for structural_cn in (False, True):
+            response = make_response(size, structural_cn)
+            result, _ = parse_json_response(response, stats)
+            # 分级解析不改动字符串内的中文标点
+            assert result["description"] == json.loads(make_response(size).split("\n", 1)[1])["description"]
+            old = bench(legacy_parse, response)
+            new = bench(lambda r: parse_json_response(r, stats), response)
+            label = "中文" if structural_cn else "英文"
+            print(f"{size:>8} | {label:>8} | {old:>10.3f} | {new:>12.3f} | {old / new:>7.1f}x")
+    print()
+    print(stats.report())
@@ -0,0 +1,92 @@
+# 主界面绘制基准测试：长游戏中每回合刷新主界面的耗时与输出量
+# 对比旧方式(启动子进程清屏 + 重印最近50回合 + 重新统计全部字数)与增量绘制(只追加新回合 + 增量字数统计)
+# 用法: python tools/bench_screen.py
+import os
+import io
+import time
+import contextlib
+
+from _sandbox import enter_sandbox
+
+enter_sandbox("bench_screen_")
+
+import main  # noqa: E402
+from game_engine import GameEngine  # noqa: E402
+from history_store import history_text_length  # noqa: E402
+from render import render_narrative, render_choice  # noqa: E402
+from screen import Screen, SCREEN_HISTORY_TURNS  # noqa: E402
+
+GAME_LENGTHS = [100, 500, 2000]
+DESCRIPTION = "你沿着山路前行，远处传来「钟声」，风吹过『古老的』树林。" * 25
+ROUNDS = 20
+
+
+def make_game(turns: int) -> GameEngine:
+    game = GameEngine(main.config)
+    game.history_descriptions = [f"{i}:{DESCRIPTION}" for i in range(turns + 1)]
+    game.history_choices = [f"选项{i}<检定小成功>" for i in range(turns)]
+    game.current_description = game.history_descriptions[-1]
+    return game
+
+
+def legacy_frame(game: GameEngine, _screen):
+    """旧方式：子进程清屏，重印最近50回合，重新统计全部字数"""
+    os.system('cls >NUL' if os.name == 'nt' else 'clear >/dev/null 2>&1')
+    for turn, desc, choice in zip(range(1, 51), game.history_descriptions[-50:], game.history_choices[-50:]):
+        print(f"{turn}:")
+        print(render_narrative(desc))
+        print(render_choice(choice))
+        print("\n" + '-'*40)
+    print(render_narrative(game.current_description))
+    print(f"字数:{history_text_length(game.history_descriptions)}")
+
+
+def incremental_frame(game: GameEngine, screen: Screen):
+    """增量绘制：追加新完成回合的选择与新剧情，增量统计字数"""
+    completed = game.completed_turns()
+    first_new_turn = screen.pending_turns(completed)
+    if first_new_turn is None:
+        # 首帧：整屏重绘最近的回合
+        screen.clear()
+        for record in game.iter_turns(completed - SCREEN_HISTORY_TURNS):
+            main.print_turn(record)
+    else:
+        for record in game.iter_turns(first_new_turn):
+            print(render_choice(record.choice))
+            print("\n" + '-'*40)
+    print(render_narrative(game.current_description))
+    screen.mark_drawn(completed, game.current_description)
+    print(f"字数:{screen.word_counter.update(game.history_descriptions)}")
+
+
+def advance(game: GameEngine, turn: int):
+    """模拟完成一个回合"""
+    game.history_choices.append(f"选项{turn}<检定小成功>")
+    game.current_description = f"{turn}:{DESCRIPTION}"
+    game.history_descriptions.append(game.current_description)
+
+
+def bench(turns: int, frame_func):
+    """返回(每帧平均耗时ms, 每帧平均输出字节数)"""
+    game = make_game(turns)
+    screen = Screen()
+    with contextlib.redirect_stdout(io.StringIO()):
+        frame_func(game, screen)  # 首帧(整屏)不计入
+    total_time, total_bytes = 0.0, 0
+    for i in range(ROUNDS):
+        advance(game, turns + i + 1)
+        out = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(out):
+            frame_func(game, screen)
+        total_time += time.perf_counter() - start
+        total_bytes += len(out.getvalue().encode("utf-8"))
+    return total_time * 1000 / ROUNDS, total_bytes // ROUNDS
+
+
+if __name__ == "__main__":
+    print(f"{'回合数':>6} | {'旧方式(ms)':>10} | {'旧输出(KB)':>10} | {'增量(ms)':>8} | {'增量输出(KB)':>12}")
+    for turns in GAME_LENGTHS:
+        old_ms, old_bytes = bench(turns, legacy_frame)
+        new_ms, new_bytes = bench(turns, incremental_frame)
+        print(f"{turns:>6} | {old_ms:>10.2f} | {old_bytes / 1024:>10.1f} | {new_ms:>8.2f} | {new_bytes / 1024:>12.1f}")
@@ -0,0 +1,66 @@
+# 打字机效果基准测试：输出一段剧情的实际耗时与写入/刷新次数
+# 对比旧实现(每个字符写入并刷新一次，再sleep一次)与按帧批量输出
+# 用法: python tools/bench_typewriter.py
+import os
+import io
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from animes import typewriter_effect  # noqa: E402
+
+TEXT_LENGTHS = [500, 2000]
+SPEEDS = [200, 1000]  # 字/秒
+
+
+class CountingStream(io.StringIO):
+    """统计写入与刷新次数的输出流"""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+        self.flushes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def legacy_typewriter(text: str, delay: float):
+    """旧实现：逐字符写入、刷新并sleep"""
+    for char in text:
+        sys.stdout.write(char)
+        sys.stdout.flush()
+        time.sleep(delay)
+
+
+def bench(func):
+    """返回(耗时s, 写入次数, 刷新次数)"""
+    stream = CountingStream()
+    old_stdout = sys.stdout
+    sys.stdout = stream
+    start = time.perf_counter()
+    try:
+        func()
+    finally:
+        sys.stdout = old_stdout
+    return time.perf_counter() - start, stream.writes, stream.flushes
+
+
+if __name__ == "__main__":
+    print(f"{'字数':>6} | {'速度':>6} | {'理论(s)':>7} | {'旧实现(s)':>9} | {'旧写入/刷新':>12} | {'按帧(s)':>7} | {'按帧写入/刷新':>12} | {'直接输出(ms)':>12}")
+    for length in TEXT_LENGTHS:
+        text = "剧" * length
+        for speed in SPEEDS:
+            old_time, old_writes, old_flushes = bench(
+                lambda: legacy_typewriter(text, 1 / speed))
+            new_time, new_writes, new_flushes = bench(
+                lambda: typewriter_effect(text, chars_per_second=speed))
+            instant_time, _, _ = bench(
+                lambda: typewriter_effect(text, chars_per_second=0))
+            print(f"{length:>6} | {speed:>6} | {length / speed:>7.2f} | {old_time:>9.2f} | {f'{old_writes}/{old_flushes}':>12} | "
+                  f"{new_time:>7.2f} | {f'{new_writes}/{new_flushes}':>12} | {instant_time * 1000:>12.3f}")
@@ -0,0 +1,113 @@
+# 多会话游戏服务压力测试：N个客户端同时各自开局并连续推进回合
+# 服务与模拟LLM(tools/mock_llm_server.py)在本进程中运行，不消耗真实Token
+# 统计吞吐量(回合/秒)、请求延迟分位数、发往提供商的峰值并发数与每个会话的内存占用
+# 用法: python tools/load_test_server.py [--clients 200] [--turns 5] [--ttft 0.2] [--tps 2000] [--concurrency 32]
+import json
+import time
+import asyncio
+import argparse
+import threading
+import http.client
+
+from _sandbox import enter_sandbox
+
+enter_sandbox("load_test_server_")
+
+import main  # noqa: E402
+from server import GameServer, serve  # noqa: E402
+from mock_llm_server import MockLLM, start_mock_server  # noqa: E402
+
+def start_in_thread(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def client_run(port: int, turns: int, latencies: list, errors: list):
+    """一个玩家：开局，然后连续选择选项(同一连接keep-alive)"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+
+    def request(method, path, body=None):
+        start = time.perf_counter()
+        conn.request(method, path, json.dumps(body or {}),
+                     {"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        data = json.loads(resp.read())
+        latencies.append(time.perf_counter() - start)
+        if resp.status >= 400:
+            errors.append(data.get("error"))
+            return None
+        return data
+
+    state = request("POST", "/sessions", {"player_name": "测试", "story": "山路"})
+    if state is None:
+        return
+    for _ in range(turns):
+        if state is None or state["status"] != "ongoing":
+            break
+        option = state["options"][0]["id"]
+        state = request("POST", f"/sessions/{state['session_id']}/turn", {"option": option})
+    conn.close()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def main_test():
+    parser = argparse.ArgumentParser(description="多会话游戏服务压力测试")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--ttft", type=float, default=0.2, help="模拟LLM的首字延迟(秒)")
+    parser.add_argument("--tps", type=float, default=2000, help="模拟LLM的生成速度(Token/秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟LLM延迟的抖动幅度")
+    parser.add_argument("--concurrency", type=int, default=32, help="提供商的并发请求上限")
+    args = parser.parse_args()
+
+    _, base_url = start_mock_server(llm=MockLLM(args.ttft, args.tps, args.jitter, seed=0))
+
+    config = main.config
+    config.api_providers = {0: {"name": "mock", "model": "mock", "api_key": "mock",
+                                "base_url": base_url,
+                                "max_concurrency": args.concurrency}}
+    config.api_provider_choice = 0
+    game_server = GameServer(config)
+
+    ready = threading.Event()
+    port_box = []
+
+    def on_ready(port):
+        port_box.append(port)
+        ready.set()
+
+    start_in_thread(lambda: asyncio.run(serve(game_server, port=0, on_ready=on_ready)))
+    ready.wait()
+    port = port_box[0]
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    threads = [start_in_thread(lambda: client_run(port, args.turns, latencies, errors))
+               for _ in range(args.clients)]
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = game_server.stats()
+    provider = stats["providers"].get("mock", {})
+    sessions = max(stats["sessions"], 1)
+    print(f"客户端 {args.clients}，每个 {args.turns} 回合，LLM首字延迟 {args.ttft}s、{args.tps:.0f}Token/秒，提供商并发上限 {args.concurrency}")
+    print(f"请求数 {len(latencies)}，失败 {len(errors)}，耗时 {elapsed:.2f}s，"
+          f"吞吐 {len(latencies) / elapsed:.1f} 请求/秒")
+    print(f"延迟 p50 {percentile(latencies, 0.5) * 1000:.0f}ms，"
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f}ms")
+    print(f"LLM请求 {provider.get('requests', 0)}，峰值并发 {provider.get('peak_in_flight', 0)}，"
+          f"排队总时长 {provider.get('wait_seconds', 0)}s")
+    print(f"会话 {stats['sessions']}，内存估计 {stats['memory_bytes'] / 1024:.0f}KB，"
+          f"平均每会话 {stats['memory_bytes'] / sessions / 1024:.1f}KB")
+    if errors:
+        print("失败示例:", errors[:3])
+
+
+if __name__ == "__main__":
+    main_test()
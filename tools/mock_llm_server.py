@@ -0,0 +1,256 @@
+# 本地模拟LLM服务：实现OpenAI兼容的/v1/chat/completions(普通与SSE流式)，用于测试与基准测试，不消耗真实Token
+# 按提示词类型(剧情/总结/思考/物品判定/自定义行动修饰)返回符合游戏格式的JSON或文本，附带按文本长度估算的usage
+# 首字延迟、生成速度按对数正态分布抖动，可按比例返回错误(429/500)
+# 用法: python tools/mock_llm_server.py [--port 8900] [--ttft 0.5] [--tps 40] [--jitter 0.3] [--error-rate 0]
+# 在config/llm_api_config.json中添加提供商 {"name": "本地模拟", "base_url": "http://127.0.0.1:8900/v1", "api_key": "mock", "model": "mock"}
+import json
+import time
+import math
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8900
+
+# 提示词类型
+PROMPT_STORY = "story"              # 开局/后续剧情
+PROMPT_SUMMARY = "summary"          # 总结摘要
+PROMPT_THINK = "think"              # 思考
+PROMPT_USE_ITEM = "use_item"        # 物品使用是否合理
+PROMPT_ACTION_MODE = "action_mode"  # 自定义行动的类型修饰
+
+# 各类型提示词中的特征文本(按顺序匹配，都不匹配时视为剧情)
+PROMPT_MARKERS = (
+    (PROMPT_SUMMARY, "useless_items"),
+    (PROMPT_USE_ITEM, '"is_valid"'),
+    (PROMPT_ACTION_MODE, "计划进行动作"),
+    (PROMPT_THINK, "正在思考"),
+)
+
+SCENES = ["山路", "古镇", "渡口", "竹林", "客栈", "废庙", "集市", "书院"]
+ACTIONS = ["继续前行", "四处打听", "停下歇息", "拜访老者", "攀上岩壁", "潜入院中", "与人切磋", "翻阅旧书"]
+ITEMS = {"火折子": "可以点火照明", "干粮": "够吃两天", "旧地图": "标着几处记号", "铜钱袋": "装着些散碎铜钱"}
+ATTRS = ["STR", "DEX", "INT", "WIS", "CHA", "LUK"]
+
+
+def classify_prompt(prompt: str) -> str:
+    """根据提示词中的特征文本判断请求类型"""
+    for kind, marker in PROMPT_MARKERS:
+        if marker in prompt:
+            return kind
+    return PROMPT_STORY
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算Token数：非ASCII字符(中文)约1个/字，ASCII约4字符1个"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+class MockLLM:
+    """生成模拟回复与延迟；rng加锁，同一种子下各请求的回复序列可复现"""
+
+    def __init__(self, ttft: float = 0.5, tokens_per_second: float = 40.0, jitter: float = 0.3,
+                 error_rate: float = 0.0, story_chars: int = 300, seed=None):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.story_chars = story_chars
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = Counter()  # 按提示词类型统计
+        self.errors = 0
+
+    def _vary(self, value: float) -> float:
+        """按对数正态分布抖动(中位数为value)"""
+        if value <= 0 or self.jitter <= 0:
+            return max(value, 0.0)
+        with self.lock:
+            return value * math.exp(self.rng.gauss(0, self.jitter))
+
+    def error_status(self) -> int:
+        """按error_rate决定本次请求是否失败，失败时返回状态码(429/500)，否则返回0"""
+        with self.lock:
+            if self.rng.random() >= self.error_rate:
+                return 0
+            self.errors += 1
+            return self.rng.choice([429, 500])
+
+    def timing(self):
+        """(首字延迟, 每秒Token数)"""
+        return self._vary(self.ttft), max(self._vary(self.tokens_per_second), 1e-3)
+
+    def reply(self, prompt: str):
+        """返回(提示词类型, 回复文本)"""
+        kind = classify_prompt(prompt)
+        with self.lock:
+            self.requests[kind] += 1
+            rng = random.Random(self.rng.random())
+        if kind == PROMPT_SUMMARY:
+            content = json.dumps({"summary": "主角一路游历，" + "途经" + "、".join(rng.sample(SCENES, 3)) + "，结识了几位江湖中人。",
+                                  "useless_items": [], "useless_vars": []}, ensure_ascii=False)
+        elif kind == PROMPT_USE_ITEM:
+            content = json.dumps({"is_valid": int(rng.random() < 0.8)})
+        elif kind == PROMPT_ACTION_MODE:
+            content = json.dumps({"type": rng.choice(["normal", "check"]), "main_factor": rng.choice(ATTRS),
+                                  "difficulty": rng.randint(-10, 20), "base_probability": round(rng.uniform(0.3, 0.9), 2)})
+        elif kind == PROMPT_THINK:
+            content = "我回想起一路所见，" + "总觉得此处另有蹊跷。" * rng.randint(2, 6)
+        else:
+            content = json.dumps(self.story(rng), ensure_ascii=False)
+        return kind, content
+
+    def story(self, rng: random.Random) -> dict:
+        scene = rng.choice(SCENES)
+        sentence = f"我来到{scene}，『这里人来人往』，远处传来[钟声]。"
+        description = sentence * max(1, self.story_chars // len(sentence))
+        options = []
+        for i, action in enumerate(rng.sample(ACTIONS, rng.randint(2, 4)), 1):
+            option = {"id": i, "text": action, "type": rng.choice(["normal", "normal", "check"]),
+                      "next_preview": f"我决定{action}"}
+            if option["type"] == "check":
+                option.update(main_factor=rng.choice(ATTRS), difficulty=rng.randint(-10, 20),
+                              base_probability=round(rng.uniform(0.2, 0.9), 2))
+            options.append(option)
+        commands = []
+        if rng.random() < 0.3:
+            name = rng.choice(list(ITEMS))
+            commands.append({"command": "add_item", "value": {name: ITEMS[name]}})
+        if rng.random() < 0.3:
+            commands.append({"command": "set_var", "value": {"铜钱": str(rng.randint(0, 500))}})
+        if rng.random() < 0.2:
+            commands.append({"command": "change_situation", "value": rng.choice([-1, 1])})
+        return {"description": description, "summary": f"主角到了{scene}",
+                "options": options, "commands": commands}
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI兼容接口；llm为共享的MockLLM"""
+    protocol_version = "HTTP/1.1"
+    # 响应头与响应体分两次写出，不关闭Nagle算法时每个请求会多等待约40ms(延迟确认)
+    disable_nagle_algorithm = True
+    llm = MockLLM()
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, {"requests": dict(self.llm.requests), "errors": self.llm.errors})
+        else:
+            self._send_json(404, {"error": {"message": f"未知路径 {self.path}", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"未知路径 {self.path}", "type": "invalid_request_error"}})
+            return
+        try:
+            request = json.loads(raw)
+            prompt = "\n".join(str(m.get("content", "")) for m in request["messages"])
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._send_json(400, {"error": {"message": f"请求格式错误: {e}", "type": "invalid_request_error"}})
+            return
+        llm = self.llm
+        ttft, tps = llm.timing()
+        status = llm.error_status()
+        if status:
+            time.sleep(ttft)
+            self._send_json(status, {"error": {"message": "模拟的服务错误", "type": "server_error", "code": status}})
+            return
+        _, content = llm.reply(prompt)
+        usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        model = request.get("model", "mock")
+        if request.get("stream"):
+            include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+            self._stream(model, content, usage if include_usage else None, ttft, tps)
+            return
+        time.sleep(ttft + usage["completion_tokens"] / tps)
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{time.time_ns()}", "object": "chat.completion",
+            "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    def _stream(self, model: str, content: str, usage, ttft: float, tps: float):
+        """SSE流式输出：首字延迟后按生成速度逐段发送(分块传输编码)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": f"chatcmpl-mock-{time.time_ns()}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+
+        def event(choices, **extra):
+            payload = dict(base, choices=choices, **extra)
+            self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        time.sleep(ttft)
+        event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        # 每段约4个Token(中文约4个字)
+        piece = 4
+        for i in range(0, len(content), piece):
+            time.sleep(estimate_tokens(content[i:i + piece]) / tps)
+            event([{"index": 0, "delta": {"content": content[i:i + piece]}, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if usage is not None:
+            event([], usage=usage)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def start_mock_server(host: str = DEFAULT_HOST, port: int = 0, llm: MockLLM = None):
+    """在后台线程中启动模拟服务，返回(服务, base_url)；port为0时自动分配端口"""
+    handler = type("BoundMockLLMHandler", (MockLLMHandler,), {"llm": llm or MockLLM()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟LLM服务(OpenAI兼容)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ttft", type=float, default=0.5, help="首字延迟的中位数(秒)")
+    parser.add_argument("--tps", type=float, default=40.0, help="生成速度的中位数(Token/秒)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="延迟与速度的对数正态抖动幅度(0为固定值)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回429/500错误的比例")
+    parser.add_argument("--story-chars", type=int, default=300, help="剧情描述的大致字数")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    llm = MockLLM(args.ttft, args.tps, args.jitter, args.error_rate, args.story_chars, args.seed)
+    server, base_url = start_mock_server(args.host, args.port, llm)
+    print(f"模拟LLM服务已启动: {base_url} (model任意)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("模拟LLM服务已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# 离线重放录制文件：按录制的玩家操作驱动引擎，AI调用全部由录制的回复代替(不访问网络)
+# 用于回归测试解析、指令处理与存档读档，以及测量整个回合流程(不含网络)的耗时
+# 录制文件由游戏内的record命令生成(logs/<游戏ID>_<时间>.cassette.jsonl)
+# 用法: python tools/replay_cassette.py <录制文件> [--tolerant] [--latency] [--rounds 3] [--check-save]
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+from _sandbox import START_DIR, enter_sandbox
+
+enter_sandbox("replay_cassette_")
+
+import main  # noqa: E402
+from game_engine import GameEngine  # noqa: E402
+from engine_io import HeadlessIO  # noqa: E402
+from cassette import (Cassette, CassetteMiss, MODE_REPLAY, ACTION_STATE, ACTION_START,  # noqa: E402
+                      ACTION_GO, ACTION_THINK, ACTION_USE_ITEM, ACTION_EVENT)
+from events import SOURCE_PLAYER  # noqa: E402
+
+# 比较重放结果时使用的状态字段
+DIGEST_FIELDS = ("current_description", "inventory", "item_repository", "variables",
+                 "character_attributes", "situation", "current_game_status", "history_simple_summaries")
+
+
+def state_digest(engine: GameEngine) -> str:
+    """游戏状态的摘要(比较两次重放或存档前后是否一致)"""
+    state = {field: getattr(engine, field) for field in DIGEST_FIELDS}
+    state["history_descriptions"] = list(engine.history_descriptions)
+    state["history_choices"] = list(engine.history_choices)
+    state["current_options"] = [opt.to_json() for opt in engine.current_options]
+    data = json.dumps(state, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def apply_action(engine: GameEngine, action: dict):
+    kind = action["action"]
+    if kind == ACTION_STATE:
+        ok, _, message = main.apply_save_data(engine, action["save"])
+        if not ok:
+            raise ValueError(message)
+    elif kind == ACTION_START:
+        if "seed" in action:
+            engine.seed_rng(action["seed"])
+        engine.start_game(action["story"])
+    elif kind == ACTION_GO:
+        engine.go_game(action["option"], action["custom"], action.get("concluding", False))
+    elif kind == ACTION_THINK:
+        engine.think_go_game(action["text"])
+    elif kind == ACTION_USE_ITEM:
+        engine.is_use_item_ok(action["item"], action["move"], action["target"])
+    elif kind == ACTION_EVENT:
+        engine.record_event(action["kind"], SOURCE_PLAYER, **action["data"])
+    else:
+        raise ValueError(f"未知的操作: {kind}")
+
+
+def replay(path: str, tolerant: bool, latency: bool):
+    """重放一遍，返回(引擎, 录制, 各操作耗时)"""
+    engine = GameEngine(main.config, HeadlessIO())
+    cassette = Cassette(path, MODE_REPLAY, tolerant=tolerant, replay_latency=latency)
+    engine.cassette = cassette
+    timings = []
+    for index, action in enumerate(cassette.actions):
+        start = time.perf_counter()
+        try:
+            apply_action(engine, action)
+        except CassetteMiss as e:
+            print(f"第{index + 1}个操作({action['action']})重放失败: {e}")
+            break
+        timings.append((action["action"], time.perf_counter() - start))
+    return engine, cassette, timings
+
+
+def check_save(engine: GameEngine) -> bool:
+    """存档后读档，比较读档前后的状态"""
+    before = state_digest(engine)
+    ok, message = main.save_game(engine, extra={"turns": 0, "think_count_remain": 0})
+    if not ok:
+        print(message)
+        return False
+    loaded = GameEngine(main.config, HeadlessIO())
+    ok, _, message = main.load_game(loaded, game_id=engine.game_id, branch=engine.branch_id)
+    if not ok:
+        print(message)
+        return False
+    after = state_digest(loaded)
+    print(f"存档/读档: {'一致' if before == after else '不一致'} ({before} / {after})")
+    return before == after
+
+
+def main_replay():
+    parser = argparse.ArgumentParser(description="离线重放录制文件")
+    parser.add_argument("cassette", help="录制文件路径")
+    parser.add_argument("--tolerant", action="store_true", help="提示词不完全一致时使用同类型的下一条录制")
+    parser.add_argument("--latency", action="store_true", help="按录制的耗时等待(模拟真实网络延迟)")
+    parser.add_argument("--rounds", type=int, default=1, help="重放次数(测量耗时并检查每次结果是否一致)")
+    parser.add_argument("--check-save", action="store_true", help="重放后检查存档/读档前后状态是否一致")
+    args = parser.parse_args()
+    path = os.path.join(START_DIR, args.cassette)
+
+    digests = []
+    for round_index in range(args.rounds):
+        engine, cassette, timings = replay(path, args.tolerant, args.latency)
+        total = sum(t for _, t in timings)
+        turns = [t for kind, t in timings if kind != ACTION_STATE]
+        digests.append(state_digest(engine))
+        print(f"第{round_index + 1}次: 操作 {len(timings)}/{len(cassette.actions)}，耗时 {total * 1000:.1f}ms，"
+              f"平均每个操作 {total / max(len(turns), 1) * 1000:.2f}ms，"
+              f"命中 {cassette.hits}，宽松匹配 {cassette.tolerant_hits}，未命中 {cassette.misses}，"
+              f"状态 {digests[-1]}")
+    if args.rounds > 1:
+        print(f"各次重放结果{'一致' if len(set(digests)) == 1 else '不一致'}")
+    if args.check_save and not check_save(engine):
+        sys.exit(1)
+    if cassette.misses:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_replay()
@@ -0,0 +1,281 @@
+# 自动对局：无界面(HeadlessIO)地连续进行N个回合，按策略选择行动，逐回合记录Token用量、延迟与摘要总结
+# 用于观察长对局(1000+回合)中提示词长度、conclude_summary与Token消耗的实际增长
+# 默认在本进程中启动模拟LLM(tools/mock_llm_server.py)；指定--api-config时使用其中的真实提供商(会消耗Token)
+# 用法: python tools/self_play.py [--turns 1000] [--policy random|check|custom|模块:类] [--think-every 0] [--opi-every 0]
+#                                 [--seed 1] [--out self_play.jsonl] [--api-config config/llm_api_config.json --provider 0]
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import importlib
+from abc import ABC, abstractmethod
+from collections import Counter
+
+from _sandbox import START_DIR, enter_sandbox
+
+enter_sandbox("self_play_")
+
+from config import CustomConfig, LLM_API_CONFIG_FILE  # noqa: E402
+from game_engine import GameEngine  # noqa: E402
+from engine_io import HeadlessIO, RetryExhausted, EVENT_TOKEN_USAGE, EVENT_WARNING, EVENT_ERROR, EVENT_RETRY  # noqa: E402
+from cassette import Cassette, MODE_RECORD, CALL_STORY, CALL_SUMMARY  # noqa: E402
+from mock_llm_server import MockLLM, start_mock_server  # noqa: E402
+
+# 自定义行动与思考的默认短语
+DEFAULT_PHRASES = ["四处看看", "找人打听消息", "找个地方歇脚", "仔细检查身上的东西", "沿着小路走下去", "和路人攀谈"]
+DEFAULT_THOUGHTS = ["这里有什么不对劲的地方", "接下来该去哪里", "刚才那人可信吗"]
+# 使用物品时的操作
+ITEM_MOVES = ["使用", "查看", "展示"]
+# 使用物品时的对象(与游戏中*use命令一样总是指定对象)
+ITEM_TARGETS = ["自己", "路人", "门", "地面"]
+
+
+class Policy(ABC):
+    """
+    行动策略：每回合返回一组行动，最后一个为推进回合的行动
+    行动为("option", 选项ID)、("custom", 行动描述)、("think", 疑问)或("use_item", (物品名, 操作, 对象))
+    """
+
+    def __init__(self, rng: random.Random, phrases=None, think_every: int = 0, opi_every: int = 0):
+        self.rng = rng
+        self.phrases = phrases or DEFAULT_PHRASES
+        self.think_every = think_every
+        self.opi_every = opi_every
+
+    def feasible_options(self, engine: GameEngine) -> list:
+        """可以选择的选项(不含门槛不满足的must选项)"""
+        return [opt for opt in engine.current_options
+                if opt.type != "must" or engine.character_attributes.get(opt.main_factor, 0) >= opt.difficulty]
+
+    @abstractmethod
+    def choose(self, engine: GameEngine, turn: int):
+        """推进回合的行动(子类实现)"""
+
+    def actions(self, engine: GameEngine, turn: int) -> list:
+        actions = []
+        if self.think_every and turn % self.think_every == 0:
+            actions.append(("think", self.rng.choice(DEFAULT_THOUGHTS)))
+        if self.opi_every and turn % self.opi_every == 0 and engine.inventory:
+            actions.append(("use_item", (self.rng.choice(list(engine.inventory)), self.rng.choice(ITEM_MOVES),
+                                         self.rng.choice(ITEM_TARGETS))))
+            return actions
+        actions.append(self.choose(engine, turn))
+        return actions
+
+
+class RandomPolicy(Policy):
+    """随机选择可选的选项，没有可选项时自定义行动"""
+
+    def choose(self, engine, turn):
+        options = self.feasible_options(engine)
+        if not options or engine.prompt_manager.is_no_options:
+            return ("custom", self.rng.choice(self.phrases))
+        return ("option", self.rng.choice(options).id)
+
+
+class CheckPolicy(RandomPolicy):
+    """总是优先选择检定选项"""
+
+    def choose(self, engine, turn):
+        checks = [opt for opt in self.feasible_options(engine) if opt.type == "check"]
+        if checks:
+            return ("option", self.rng.choice(checks).id)
+        return super().choose(engine, turn)
+
+
+class CustomPolicy(Policy):
+    """总是从短语表中选择自定义行动"""
+
+    def choose(self, engine, turn):
+        return ("custom", self.rng.choice(self.phrases))
+
+
+POLICIES = {"random": RandomPolicy, "check": CheckPolicy, "custom": CustomPolicy}
+
+
+def load_policy(name: str):
+    """内置策略名，或"模块:类"形式的自定义策略(Policy的子类)"""
+    if name in POLICIES:
+        return POLICIES[name]
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"未知的策略: {name}")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class TurnMeter:
+    """包装引擎的call_ai，记录每次调用的类型、提示词长度、Token与耗时"""
+
+    def __init__(self, engine: GameEngine):
+        self.engine = engine
+        self.calls = []
+        self.events = Counter()
+        self._call_ai = engine.call_ai
+        engine.call_ai = self.call_ai
+
+    def _drain(self, record=None):
+        for event in self.engine.io.drain():
+            if event["kind"] == EVENT_TOKEN_USAGE and record is not None:
+                record["prompt_tokens"] = event["usage"].prompt_tokens
+                record["completion_tokens"] = event["usage"].completion_tokens
+            elif event["kind"] in (EVENT_WARNING, EVENT_ERROR, EVENT_RETRY):
+                self.events[event["kind"]] += 1
+
+    def call_ai(self, prompt: str, call_type: str = CALL_STORY):
+        self._drain()
+        start = time.perf_counter()
+        result = self._call_ai(prompt, call_type)
+        record = {"call_type": call_type, "prompt_chars": len(prompt),
+                  "latency": round(time.perf_counter() - start, 4), "ok": bool(result)}
+        self._drain(record)
+        self.calls.append(record)
+        return result
+
+    def take(self):
+        """取出本回合的调用记录与事件计数"""
+        self._drain()
+        calls, events = self.calls, dict(self.events)
+        self.calls, self.events = [], Counter()
+        return calls, events
+
+
+def perform(engine: GameEngine, action) -> bool:
+    """执行一个行动，返回是否推进了回合"""
+    kind, value = action
+    if kind == "think":
+        engine.think_go_game(value)
+        return False
+    if kind == "use_item":
+        item, move, target = value
+        is_ok = engine.is_use_item_ok(item, move, target)
+        # 与游戏中的物品操作相同(不合理时仍执行)
+        engine.go_game(f"对{target}使用背包里的物品{item}进行{move}操作" + ("" if is_ok else " (操作不合理!)"), True)
+        return True
+    if kind == "custom":
+        return engine.go_game(value, True) != -1
+    return engine.go_game(value) != -1
+
+
+def new_game(config: CustomConfig, seed: int, game_index: int, cassette) -> tuple:
+    engine = GameEngine(config, HeadlessIO())
+    engine.seed_rng(seed + game_index)
+    engine.cassette = cassette
+    meter = TurnMeter(engine)
+    engine.start_game("")
+    return engine, meter
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0
+
+
+def run(args):
+    if args.api_config:
+        shutil.copy(os.path.join(START_DIR, args.api_config), LLM_API_CONFIG_FILE)
+    config = CustomConfig()
+    if args.api_config:
+        if args.provider is not None:
+            config.api_provider_choice = args.provider
+    else:
+        llm = MockLLM(args.ttft, args.tps, args.jitter, args.error_rate, seed=args.seed)
+        _, base_url = start_mock_server(llm=llm)
+        config.api_providers = {0: {"name": "mock", "model": "mock", "api_key": "mock", "base_url": base_url}}
+        config.api_provider_choice = 0
+    cassette = Cassette(os.path.join(START_DIR, args.record), MODE_RECORD) if args.record else None
+    policy = load_policy(args.policy)(random.Random(args.seed), think_every=args.think_every,
+                                      opi_every=args.opi_every)
+
+    out_path = os.path.join(START_DIR, args.out)
+    game_index = 0
+    engine, meter = new_game(config, args.seed, game_index, cassette)
+    start_calls, _ = meter.take()
+    turn_latencies, prompt_tokens, compactions = [], [], 0
+    run_start = time.perf_counter()
+    with open(out_path, "w", encoding="utf-8") as out:
+        for turn in range(1, args.turns + 1):
+            if engine.current_game_status != "ongoing":
+                game_index += 1
+                engine, meter = new_game(config, args.seed, game_index, cassette)
+                meter.take()
+            summaries_before = len(engine.history_simple_summaries)
+            turn_start = time.perf_counter()
+            actions = policy.actions(engine, turn)
+            try:
+                advanced = False
+                for action in actions:
+                    advanced = perform(engine, action) or advanced
+            except RetryExhausted as e:
+                out.write(json.dumps({"turn": turn, "game": game_index, "error": str(e)}, ensure_ascii=False) + "\n")
+                print(f"第{turn}回合AI响应失败，结束: {e}")
+                break
+            latency = time.perf_counter() - turn_start
+            calls, events = meter.take()
+            compacted = any(call["call_type"] == CALL_SUMMARY for call in calls)
+            compactions += compacted
+            turn_prompt_tokens = sum(call.get("prompt_tokens", 0) for call in calls)
+            record = {
+                "turn": turn,
+                "game": game_index,
+                "game_turn": len(engine.history_descriptions),
+                "actions": [kind for kind, _ in actions],
+                "advanced": advanced,
+                "latency": round(latency, 4),
+                "prompt_tokens": turn_prompt_tokens,
+                "completion_tokens": sum(call.get("completion_tokens", 0) for call in calls),
+                "calls": calls,
+                "summary_compaction": compacted,
+                "summaries": [summaries_before, len(engine.history_simple_summaries)],
+                "summary_chars": sum(len(s) for s in engine.history_simple_summaries if s),
+                "inventory": len(engine.inventory),
+                "variables": len(engine.variables),
+                "total_tokens": engine.total_tokens,
+                "status": engine.current_game_status,
+                "events": events,
+            }
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            turn_latencies.append(latency)
+            prompt_tokens.append(turn_prompt_tokens)
+            if args.progress and turn % args.progress == 0:
+                print(f"回合 {turn}: 本回合提示 {turn_prompt_tokens} Token，累计 {engine.total_tokens}，"
+                      f"摘要 {len(engine.history_simple_summaries)} 条，已总结 {compactions} 次")
+    if cassette is not None:
+        cassette.close()
+
+    elapsed = time.perf_counter() - run_start
+    played = len(turn_latencies)
+    window = max(min(100, played // 4), 1)
+    print(f"策略 {args.policy}，完成 {played} 回合({game_index + 1} 局)，耗时 {elapsed:.1f}s，"
+          f"开局 {sum(c.get('prompt_tokens', 0) for c in start_calls)} 提示Token")
+    if played:
+        print(f"每回合延迟 p50 {percentile(turn_latencies, 0.5) * 1000:.0f}ms，"
+              f"p95 {percentile(turn_latencies, 0.95) * 1000:.0f}ms")
+        print(f"每回合提示Token: 前{window}回合平均 {sum(prompt_tokens[:window]) / window:.0f}，"
+              f"后{window}回合平均 {sum(prompt_tokens[-window:]) / window:.0f}，最大 {max(prompt_tokens)}")
+        print(f"摘要总结 {compactions} 次，累计Token {engine.total_tokens}")
+    print(f"逐回合记录: {out_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面自动对局")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--policy", default="random", help="random/check/custom，或'模块:类'形式的自定义策略")
+    parser.add_argument("--think-every", type=int, default=0, help="每隔几回合思考一次(0为不思考)")
+    parser.add_argument("--opi-every", type=int, default=0, help="每隔几回合使用一次物品(0为不使用)")
+    parser.add_argument("--seed", type=int, default=1, help="策略、检定与模拟LLM的随机数种子")
+    parser.add_argument("--out", default="self_play.jsonl", help="逐回合记录(JSONL)")
+    parser.add_argument("--record", default="", help="同时录制AI调用到该文件(可用replay_cassette.py重放)")
+    parser.add_argument("--progress", type=int, default=100, help="每隔几回合输出一次进度(0为不输出)")
+    parser.add_argument("--api-config", default="", help="使用该LLM API配置中的真实提供商(默认使用模拟LLM)")
+    parser.add_argument("--provider", type=int, default=None, help="真实提供商的ID(默认使用配置中的选择)")
+    parser.add_argument("--ttft", type=float, default=0.0, help="模拟LLM的首字延迟(秒)")
+    parser.add_argument("--tps", type=float, default=1e6, help="模拟LLM的生成速度(Token/秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟LLM延迟的抖动幅度")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟LLM返回错误的比例")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()